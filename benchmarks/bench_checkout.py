@@ -0,0 +1,63 @@
+"""
+Time switching between two commits that differ in a few files of a large tree.
+
+    python -m benchmarks.bench_checkout [--files 50000] [--changes 10]
+"""
+import argparse
+import contextlib
+import io
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.synthetic import generate_tree, modify_files
+from pygit.commands import init, add, commit, checkout, status
+from pygit.core import stats
+from pygit.core.repo import get_head_commit_hash
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=50000)
+    parser.add_argument("--changes", type=int, default=10, help="files that differ between the commits")
+    parser.add_argument("--repeat", type=int, default=5, help="round trips between the commits")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="pygit-bench-"))
+    try:
+        root = work_dir / "repo"
+        repo_dir = root / ".pygit"
+        paths = generate_tree(root, args.files, seed=args.seed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            init.run(repo_dir=repo_dir)
+            add.run([root], repo_dir=repo_dir)
+            commit.run("first", repo_dir=repo_dir)
+            first = get_head_commit_hash(repo_dir)
+            changed = modify_files(root, paths, args.changes, seed=args.seed)
+            add.run([root / path for path in changed], repo_dir=repo_dir)
+            commit.run("second", repo_dir=repo_dir)
+            second = get_head_commit_hash(repo_dir)
+
+        timings = []
+        for _ in range(args.repeat):
+            for target in (first, second):
+                start = time.perf_counter()
+                checkout.checkout(repo_dir, target)
+                timings.append(time.perf_counter() - start)
+
+        stats.reset()
+        start = time.perf_counter()
+        status.get_status(repo_dir)
+        status_time = time.perf_counter() - start
+
+        print(f"files:              {args.files}")
+        print(f"changed files:      {args.changes}")
+        print(f"checkout (best):    {min(timings) * 1000:10.1f} ms")
+        print(f"checkout (median):  {sorted(timings)[len(timings) // 2] * 1000:10.1f} ms")
+        print(f"status afterwards:  {status_time * 1000:10.1f} ms "
+              f"({stats.get('files_hashed')} file(s) hashed)")
+    finally:
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    main()
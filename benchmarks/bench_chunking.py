@@ -0,0 +1,69 @@
+"""
+Measure hashing and storing throughput of whole and chunked large files.
+
+    python -m benchmarks.bench_chunking [--size-mb 256] [--edits 1]
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from pygit.core import stats
+from pygit.core.chunking import iter_chunks
+from pygit.core.hashing import hash_file
+from pygit.core.objects import write_blob
+
+def throughput(size: int, func) -> float:
+    """
+    Run func once and return the MB/s it processed size bytes at.
+    """
+    start = time.perf_counter()
+    func()
+    return size / (time.perf_counter() - start) / 1e6
+
+def count_chunks(path: Path) -> int:
+    with path.open("rb") as f:
+        return sum(1 for _ in iter_chunks(f))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--edits", type=int, default=1, help="bytes changed before storing again")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="pygit-bench-"))
+    try:
+        rng = random.Random(args.seed)
+        size = args.size_mb * 1024 * 1024
+        # Half random, half repetitive, so compression has something to do
+        data = bytearray(rng.randbytes(size // 2) + bytes(range(256)) * (size // 512))
+        path = work_dir / "large.bin"
+        path.write_bytes(data)
+        repo_path = work_dir / ".pygit"
+
+        hash_speed = throughput(size, lambda: hash_file(path))
+        chunk_speed = throughput(size, lambda: count_chunks(path))
+        chunks = count_chunks(path)
+        whole_speed = throughput(size, lambda: write_blob(repo_path, path))
+        chunked_speed = throughput(size, lambda: write_blob(repo_path, path, chunked=True))
+
+        for _ in range(args.edits):
+            data[rng.randrange(size)] ^= 0xFF
+        path.write_bytes(data)
+        stats.reset()
+        again_speed = throughput(size, lambda: write_blob(repo_path, path, chunked=True))
+
+        print(f"file size:              {args.size_mb:10d} MiB in {chunks} chunks")
+        print(f"hash_file:              {hash_speed:10.1f} MB/s")
+        print(f"chunk boundaries:       {chunk_speed:10.1f} MB/s")
+        print(f"store whole:            {whole_speed:10.1f} MB/s")
+        print(f"store chunked:          {chunked_speed:10.1f} MB/s")
+        print(f"store chunked again:    {again_speed:10.1f} MB/s "
+              f"({stats.get('objects_written')} object(s) written after {args.edits} edit(s))")
+    finally:
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Time pygit commands on synthetic repositories of increasing size.
+
+    python -m benchmarks.bench_commands [--sizes 1000,10000,100000]
+        [--output results.json] [--baseline old.json] [--threshold 0.25]
+
+Results are written as JSON. With --baseline, any operation that got slower
+than the baseline by more than the threshold is reported and the exit
+status is 1, so the suite can fail a CI job.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.synthetic import generate_history, generate_tree, modify_files
+from pygit.commands import init, add, commit, status, log, diff
+from pygit.core.repo import get_head_commit_hash
+
+# Differences below this many seconds are treated as noise when comparing
+MIN_REGRESSION = 0.005
+
+def timed(func, repeat: int = 1) -> float:
+    """
+    Return the best wall-clock time of `repeat` calls to func, with its
+    output discarded.
+    """
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_size(work_dir: Path, files: int, args) -> dict:
+    """
+    Build a repository of `files` files in work_dir and time each command on
+    it. Operations run in order, each on the state the previous one left.
+    """
+    root = work_dir / f"repo-{files}"
+    repo_dir = root / ".pygit"
+    paths = generate_tree(root, files, depth=args.depth, mean_size=args.mean_size,
+                          ignored_fraction=args.ignored, seed=args.seed)
+    results = {}
+
+    old_cwd = os.getcwd()
+    os.chdir(root)  # status works on the current directory
+    try:
+        changes = max(1, files // 100)
+        steps = [
+            ("init", lambda: init.run(repo_dir=repo_dir), 1),
+            ("add", lambda: add.run([root], repo_dir=repo_dir), 1),
+            ("commit", lambda: commit.run("Initial commit", repo_dir=repo_dir), 1),
+            ("status", lambda: status.run(), args.repeat),
+            (None, lambda: modify_files(root, paths, changes, seed=args.seed), 1),
+            ("status_modified", lambda: status.run(), 1),
+            ("add_incremental", lambda: add.run([root], repo_dir=repo_dir), 1),
+            ("commit_incremental", lambda: commit.run("Edit files", repo_dir=repo_dir), 1),
+            (None, lambda: generate_history(root, paths, args.commits, seed=args.seed), 1),
+            ("log", lambda: log.run(repo_dir=repo_dir), args.repeat),
+            ("log_path", lambda: log.run(paths=[paths[0].rpartition("/")[0] or paths[0]], repo_dir=repo_dir), args.repeat),
+            ("diff_commits", lambda: diff.run(commits=[first_commit, "HEAD"], repo_dir=repo_dir), args.repeat),
+        ]
+        first_commit = None
+        # Steps without a name prepare the next one and are not timed
+        for name, func, repeat in steps:
+            seconds = timed(func, repeat)
+            if name is not None:
+                results[name] = seconds
+            if name == "commit":
+                first_commit = get_head_commit_hash(repo_dir)
+    finally:
+        os.chdir(old_cwd)
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Return a message for every operation that is more than `threshold`
+    (a fraction) slower than in baseline.
+    """
+    regressions = []
+    for size, timings in results["results"].items():
+        for name, seconds in timings.items():
+            old = baseline.get("results", {}).get(size, {}).get(name)
+            if old is None:
+                continue
+            if seconds > old * (1 + threshold) and seconds - old > MIN_REGRESSION:
+                regressions.append(f"{name} at {size} files: {old:.3f}s -> {seconds:.3f}s "
+                                   f"(+{(seconds / old - 1) * 100:.0f}%)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma-separated file counts (default: %(default)s)")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--mean-size", type=int, default=1024, help="mean file size in bytes")
+    parser.add_argument("--ignored", type=float, default=0.05, help="ignored files per tracked file")
+    parser.add_argument("--commits", type=int, default=20, help="commits of history to time log on")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of read-only commands (best is kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="slowdown that counts as a regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "results": {},
+    }
+    work_dir = Path(tempfile.mkdtemp(prefix="pygit-bench-"))
+    try:
+        for size in (int(s) for s in args.sizes.split(",")):
+            timings = bench_size(work_dir, size, args)
+            results["results"][str(size)] = timings
+            print(f"{size} files:")
+            for name, seconds in timings.items():
+                print(f"  {name:<20} {seconds * 1000:10.1f} ms")
+            shutil.rmtree(work_dir / f"repo-{size}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.threshold)
+        for message in regressions:
+            print(f"Regression: {message}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Time merge-base queries on a large synthetic commit history.
+
+    python -m benchmarks.bench_merge_base [--commits 100000] [--repeat 20]
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from pygit.core import stats
+from pygit.core.commit_graph import get_commit_info, load_commit_graph, merge_bases, write_commit_graph
+from pygit.core.objects import generate_commit_hash, save_commit
+
+TREE = "e" * 40
+
+def make_history(repo_path: Path, count: int, seed: int = 0) -> dict:
+    """
+    Write a history of about count commits: a main line from which a
+    one-commit side branch forks every ten commits, to be merged back a few
+    commits later, plus three branches forking from it 10, 1000 and count/2
+    commits back. Returns the tips by name.
+    """
+    rng = random.Random(seed)
+    (repo_path / "refs" / "heads").mkdir(parents=True)
+    (repo_path / "HEAD").write_text("ref: refs/heads/main\n")
+    timestamp = 0
+
+    def commit(parents, message):
+        nonlocal timestamp
+        timestamp += 1
+        data = {"message": message, "timestamp": timestamp, "parents": parents, "tree": TREE}
+        commit_hash = generate_commit_hash(data)
+        save_commit(repo_path, commit_hash, data)
+        return commit_hash
+
+    main = []
+    side = None
+    while len(main) < count:
+        if side is not None and rng.random() < 0.3:
+            main.append(commit([main[-1], side], f"merge {len(main)}"))
+            side = None
+        else:
+            main.append(commit(main[-1:], f"main {len(main)}"))
+            if len(main) % 10 == 0:
+                side = commit([main[-1]], f"side {len(main)}")
+
+    tips = {"main": main[-1]}
+    for name, depth in (("recent", 10), ("older", 1000), ("ancient", count // 2)):
+        tip = main[-depth]
+        for i in range(5):
+            tip = commit([tip], f"{name} {i}")
+        tips[name] = tip
+    for name, tip in tips.items():
+        (repo_path / "refs" / "heads" / name).write_text(tip)
+    return tips
+
+def full_ancestor_walk(repo_path: Path, one: str) -> int:
+    """
+    The first half of finding a merge base without generation numbers, for
+    comparison: collect every ancestor of one. Returns how many there are.
+    """
+    graph = load_commit_graph(repo_path)
+    seen = set()
+    pending = [one]
+    while pending:
+        commit_hash = pending.pop()
+        if commit_hash not in seen:
+            seen.add(commit_hash)
+            pending.extend(get_commit_info(repo_path, commit_hash, graph)["parents"])
+    return len(seen)
+
+def time_query(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--commits", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="pygit-bench-"))
+    try:
+        repo_path = work_dir / ".pygit"
+        start = time.perf_counter()
+        tips = make_history(repo_path, args.commits, args.seed)
+        total = write_commit_graph(repo_path)
+        print(f"commits:            {total} (built in {time.perf_counter() - start:.1f} s)")
+
+        for name in ("recent", "older", "ancient"):
+            stats.reset()
+            merge_bases(repo_path, tips["main"], tips[name])
+            walked = stats.get("commits_walked")
+            median = time_query(lambda: merge_bases(repo_path, tips["main"], tips[name]), args.repeat)
+            print(f"merge-base {name + ':':9} {median * 1000:10.2f} ms ({walked} commits walked)")
+
+        median = time_query(lambda: full_ancestor_walk(repo_path, tips["main"]), 1)
+        visited = full_ancestor_walk(repo_path, tips["main"])
+        print(f"full ancestor walk: {median * 1000:10.2f} ms ({visited} commits walked)")
+    finally:
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    main()
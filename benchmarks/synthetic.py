@@ -0,0 +1,89 @@
+"""
+Generate reproducible synthetic working trees and histories for benchmarks.
+
+The same seed and options always produce the same files, so timings from
+different runs (or different versions of pygit) are comparable.
+"""
+import math
+import random
+from pathlib import Path
+from pygit.commands import add, commit
+
+IGNORE_PATTERNS = ["build/", "*.log", "__pycache__/"]
+
+def _text(rng: random.Random, size: int = 1 << 16) -> str:
+    words = ["alpha", "beta", "gamma", "delta", "return", "value", "self", "data",
+             "index", "tree", "commit", "object", "if", "for", "in", "None"]
+    lines = []
+    length = 0
+    while length < size:
+        line = " ".join(rng.choices(words, k=rng.randint(2, 10)))
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines) + "\n"
+
+def file_size(rng: random.Random, mean_size: int, sigma: float) -> int:
+    """
+    Draw a file size from a log-normal distribution with the given mean:
+    most files are small, a few are much larger, as in real source trees.
+    """
+    mu = math.log(mean_size) - sigma ** 2 / 2
+    return max(1, int(rng.lognormvariate(mu, sigma)))
+
+def generate_tree(root: Path, files: int, depth: int = 3, dirs_per_level: int = 8,
+                  mean_size: int = 1024, size_sigma: float = 1.0,
+                  ignored_fraction: float = 0.05, seed: int = 0) -> list:
+    """
+    Create `files` tracked files under root, spread over directories up to
+    `depth` levels deep, plus ignored files (`ignored_fraction` as many) in
+    build/ and *.log files, and a .pygitignore covering them. Returns the
+    repo-relative paths of the tracked files.
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    text = _text(rng)
+    (root / ".pygitignore").write_text("".join(f"{p}\n" for p in IGNORE_PATTERNS))
+
+    paths = []
+    for n in range(files):
+        parts = [f"dir{rng.randrange(dirs_per_level)}" for _ in range(rng.randint(0, depth))]
+        paths.append("/".join(parts + [f"file{n}.txt"]))
+    for n, path in enumerate(paths):
+        _write(root / path, rng, text, file_size(rng, mean_size, size_sigma), n)
+
+    ignored = int(files * ignored_fraction)
+    for n in range(ignored):
+        name = f"build/out{n}.o" if n % 2 else f"dir{rng.randrange(dirs_per_level)}/debug{n}.log"
+        _write(root / name, rng, text, file_size(rng, mean_size, size_sigma), n)
+    return paths
+
+def _write(path: Path, rng: random.Random, text: str, size: int, n: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    start = rng.randrange(len(text))
+    body = (text[start:] + text)[:size]
+    # A unique first line keeps every file's content (and hash) distinct
+    path.write_text(f"# file {n}\n{body}")
+
+def modify_files(root: Path, paths: list, count: int, seed: int = 0) -> list:
+    """
+    Append a line to `count` of the given files and return the paths changed.
+    """
+    rng = random.Random(seed)
+    changed = rng.sample(paths, min(count, len(paths)))
+    for path in changed:
+        with open(Path(root) / path, "a") as f:
+            f.write(f"edit {seed}\n")
+    return changed
+
+def generate_history(root: Path, paths: list, commits: int, changes_per_commit: int = 10,
+                     seed: int = 0) -> None:
+    """
+    Make `commits` commits on top of the current state of root, each editing
+    `changes_per_commit` files.
+    """
+    repo_dir = Path(root) / ".pygit"
+    for i in range(commits):
+        changed = modify_files(root, paths, changes_per_commit, seed=seed + i + 1)
+        add.run([Path(root) / path for path in changed], repo_dir=repo_dir)
+        commit.run(f"Edit {len(changed)} files ({i + 1}/{commits})", repo_dir=repo_dir)
@@ -1,33 +1,206 @@
-from pathlib import Path
-import shutil
+import os
 import sys
-from pygit.core.index import load_index, save_index
-from pygit.core.hashing import hash_file
-from pygit.core.repo import is_ignored 
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from pygit.core import fsmonitor, stats, trace
+from pygit.core.chunking import load_chunk_patterns
+from pygit.core.ignore import IgnoreRules
+from pygit.core.index import locked_index, index_mtime_ns, is_stat_clean, make_entry
+from pygit.core.merge import has_conflict_markers, load_merge_state, save_merge_state
+from pygit.core.objects import object_exists, read_object, write_blob
+from pygit.core.tree import invalidate_cache_tree
+
+# staged: names of the files staged, whether or not they changed
+# stored: how many of them were new or changed, and so hashed and stored
+# removed: names of files deleted from an added directory, now unstaged
+# skipped: (path, reason) for each path not added, where reason is
+#          "missing", "ignored", "outside" (the repository) or "sparse"
+#          (outside the sparse-checkout cone)
+# markers: conflicted files of a merge marked resolved by this add that
+#          still contain conflict markers
+AddResult = namedtuple("AddResult", "staged stored removed skipped markers")
 
-def run(file_path, repo_dir=".pygit"):
+SKIP_MESSAGES = {
+    "missing": "'{}' does not exist. Nothing added.",
+    "ignored": "'{}' is ignored. Skipping.",
+    "outside": "'{}' is outside the repository. Nothing added.",
+    "sparse": "'{}' is outside the sparse-checkout cone. Skipping.",
+}
+
+def run(paths, repo_dir=".pygit", jobs=None):
+    result = add_paths(Path(repo_dir), paths, jobs=jobs)
+    for path, reason in result.skipped:
+        print(SKIP_MESSAGES[reason].format(path))
+    if len(result.staged) == 1:
+        print(f"Staged {result.staged[0]}")
+    elif result.staged or result.removed:
+        print(f"Staged {len(result.staged)} files ({result.stored} new or changed).")
+    for name in result.removed:
+        print(f"Removed {name}")
+    for name in result.markers:
+        print(f"warning: {name} still contains conflict markers.")
+
+def add_paths(repo_path: Path, paths, jobs=None, rules=None) -> AddResult:
     """
-    Stage a file for commit, unless it's ignored or missing.
+    Stage files for commit. Each path may be a file or a directory (such as
+    "."), which stages every non-ignored file below it; missing and ignored
+    paths, and those outside the sparse-checkout cone, are skipped.
+
+    File contents are hashed and stored in the object store by a pool of
+    `jobs` threads (hashlib and zlib release the GIL on large buffers), and
+    the index is written once at the end, under the index lock so concurrent
+    adds don't lose each other's updates. Files whose stat data is unchanged
+    since they were last staged are not read again, and when the filesystem
+    monitor is running, unchanged files below an added directory are not
+    even stat-ed. Large files matching a pattern in .pygit/chunked are
+    stored in content-defined chunks, so a new version of one only stores
+    the chunks that changed.
     """
-    file_path = Path(file_path)
-    repo_path = Path(repo_dir)
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    repo_root = repo_path.resolve().parent
+    rules = rules if rules is not None else IgnoreRules(repo_path)
 
-    if not file_path.exists():
-        print(f"'{file_path}' does not exist. Nothing added.")
-        return
+    files = {}  # repo-relative name -> path on disk
+    dirs = []
+    skipped = []
+    for path in map(Path, paths):
+        if not path.exists():
+            skipped.append((path, "missing"))
+            continue
+        if rules.is_ignored(path):
+            skipped.append((path, "ignored"))
+            continue
+        try:
+            name = path.resolve().relative_to(repo_root).as_posix()
+        except ValueError:
+            skipped.append((path, "outside"))
+            continue
+        if name != "." and rules.outside_cone(name, is_dir=path.is_dir()):
+            skipped.append((path, "sparse"))
+            continue
+        if path.is_dir():
+            dirs.append("" if name == "." else name)
+        else:
+            files[name] = path
 
-    if is_ignored(file_path, repo_path):
-        print(f"'{file_path}' is ignored. Skipping.")
-        return
+    if not files and not dirs:
+        return AddResult([], 0, [], skipped, [])
+
+    with locked_index(repo_path) as index:
+        index_mtime = index_mtime_ns(repo_path)
+        with trace.span("add: list files"):
+            unchanged = _expand_dirs(repo_path, rules, index, dirs, files)
+        to_store = []
+        with trace.span("add: check stat cache"):
+            for name, path in files.items():
+                st = path.stat()
+                entry = index.get(name)
+                if (entry is not None and is_stat_clean(entry, st, index_mtime)
+                        and object_exists(repo_path, entry["hash"])):
+                    stats.increment("files_skipped")
+                    continue
+                to_store.append((name, path, st))
+
+        changed = []
+        chunked = load_chunk_patterns(repo_path)
+
+        def store(item):
+            name, path, _ = item
+            return write_blob(repo_path, path, chunked=chunked is not None and chunked.fullmatch(name) is not None)
 
-    staging_dir = repo_path / "staging"
-    staging_dir.mkdir(parents=True, exist_ok=True)
+        with trace.span("add: hash and store"), ThreadPoolExecutor(max_workers=jobs) as pool:
+            hashes = pool.map(store, to_store)
+            for done, ((name, _, st), file_hash) in enumerate(zip(to_store, hashes), 1):
+                if name not in index or index[name]["hash"] != file_hash:
+                    changed.append(name)
+                index[name] = make_entry(file_hash, st)
+                _progress(done, len(to_store))
 
-    file_hash = hash_file(file_path)
-    shutil.copy(file_path, staging_dir / file_path.name)
+        # Adding a directory also stages the removal of files deleted from
+        # it, but not of those left out by a sparse checkout
+        removed = [
+            name for name, entry in index.items()
+            if name not in files and name not in unchanged and not entry.get("skip_worktree")
+            and any(_is_under(name, d) for d in dirs)
+            and not (repo_root / name).exists()
+        ]
+        for name in removed:
+            del index[name]
+        invalidate_cache_tree(index, changed + removed)
+        markers = _resolve_conflicts(repo_path, index, files, dirs)
 
-    index = load_index(repo_path)
-    index[file_path.name] = file_hash
-    save_index(repo_path, index)
+    return AddResult([*files, *sorted(unchanged)], len(to_store), removed, skipped, markers)
 
-    print(f"Staged {file_path.name}")
\ No newline at end of file
+def _expand_dirs(repo_path: Path, rules: IgnoreRules, index, dirs: list, files: dict) -> set:
+    """
+    Add the files below each directory in dirs to files. If the filesystem
+    monitor can tell what changed, only files changed since the last status
+    or differing from the index then are added, and the names of the other
+    tracked files are returned instead, so that they are not even stat-ed.
+    Tracked files missing at the last status are in neither, so that their
+    removal is staged.
+    """
+    if not dirs:
+        return set()
+    _, changed = fsmonitor.changed_since(repo_path, index)
+    if changed is None:
+        for rel_dir in dirs:
+            for name, entry in rules.walk(rel_dir):
+                files[name] = Path(entry.path)
+        return set()
+
+    _, dirty = fsmonitor.load_state(index)
+    unchanged = set()
+    for rel_dir in dirs:
+        for name, entry in index.items():
+            if entry.get("skip_worktree"):
+                continue
+            # A file missing at the last status (None) is still missing
+            if (_is_under(name, rel_dir) and not fsmonitor.is_changed(name, changed)
+                    and dirty.get(name, "") is not None):
+                unchanged.add(name)
+        for name, file_hash in dirty.items():
+            if (file_hash is not None and _is_under(name, rel_dir)
+                    and not fsmonitor.is_changed(name, changed)):
+                files[name] = rules.repo_root / name
+        files.update(fsmonitor.changed_files(rules, changed, rel_dir))
+    unchanged.difference_update(files)
+    stats.increment("files_skipped", len(unchanged))
+    return unchanged
+
+def _resolve_conflicts(repo_path: Path, index, files: dict, dirs: list) -> list:
+    """
+    Mark the conflicts of a merge in progress that this add staged, or whose
+    deletion it staged, as resolved. Returns those still holding markers.
+    """
+    merging = load_merge_state(repo_path)
+    if merging is None or not merging[1]:
+        return []
+    merged, conflicts = merging
+    repo_root = repo_path.resolve().parent
+    unresolved = []
+    markers = []
+    for path in conflicts:
+        if path in files:
+            if has_conflict_markers(read_object(repo_path, index[path]["hash"])[1]):
+                markers.append(path)
+        elif not (any(_is_under(path, d) for d in dirs) and not (repo_root / path).exists()):
+            unresolved.append(path)
+    if unresolved != conflicts:
+        save_merge_state(repo_path, merged, unresolved)
+    return markers
+
+def _is_under(name: str, rel_dir: str) -> bool:
+    return not rel_dir or name.startswith(rel_dir + "/")
+
+def _progress(done: int, total: int) -> None:
+    """
+    Show a running count on stderr while hashing many files interactively.
+    """
+    if total < 100 or not sys.stderr.isatty():
+        return
+    end = "\n" if done == total else ""
+    if done == total or done % 100 == 0:
+        print(f"\rHashing files: {done}/{total}", end=end, file=sys.stderr, flush=True)
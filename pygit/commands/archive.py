@@ -0,0 +1,27 @@
+import sys
+from pygit.core.archive import archive_format, write_archive
+from pygit.core.repo import get_repo_path, resolve_commit
+
+def run(commit, fmt=None, output=None, prefix="", repo_dir=".pygit"):
+    """
+    Write the files of a commit as a tar, tar.gz or zip archive to output,
+    or to standard output, straight from the object store: the working
+    tree is not read. The format is taken from output's extension unless
+    fmt is given.
+    """
+    repo_path = get_repo_path(repo_dir)
+    commit_hash = resolve_commit(repo_path, commit)
+    if commit_hash is None:
+        print(f"Error: '{commit}' is not a branch or commit.")
+        return
+    fmt = fmt or archive_format(output)
+    try:
+        if output is None:
+            write_archive(repo_path, commit_hash, sys.stdout.buffer, fmt, prefix)
+            return
+        with open(output, "wb") as out:
+            files = write_archive(repo_path, commit_hash, out, fmt, prefix)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    print(f"Wrote {files} file(s) from {commit_hash[:7]} to {output}.")
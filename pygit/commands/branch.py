@@ -0,0 +1,67 @@
+from pathlib import Path
+from pygit.core.commit_graph import is_ancestor
+from pygit.core.repo import get_repo_path, resolve_commit
+
+def run(name=None, start="HEAD", delete=False, force=False, repo_dir=".pygit"):
+    """
+    List the branches, or create a branch called name at start, or delete
+    it. A branch whose commits are not all in HEAD's history is only
+    deleted with force.
+    """
+    repo_path = get_repo_path(repo_dir)
+    try:
+        if name is None:
+            current = current_branch(repo_path)
+            for branch in list_branches(repo_path):
+                print(f"{'*' if branch == current else ' '} {branch}")
+        elif delete:
+            delete_branch(repo_path, name, force=force)
+            print(f"Deleted branch {name}.")
+        else:
+            commit_hash = create_branch(repo_path, name, start)
+            print(f"Created branch {name} at {commit_hash[:7]}.")
+    except ValueError as e:
+        print(f"Error: {e}")
+
+def list_branches(repo_path: Path) -> list:
+    heads_dir = repo_path / "refs" / "heads"
+    if not heads_dir.exists():
+        return []
+    return sorted(ref.relative_to(heads_dir).as_posix() for ref in heads_dir.rglob("*") if ref.is_file())
+
+def current_branch(repo_path: Path):
+    """
+    Return the name of the checked-out branch, or None if HEAD is detached.
+    """
+    head = (repo_path / "HEAD").read_text().strip()
+    return head[len("ref: refs/heads/"):] if head.startswith("ref: refs/heads/") else None
+
+def create_branch(repo_path: Path, name: str, start: str = "HEAD") -> str:
+    """
+    Create a branch pointing at the commit start names and return its hash.
+    """
+    parts = name.split("/")
+    if name.startswith("-") or any(part in ("", ".", "..") or part.endswith(".lock") for part in parts) \
+            or any(c in name for c in " ~^:?*[\\"):
+        raise ValueError(f"'{name}' is not a valid branch name.")
+    ref = repo_path / "refs" / "heads" / name
+    if ref.exists():
+        raise ValueError(f"A branch named '{name}' already exists.")
+    commit_hash = resolve_commit(repo_path, start)
+    if commit_hash is None:
+        raise ValueError(f"'{start}' is not a branch or commit.")
+    ref.parent.mkdir(parents=True, exist_ok=True)
+    ref.write_text(commit_hash)
+    return commit_hash
+
+def delete_branch(repo_path: Path, name: str, force: bool = False) -> None:
+    ref = repo_path / "refs" / "heads" / name
+    if not ref.is_file():
+        raise ValueError(f"Branch '{name}' not found.")
+    if name == current_branch(repo_path):
+        raise ValueError(f"Cannot delete the checked-out branch '{name}'.")
+    head = resolve_commit(repo_path, "HEAD")
+    tip = ref.read_text().strip()
+    if not force and tip and tip != head and not (head and is_ancestor(repo_path, tip, head)):
+        raise ValueError(f"The branch '{name}' is not fully merged; use -D to delete it anyway.")
+    ref.unlink()
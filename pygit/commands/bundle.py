@@ -0,0 +1,104 @@
+from pathlib import Path
+from pygit.commands.branch import current_branch, list_branches
+from pygit.core.bundle import read_bundle, write_bundle
+from pygit.core.commit_graph import is_ancestor
+from pygit.core.repo import get_repo_path, resolve_commit
+
+def run(action, file, revs=(), repo_dir=".pygit"):
+    """
+    Move commits between repositories in a single file:
+
+    - "create" writes the commits reachable from revs to file. revs are
+      branch names, HEAD, or --all for every branch; "^<commit>" or
+      "<commit>..<branch>" leaves out what the other repository already has.
+    - "unbundle" reads file into the repository, then creates its branches
+      or fast-forwards them.
+    - "verify" checks that file is intact and that the repository has the
+      commits it relies on, without changing anything.
+    """
+    repo_path = get_repo_path(repo_dir)
+    try:
+        if action == "create":
+            refs, bases = parse_revs(repo_path, revs)
+            commits, objects = write_bundle(repo_path, Path(file), refs, bases)
+            print(f"Wrote {commits} commit(s) and {objects} object(s) to {file}.")
+        elif action == "unbundle":
+            result = read_bundle(repo_path, Path(file))
+            print(f"Unbundled {result.new_commits} new commit(s) and {result.new_objects} new object(s).")
+            for name, commit_hash in result.refs.items():
+                print(update_branch(repo_path, name, commit_hash))
+        elif action == "verify":
+            result = read_bundle(repo_path, Path(file), store=False)
+            for name, commit_hash in result.refs.items():
+                print(f"{commit_hash} {name}")
+            print(f"{file} is okay: {result.commits} commit(s), {result.objects} object(s).")
+        else:
+            print(f"Unknown bundle action: {action}")
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+
+def parse_revs(repo_path: Path, revs) -> tuple[dict, list]:
+    """
+    Turn the revisions given to `bundle create` into the refs to bundle, as
+    a dictionary of ref name to commit hash, and the commits to leave out.
+    """
+    refs = {}
+    bases = []
+    for rev in revs:
+        if rev == "--all":
+            refs.update((f"refs/heads/{name}", resolve_commit(repo_path, name))
+                        for name in list_branches(repo_path))
+            continue
+        if rev.startswith("^"):
+            base, tip = rev[1:], None
+        elif ".." in rev:
+            base, _, tip = rev.partition("..")
+        else:
+            base, tip = None, rev
+        if base is not None:
+            commit_hash = resolve_commit(repo_path, base)
+            if commit_hash is None:
+                raise ValueError(f"'{base}' is not a branch or commit.")
+            bases.append(commit_hash)
+        if tip is not None:
+            name = current_branch(repo_path) if tip == "HEAD" else tip
+            if name is None or not (repo_path / "refs" / "heads" / name).is_file():
+                raise ValueError(f"'{tip}' is not a branch.")
+            refs[f"refs/heads/{name}"] = resolve_commit(repo_path, name)
+    refs = {name: commit_hash for name, commit_hash in refs.items() if commit_hash}
+    if not refs:
+        raise ValueError("You must specify at least one branch to bundle.")
+    return refs, bases
+
+def branch_name(ref: str):
+    """
+    Return the branch name of a ref from a bundle, or None if it is not a
+    valid branch ref.
+    """
+    name = ref[len("refs/heads/"):]
+    if not ref.startswith("refs/heads/") or any(part in ("", ".", "..") for part in name.split("/")):
+        return None
+    return name
+
+def update_branch(repo_path: Path, ref: str, commit_hash: str) -> str:
+    """
+    Point the branch ref names at commit_hash if it is new or the move is a
+    fast-forward, and return a message saying what was done. The checked-out
+    branch is left alone, since its files would not match.
+    """
+    name = branch_name(ref)
+    if name is None:
+        return f"Skipped {ref}: not a branch."
+    ref_path = repo_path / "refs" / "heads" / name
+    current = ref_path.read_text().strip() if ref_path.is_file() else None
+    if current == commit_hash:
+        return f"Branch '{name}' is up to date."
+    if name == current_branch(repo_path):
+        return f"Not updating the checked-out branch '{name}' to {commit_hash[:7]}."
+    if current is not None and not is_ancestor(repo_path, current, commit_hash):
+        return f"Not updating branch '{name}': {commit_hash[:7]} is not a fast-forward of {current[:7]}."
+    ref_path.parent.mkdir(parents=True, exist_ok=True)
+    ref_path.write_text(commit_hash)
+    if current is None:
+        return f"Created branch '{name}' at {commit_hash[:7]}."
+    return f"Updated branch '{name}' from {current[:7]} to {commit_hash[:7]}."
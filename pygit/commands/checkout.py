@@ -0,0 +1,253 @@
+import os
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from pygit.core import trace
+from pygit.core.hashing import hash_file
+from pygit.core.index import locked_index, index_mtime_ns, is_stat_clean, make_entry
+from pygit.core.objects import iter_object, load_commit, load_commit_tree
+from pygit.core.repo import get_repo_path, resolve_commit
+from pygit.core.sparse import load_sparse
+from pygit.core.tree import LazyTree, diff_trees, invalidate_cache_tree, subtree_hash
+
+# commit: the commit checked out
+# branch: the branch HEAD now points to, or None if it is detached
+# updated: names of the files written
+# removed: names of the files deleted
+CheckoutResult = namedtuple("CheckoutResult", "commit branch updated removed")
+
+class LocalChangesError(ValueError):
+    """
+    Raised when a checkout (or merge) would overwrite changes that are not
+    committed.
+    """
+
+    def __init__(self, paths, action="checkout"):
+        self.paths = paths
+        super().__init__(f"Your local changes to the following files would be overwritten by {action}:")
+
+def run(target, repo_dir=".pygit", jobs=None, force=False, branch_only=False):
+    """
+    Check out a branch or commit: see checkout().
+    """
+    try:
+        result = checkout(get_repo_path(repo_dir), target, jobs=jobs, force=force,
+                          branch_only=branch_only)
+    except LocalChangesError as e:
+        print(f"Error: {e}")
+        for path in e.paths:
+            print(f"  {path}")
+        print("Commit or stage them, or use --force to discard them. Aborting.")
+        return
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    changed = len(result.updated) + len(result.removed)
+    if result.branch is not None:
+        print(f"Switched to branch '{result.branch}' ({changed} file(s) updated).")
+    else:
+        print(f"HEAD is now at {result.commit[:7]} ({changed} file(s) updated).")
+
+def checkout(repo_path: Path, target: str, jobs=None, force=False, branch_only=False) -> CheckoutResult:
+    """
+    Make the working tree and index match a commit and point HEAD at it, or
+    at the branch if target names one.
+
+    Only the paths that differ between the current HEAD tree and the target
+    tree are touched: subtrees with the same hash are skipped without being
+    read. Blobs are decompressed and written by a pool of `jobs` threads,
+    each into a temporary file that is renamed into place, so a file is
+    never seen half-written. The index entries of written files get fresh
+    stat data in the same pass, so the next status does not rehash them.
+
+    In a sparse checkout, only paths inside the cone are written; the
+    entries of the others are updated in the index, a collapsed directory
+    entry getting the hash of its tree in the target commit.
+
+    Raises LocalChangesError, without changing anything, if a path to be
+    touched has staged or unstaged changes or is an untracked file, unless
+    force is set; raises ValueError if target names no commit.
+    """
+    branch = target if (repo_path / "refs" / "heads" / target).is_file() else None
+    if branch_only and branch is None:
+        raise ValueError(f"'{target}' is not a branch.")
+    commit_hash = resolve_commit(repo_path, target)
+    if commit_hash is None:
+        raise ValueError(f"'{target}' is not a branch or commit.")
+
+    head = resolve_commit(repo_path, "HEAD")
+    with locked_index(repo_path, partial=True) as index:
+        changes = list(tree_changes(repo_path, head, commit_hash))
+        updated, removed = update_worktree(repo_path, index, changes, load_commit_tree(repo_path, commit_hash),
+                                           jobs=jobs, force=force)
+
+    head_file = repo_path / "HEAD"
+    head_file.write_text(f"ref: refs/heads/{branch}\n" if branch is not None else commit_hash)
+    return CheckoutResult(commit_hash, branch, updated, removed)
+
+def update_worktree(repo_path: Path, index, changes: list, target, jobs=None, force=False,
+                    action="checkout") -> tuple:
+    """
+    Apply (path, old blob hash, new blob hash) changes between HEAD and a
+    target tree to the working tree and to index, and return the names of
+    the files written and removed. target maps the target's paths to blob
+    hashes (a LazyTree, or a dict for commits without trees) and is only
+    used for directories collapsed by a sparse checkout.
+
+    Raises LocalChangesError, without changing anything, if a path to be
+    touched has local changes, unless force is set.
+    """
+    cone = load_sparse(repo_path)
+    if cone is not None:
+        changes = _update_sparse(repo_path, index, cone, changes, target)
+    if not force:
+        conflicts = _local_changes(repo_path, index, changes)
+        if conflicts:
+            raise LocalChangesError(conflicts, action)
+
+    repo_root = repo_path.resolve().parent
+    removed = [path for path, _, new in changes if new is None]
+    with trace.span(f"{action}: remove files"):
+        for path in removed:
+            remove_file(repo_root, path)
+            index.pop(path, None)
+
+    mode = file_mode()
+    to_write = [(path, new) for path, _, new in changes if new is not None]
+    with trace.span(f"{action}: write files"), ThreadPoolExecutor(max_workers=jobs) as pool:
+        written = pool.map(lambda item: write_file(repo_path, repo_root, *item, mode), to_write)
+        for (path, blob_hash), st in zip(to_write, written):
+            index[path] = make_entry(blob_hash, st)
+    invalidate_cache_tree(index, [path for path, _, _ in changes])
+    return [path for path, _ in to_write], removed
+
+def tree_changes(repo_path: Path, old_commit, new_commit):
+    """
+    Yield (path, old blob hash, new blob hash) for the files that differ
+    between two commits, either of which may be None for an empty tree.
+    """
+    old_tree = (load_commit(repo_path, old_commit) or {}).get("tree")
+    new_tree = (load_commit(repo_path, new_commit) or {}).get("tree")
+    if (old_tree or not old_commit) and (new_tree or not new_commit):
+        yield from diff_trees(repo_path, old_tree, new_tree)
+        return
+    # Commits written before trees existed only have a flat file list
+    old = dict(load_commit_tree(repo_path, old_commit))
+    new = dict(load_commit_tree(repo_path, new_commit))
+    for path in sorted(set(old) | set(new)):
+        if old.get(path) != new.get(path):
+            yield path, old.get(path), new.get(path)
+
+def _update_sparse(repo_path: Path, index, cone, changes: list, target) -> list:
+    """
+    Update the index entries of the changes outside the sparse-checkout
+    cone, which have no working file, and return the other changes.
+    """
+    inside = []
+    outside = []
+    collapsed = set()
+    for path, old, new in changes:
+        entry = index.get(path)
+        if cone.includes(path) or (entry is not None and not entry.get("skip_worktree")):
+            inside.append((path, old, new))
+            continue
+        outside.append(path)
+        if entry is not None or cone.collapsed_dir(path) + "/" not in index:
+            if new is None:
+                index.pop(path, None)
+            else:
+                index[path] = {"hash": new, "skip_worktree": True}
+        else:
+            collapsed.add(cone.collapsed_dir(path))
+
+    for directory in collapsed:
+        index.pop(directory + "/", None)
+        if isinstance(target, LazyTree):
+            tree_hash = subtree_hash(repo_path, target.hash, directory)
+            if tree_hash is not None:
+                index[directory + "/"] = {"hash": tree_hash, "skip_worktree": True}
+        else:
+            # Commits written before trees existed: one entry per file
+            for path, blob_hash in target.items():
+                if path.startswith(directory + "/"):
+                    index[path] = {"hash": blob_hash, "skip_worktree": True}
+    invalidate_cache_tree(index, outside)
+    return inside
+
+def _local_changes(repo_path: Path, index, changes) -> list:
+    """
+    Return the paths among changes whose index entry or working file differs
+    from the current HEAD, so checking them out would lose work.
+    """
+    repo_root = repo_path.resolve().parent
+    index_mtime = index_mtime_ns(repo_path)
+    conflicts = []
+    for path, old, new in changes:
+        entry = index.get(path)
+        if (entry["hash"] if entry else None) != old:
+            conflicts.append(path)
+            continue
+        file_path = repo_root / path
+        try:
+            st = file_path.stat()
+        except (FileNotFoundError, NotADirectoryError):
+            continue  # Already deleted: nothing to lose
+        if file_path.is_dir():
+            if any(file_path.iterdir()):
+                conflicts.append(path)
+        elif entry is None:
+            if hash_file(file_path) != new:
+                conflicts.append(path)  # Untracked file in the way
+        elif not is_stat_clean(entry, st, index_mtime) and hash_file(file_path) != old:
+            conflicts.append(path)
+    return conflicts
+
+def remove_file(repo_root: Path, path: str) -> None:
+    """
+    Delete a file, then any directories left empty by its removal.
+    """
+    file_path = repo_root / path
+    try:
+        file_path.unlink()
+    except FileNotFoundError:
+        return
+    parent = file_path.parent
+    while parent != repo_root:
+        try:
+            parent.rmdir()
+        except OSError:
+            break
+        parent = parent.parent
+
+def file_mode() -> int:
+    """
+    The mode of a newly created file under the current umask.
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+def write_file(repo_path: Path, repo_root: Path, path: str, blob_hash: str, mode: int) -> os.stat_result:
+    """
+    Write a blob to path through a temporary file in the same directory,
+    renamed into place once complete, and return the file's stat data.
+    """
+    file_path = repo_root / path
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    if file_path.is_dir():
+        file_path.rmdir()  # An empty directory left where a file now goes
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=".pygit-tmp-")
+    try:
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, "wb") as out:
+            blocks = iter_object(repo_path, blob_hash)
+            next(blocks)  # The object type
+            for block in blocks:
+                out.write(block)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return file_path.stat()
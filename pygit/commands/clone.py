@@ -0,0 +1,135 @@
+import os
+import shutil
+from collections import namedtuple
+from pathlib import Path
+from pygit.commands.bundle import branch_name
+from pygit.commands.checkout import tree_changes, update_worktree
+from pygit.commands.init import create_repository
+from pygit.core.bundle import read_bundle
+from pygit.core.chunking import CHUNKED_FILE
+from pygit.core.commit_graph import graph_dir
+from pygit.core.index import locked_index
+from pygit.core.objects import load_commit_tree
+from pygit.core.repo import resolve_commit
+from pygit.core.trace import traced
+
+# path: the new working tree
+# commit: the commit checked out, or None if the source had no commits
+# linked, copied: how many object, commit and commit-graph files were
+# hardlinked and copied (bundles are unpacked, so both are 0)
+CloneResult = namedtuple("CloneResult", "path commit linked copied")
+
+def run(source, dest=None, jobs=None, repo_dir=".pygit"):
+    """
+    Make a new repository in dest from a local repository or a bundle and
+    check out its HEAD: see clone().
+    """
+    try:
+        result = clone(Path(source), Path(dest) if dest else None, jobs=jobs, repo_dir=repo_dir)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        return
+    if result.linked or result.copied:
+        print(f"Cloned into '{result.path}' ({result.linked} file(s) hardlinked, {result.copied} copied).")
+    else:
+        print(f"Cloned into '{result.path}'.")
+
+def clone(source: Path, dest: "Path | None" = None, jobs=None, repo_dir: str = ".pygit") -> CloneResult:
+    """
+    Create dest (named after source by default) with a repository holding
+    everything in source, then check out its HEAD with `jobs` threads.
+
+    source is a working tree, a repository directory or a bundle file. From
+    a repository, objects, packs, commits and commit-graph layers are never
+    changed once written, so they are hardlinked rather than copied: the
+    clone takes no extra space for them and costs one link per file
+    whatever their size. Where links are impossible (another filesystem),
+    the files are copied. Branches and HEAD are copied as they are.
+
+    Raises ValueError if source is not a repository or bundle or if dest
+    exists and is not empty.
+    """
+    if source.is_file():
+        source_repo = None
+    elif (source / repo_dir / "HEAD").is_file():
+        source_repo = source / repo_dir
+    elif (source / "HEAD").is_file():
+        source_repo = source
+    else:
+        raise ValueError(f"'{source}' is not a pygit repository or bundle.")
+    if dest is None:
+        name = source.resolve().parent.name if source_repo == source else source.resolve().name
+        dest = Path(name.removesuffix(".bundle") if source_repo is None else name)
+    if dest.exists() and (not dest.is_dir() or any(dest.iterdir())):
+        raise ValueError(f"'{dest}' already exists and is not empty.")
+
+    existed = dest.exists()
+    repo_path = dest / repo_dir
+    try:
+        create_repository(repo_path)
+        if source_repo is None:
+            linked = copied = 0
+            _unbundle(repo_path, source)
+        else:
+            linked, copied = _link_files(source_repo, repo_path)
+            for name in ("HEAD", CHUNKED_FILE):
+                if (source_repo / name).is_file():
+                    shutil.copyfile(source_repo / name, repo_path / name)
+            shutil.copytree(source_repo / "refs", repo_path / "refs", dirs_exist_ok=True)
+    except BaseException:
+        shutil.rmtree(dest, ignore_errors=True)
+        if existed:
+            dest.mkdir()
+        raise
+
+    commit_hash = resolve_commit(repo_path, "HEAD")
+    if commit_hash is not None:
+        with locked_index(repo_path, partial=True) as index:
+            update_worktree(repo_path, index, list(tree_changes(repo_path, None, commit_hash)),
+                            load_commit_tree(repo_path, commit_hash), jobs=jobs, force=True, action="clone")
+    return CloneResult(dest, commit_hash, linked, copied)
+
+def _unbundle(repo_path: Path, bundle_path: Path) -> None:
+    """
+    Read a bundle into a new repository and create its branches, with HEAD
+    on master if the bundle has it, or else on its first branch.
+    """
+    names = []
+    for ref, commit_hash in read_bundle(repo_path, bundle_path).refs.items():
+        name = branch_name(ref)
+        if name is not None:
+            ref_path = repo_path / "refs" / "heads" / name
+            ref_path.parent.mkdir(parents=True, exist_ok=True)
+            ref_path.write_text(commit_hash)
+            names.append(name)
+    if names and "master" not in names:
+        (repo_path / "HEAD").write_text(f"ref: refs/heads/{names[0]}\n")
+
+@traced
+def _link_files(source_repo: Path, repo_path: Path) -> tuple[int, int]:
+    """
+    Hardlink (or copy) the objects, packs, commits and commit-graph of one
+    repository into another, and return how many files were linked and
+    copied. Files are only ever replaced by renaming a new file over them,
+    never rewritten, so a link keeps the content it was made with.
+    """
+    linked = copied = 0
+    can_link = True
+    for directory in ("objects", "commits", graph_dir(source_repo).name):
+        for root, _, names in os.walk(source_repo / directory):
+            target_dir = os.path.join(repo_path, os.path.relpath(root, source_repo))
+            os.makedirs(target_dir, exist_ok=True)
+            for name in names:
+                if name.startswith("tmp_"):
+                    continue  # Left behind by an interrupted write
+                source, target = os.path.join(root, name), os.path.join(target_dir, name)
+                if can_link:
+                    try:
+                        os.link(source, target)
+                        linked += 1
+                        continue
+                    except OSError:
+                        can_link = False
+                shutil.copyfile(source, target)
+                copied += 1
+    return linked, copied
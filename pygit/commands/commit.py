@@ -1,29 +1,65 @@
 import time
-from pygit.core.index import load_index, clear_index
-from pygit.core.objects import generate_commit_hash, save_commit
-from pygit.core.repo import get_repo_path, get_parent_commit, update_head
+from pathlib import Path
+from pygit.core.commit_graph import append_commit
+from pygit.core.index import locked_index
+from pygit.core.merge import clear_merge_state, load_merge_state
+from pygit.core.objects import generate_commit_hash, save_commit, load_commit
+from pygit.core.repo import get_repo_path, get_head_commit_hash, update_head
+from pygit.core.tree import write_tree
 
 def run(message, repo_dir=".pygit"):
+    try:
+        commit_hash = create_commit(get_repo_path(repo_dir), message)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    if commit_hash is None:
+        print("Nothing to commit.")
+    else:
+        print(f"Committed as {commit_hash}")
+
+def create_commit(repo_path: Path, message: str):
     """
-    Commit staged changes.
-    """
-    repo_path = get_repo_path(repo_dir)
-    index = load_index(repo_path)
+    Commit staged changes and return the new commit's hash, or None if
+    nothing is staged or nothing changed since HEAD.
 
-    if not index:
-        print("Nothing to commit.")
-        return
+    The index is written out as tree objects, one per directory, and the
+    commit records the root tree. Trees of directories without staged changes
+    are reused from the index's cache-tree, so the cost of a commit scales
+    with the size of the change.
+
+    While a merge is in progress (see pygit/core/merge.py), the commit gets
+    the merged commit as its second parent, and ends the merge. Raises
+    ValueError while a conflicted file has not been added since the merge.
+    """
+    # The index stays locked until HEAD points at the commit, so gc, which
+    # takes the same lock to prune, never sees its trees unreferenced
+    with locked_index(repo_path) as index:
+        if not index:
+            return None
+        tree_hash = write_tree(repo_path, index)
 
-    commit_data = {
-        "message": message,
-        "timestamp": time.time(),
-        "parent": get_parent_commit(repo_path),
-        "files": index,
-    }
+        parent = get_head_commit_hash(repo_path)
+        parent_commit = load_commit(repo_path, parent)
+        merging = load_merge_state(repo_path)
+        if merging is None and parent_commit is not None and parent_commit.get("tree") == tree_hash:
+            return None
 
-    commit_hash = generate_commit_hash(commit_data)
-    save_commit(repo_path, commit_hash, commit_data)
-    update_head(repo_path, commit_hash)
-    clear_index(repo_path)
+        commit_data = {
+            "message": message,
+            "timestamp": time.time(),
+            "parent": parent,
+            "tree": tree_hash,
+        }
+        if merging is not None:
+            merged, unresolved = merging
+            if unresolved:
+                raise ValueError(f"Fix the conflicts in {', '.join(unresolved)} and add them before committing.")
+            commit_data["parents"] = [p for p in (parent, merged) if p]
 
-    print(f"Committed as {commit_hash}")
+        commit_hash = generate_commit_hash(commit_data)
+        save_commit(repo_path, commit_hash, commit_data)
+        append_commit(repo_path, commit_hash, commit_data)
+        update_head(repo_path, commit_hash)
+        clear_merge_state(repo_path)
+    return commit_hash
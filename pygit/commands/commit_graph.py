@@ -0,0 +1,17 @@
+from pygit.core.commit_graph import load_commit_graph, write_commit_graph
+from pygit.core.repo import get_repo_path
+
+def run(action="write", repo_dir=".pygit"):
+    """
+    Maintain the commit-graph. "write" rebuilds it from the branches and
+    computes the changed-path filters missing for older commits, e.g. ones
+    made before filters existed, so that `log -- <path>` can skip them.
+    """
+    repo_path = get_repo_path(repo_dir)
+    if action != "write":
+        print(f"Unknown commit-graph action: {action}")
+        return
+    total = write_commit_graph(repo_path, changed_paths=True)
+    graph = load_commit_graph(repo_path)
+    filtered = sum(1 for layer in graph.layers for row in layer if row["bloom"] is not None)
+    print(f"Wrote {total} commit(s) to the commit-graph, {filtered} with changed-path filters.")
@@ -0,0 +1,223 @@
+import sys
+from collections import namedtuple
+from pathlib import Path
+from pygit.commands.status import merge_join
+from pygit.core import stats
+from pygit.core.diff import unified_diff
+from pygit.core.index import load_index_entries, index_mtime_ns, is_stat_clean
+from pygit.core.hashing import hash_file
+from pygit.core.objects import BLOCK_SIZE, load_commit, load_commit_tree, open_object, read_object
+from pygit.core.renames import detect_renames
+from pygit.core.repo import get_repo_path, get_head_commit_hash, resolve_commit
+from pygit.core.tree import LazyTree, diff_trees, load_cache_tree
+
+class Change(namedtuple("Change", "path old new")):
+    """
+    A changed file: its path and its old and new contents, with None for a
+    side where the file does not exist. If the file was renamed or copied,
+    path is its new path and rename is the Rename describing the move.
+    """
+    rename = None
+
+def run(commits=(), cached=False, context=3, renames=True, copies=False, repo_dir=".pygit"):
+    """
+    Show changes as unified diffs:
+
+    - with no commits, between the index and the working tree;
+    - with cached=True, between HEAD and the index;
+    - with two commits, between those commits.
+
+    Unchanged files are skipped by comparing hashes (and, for the working
+    tree, stat data) without reading their contents, and output is printed
+    as it is produced. Renamed files, and with copies=True copied files,
+    are shown as such when comparing HEAD, the index or commits.
+    """
+    stats.reset()
+    try:
+        changes = _iter_changes(get_repo_path(repo_dir), commits, cached, renames, copies)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    for path, old, new, rename in changes:
+        for line in file_diff(path, old, new, context, rename):
+            print(line)
+    if stats.get("renames_skipped"):
+        print(f"warning: inexact rename detection was skipped for {stats.get('renames_skipped')} "
+              "file(s); set PYGIT_RENAME_LIMIT to raise the limit.", file=sys.stderr)
+
+def get_changes(repo_path: Path, commits=(), cached=False, renames=True, copies=False):
+    """
+    Return an iterator of Change (path, old contents, new contents) for the
+    files that differ, with None for a side where the file does not exist.
+    Unless renames is False, removed and added files are paired into renames
+    when comparing trees (see detect_renames), and with copies=True, added
+    files are also matched against changed files as copies. Raises
+    ValueError if commits are given but don't name two commits.
+    """
+    return (_loaded(*change) for change in _iter_changes(repo_path, commits, cached, renames, copies))
+
+def _loaded(path: str, old, new, rename) -> Change:
+    change = Change(path, None if old is None else b"".join(old), None if new is None else b"".join(new))
+    change.rename = rename
+    return change
+
+def _iter_changes(repo_path: Path, commits=(), cached=False, renames=True, copies=False):
+    """
+    Return an iterator of (path, old blocks, new blocks, rename) for the
+    files that differ, like get_changes, but with each content an iterator
+    over its blocks that opens the blob or file on the first read.
+    """
+    if commits:
+        if len(commits) != 2:
+            raise ValueError("diff takes either no commits or two commits.")
+        hashes = [resolve_commit(repo_path, name) for name in commits]
+        for name, commit_hash in zip(commits, hashes):
+            if commit_hash is None:
+                raise ValueError(f"'{name}' is not a commit.")
+        changes = _commit_changes(repo_path, *hashes)
+    elif cached:
+        changes = _cached_changes(repo_path)
+    else:
+        return _worktree_changes(repo_path)
+    if renames:
+        return _blob_changes(repo_path, *_find_renames(repo_path, changes, copies))
+    return _blob_changes(repo_path, changes)
+
+def file_diff(path: str, old, new, context: int = 3, rename=None):
+    """
+    Yield the diff lines for one file, given its old and new contents as
+    bytes or iterables of blocks, or None where the file does not exist, and
+    the Rename if it was renamed or copied to path.
+    """
+    old_path = rename.old if rename else path
+    yield f"diff --pygit a/{old_path} b/{path}"
+    if rename:
+        action = "copy" if rename.copied else "rename"
+        yield f"similarity index {rename.similarity}%"
+        yield f"{action} from {rename.old}"
+        yield f"{action} to {path}"
+    elif old is None:
+        yield "new file"
+    elif new is None:
+        yield "deleted file"
+    old_name = f"a/{old_path}" if old is not None else "/dev/null"
+    new_name = f"b/{path}" if new is not None else "/dev/null"
+    yield from unified_diff(b"" if old is None else old, b"" if new is None else new,
+                            old_name, new_name, context)
+
+def _blob(repo_path: Path, blob_hash):
+    return None if blob_hash is None else read_object(repo_path, blob_hash)[1]
+
+def _blob_blocks(repo_path: Path, blob_hash: str):
+    yield from open_object(repo_path, blob_hash)[2]
+
+def _file_blocks(path: Path):
+    with path.open("rb") as f:
+        while block := f.read(BLOCK_SIZE):
+            yield block
+
+def _blob_changes(repo_path: Path, changes, renames=None):
+    """
+    Turn (path, old hash, new hash) changes into (path, old blocks, new
+    blocks, rename). renames maps the new path of each renamed or copied
+    file to its Rename.
+    """
+    for path, old_hash, new_hash in changes:
+        yield (path, None if old_hash is None else _blob_blocks(repo_path, old_hash),
+               None if new_hash is None else _blob_blocks(repo_path, new_hash), (renames or {}).get(path))
+
+def _find_renames(repo_path: Path, changes, copies: bool):
+    """
+    Pair the removed and added files in (path, old hash, new hash) changes
+    into renames. Returns the changes, with each renamed pair merged into a
+    change at its new path, and the Rename of each such path.
+    """
+    changes = list(changes)
+    removed = {path: old for path, old, new in changes if new is None}
+    added = {path: new for path, old, new in changes if old is None}
+    copy_sources = {path: old for path, old, new in changes if old and new} if copies else None
+    if not added or not (removed or copy_sources):
+        return changes, {}
+
+    def read(path, blob_hash):
+        return _blob(repo_path, blob_hash)
+
+    renames = {rename.new: rename for rename in detect_renames(removed, added, read, read, copy_sources)}
+    old_hashes = {**removed, **(copy_sources or {})}
+    moved = {rename.old for rename in renames.values() if not rename.copied}
+    merged = []
+    for path, old, new in changes:
+        if path in moved:
+            continue
+        if path in renames:
+            old = old_hashes[renames[path].old]
+        merged.append((path, old, new))
+    return merged, renames
+
+def _map_changes(old: dict, new: dict):
+    """
+    Yield (path, old hash, new hash) for paths that differ between two
+    mappings of path to blob hash.
+    """
+    for path in sorted(set(old) | set(new)):
+        if old.get(path) != new.get(path):
+            yield path, old.get(path), new.get(path)
+
+def _commit_changes(repo_path: Path, old_commit: str, new_commit: str):
+    old_tree = (load_commit(repo_path, old_commit) or {}).get("tree")
+    new_tree = (load_commit(repo_path, new_commit) or {}).get("tree")
+    if old_tree and new_tree:
+        changes = diff_trees(repo_path, old_tree, new_tree)
+    else:
+        # Commits written before trees existed only have a flat file list
+        changes = _map_changes(dict(load_commit_tree(repo_path, old_commit)),
+                               dict(load_commit_tree(repo_path, new_commit)))
+    return changes
+
+def _cached_changes(repo_path: Path):
+    """
+    Yield (path, HEAD hash, index hash) for each staged change, merging the
+    HEAD tree with the index in path order without writing any object.
+    Directories whose cache-tree matches HEAD are skipped without being
+    read, like in status.
+    """
+    index = load_index_entries(repo_path)
+    committed = load_commit_tree(repo_path, get_head_commit_hash(repo_path))
+    if isinstance(committed, LazyTree):
+        head = committed.walk_against(index, load_cache_tree(index))
+    else:
+        head = iter(sorted(committed.items()))
+    staged = ((path, index[path]["hash"]) for path in sorted(index))
+    same_dir = None  # A directory holding the same files at HEAD and in the index
+    for path, (head_hash, index_hash) in merge_join(head, staged):
+        if index_hash is None and (not path or path.endswith("/")):
+            same_dir = path
+            continue
+        if same_dir is not None and path.startswith(same_dir):
+            continue
+        if path.endswith("/"):
+            # A directory outside the sparse-checkout cone, kept as its tree
+            yield from diff_trees(repo_path, head_hash, index_hash, path)
+        elif head_hash != index_hash:
+            yield path, head_hash, index_hash
+
+def _worktree_changes(repo_path: Path):
+    repo_root = repo_path.resolve().parent
+    index = load_index_entries(repo_path)
+    index_mtime = index_mtime_ns(repo_path)
+    for path in sorted(index):
+        entry = index[path]
+        if entry.get("skip_worktree"):
+            continue  # Outside the sparse-checkout cone
+        file_path = repo_root / path
+        try:
+            st = file_path.stat()
+            if is_stat_clean(entry, st, index_mtime):
+                continue
+            file_hash = hash_file(file_path)
+        except OSError:
+            # Deleted, or no longer a file (or below one)
+            yield path, _blob_blocks(repo_path, entry["hash"]), None, None
+            continue
+        if file_hash != entry["hash"]:
+            yield path, _blob_blocks(repo_path, entry["hash"]), _file_blocks(file_path), None
@@ -0,0 +1,55 @@
+import os
+import time
+from pygit.core import fsmonitor
+from pygit.core.fsmonitor_daemon import FSMonitor
+from pygit.core.repo import get_repo_path
+
+def run(action="status", repo_dir=".pygit"):
+    """
+    Manage the filesystem monitor daemon: "start" it in the background,
+    "run" it in the foreground, "stop" it, or show its "status".
+    """
+    repo_path = get_repo_path(repo_dir)
+    running = fsmonitor.request(repo_path, {"token": None}) is not None
+
+    if action == "status":
+        print("Filesystem monitor is running." if running else "Filesystem monitor is not running.")
+    elif action == "stop":
+        if running:
+            fsmonitor.request(repo_path, {"command": "stop"})
+            print("Filesystem monitor stopped.")
+        else:
+            print("Filesystem monitor is not running.")
+    elif action in ("start", "run"):
+        if running:
+            print("Filesystem monitor is already running.")
+        elif action == "run":
+            FSMonitor(repo_path).serve_forever()
+        else:
+            _start(repo_path)
+    else:
+        print(f"Unknown fsmonitor action: {action}")
+
+def _start(repo_path) -> None:
+    """
+    Start the daemon in a detached child process and wait until it answers.
+    """
+    if os.fork() == 0:
+        os.setsid()
+        if os.fork() == 0:
+            devnull = os.open(os.devnull, os.O_RDWR)
+            for fd in (0, 1, 2):
+                os.dup2(devnull, fd)
+            try:
+                FSMonitor(repo_path).serve_forever()
+            finally:
+                os._exit(0)
+        os._exit(0)
+    os.wait()
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        if fsmonitor.request(repo_path, {"token": None}) is not None:
+            print("Filesystem monitor started.")
+            return
+        time.sleep(0.05)
+    print("Error: the filesystem monitor did not start.")
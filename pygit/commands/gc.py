@@ -0,0 +1,237 @@
+import json
+import os
+import re
+import time
+from pygit.core import cache
+from pygit.core.commit_graph import load_commit_graph, write_commit_graph
+from pygit.core.repo import get_repo_path
+from pygit.core.index import index_lock, load_index
+from pygit.core.objects import iter_loose_objects, object_header, object_path, read_object, write_object
+from pygit.core.pack import load_packs, write_pack
+from pygit.core.reachability import mark_reachable
+from pygit.core.tree import read_tree
+
+# Unreachable data younger than this is kept by default, as by git gc, so
+# that objects an add or commit has just written are never pruned
+DEFAULT_PRUNE = "2.weeks.ago"
+
+AGE_UNITS = {
+    "s": 1, "sec": 1, "second": 1,
+    "m": 60, "min": 60, "minute": 60,
+    "h": 3600, "hour": 3600,
+    "d": 86400, "day": 86400,
+    "w": 7 * 86400, "week": 7 * 86400,
+}
+
+# Temporary files left behind by interrupted writes
+TEMP_PREFIXES = ("tmp_obj_", "tmp_pack_", "tmp_idx_", "tmp_graph_", "tmp_chain_")
+
+def parse_age(age: str):
+    """
+    Return the grace period in seconds given by a --prune age such as
+    "2.weeks.ago", "3d" or "now", or None for "never". Raises ValueError for
+    anything else.
+    """
+    if age == "never":
+        return None
+    if age == "now":
+        return 0
+    match = re.fullmatch(r"(\d+)\.?([a-z]+?)s?(?:\.ago)?", age)
+    if match is None or match.group(2) not in AGE_UNITS:
+        raise ValueError(f"Invalid prune age '{age}': use e.g. now, 30m, 3d or 2.weeks.ago.")
+    return int(match.group(1)) * AGE_UNITS[match.group(2)]
+
+def run(repo_dir=".pygit", prune=DEFAULT_PRUNE):
+    """
+    Pack all reachable objects (loose and previously packed) into a single
+    packfile with delta compression, then remove the loose copies and old
+    packs. Unless prune is "never", objects and commits that are not
+    reachable from the branches, HEAD or the index and are older than the
+    prune age are deleted.
+
+    Reachability is marked once before packing and again, for only what was
+    added in the meantime, while holding the index lock. add and commit hold
+    the same lock until everything they write is referenced, so nothing
+    they write can be pruned, even with --prune=now.
+    """
+    repo_path = get_repo_path(repo_dir)
+    try:
+        grace = parse_age(prune)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    cutoff = time.time() - (grace or 0)
+    size_before = _disk_usage(repo_path)
+
+    marked = mark_reachable(repo_path) if grace is not None else None
+    pack_path, packed, old_packs, candidates = _repack(repo_path, marked and marked[1], cutoff)
+
+    with index_lock(repo_path):
+        if marked is not None:
+            commits, objects = mark_reachable(repo_path, *marked)
+            # Unreachable packed objects only go with their pack; any that
+            # became reachable while packing are kept as loose objects
+            for pack, obj_hash in candidates:
+                if obj_hash in objects:
+                    _unpack(repo_path, pack, obj_hash)
+        for pack in old_packs:
+            if pack.path != pack_path:
+                pack.path.with_suffix(".idx").unlink()
+                pack.path.unlink()
+        if marked is not None:
+            pruned_objects, pruned_commits = _prune(repo_path, commits, objects, cutoff)
+            cache.objects.clear()
+
+    size_after = _disk_usage(repo_path)
+    if pack_path is not None:
+        print(f"Packed {packed} objects into {pack_path.name}.")
+    else:
+        print("Nothing to pack.")
+    if marked is not None:
+        dropped = len(candidates) - sum(1 for _, h in candidates if h in objects)
+        print(f"Pruned {pruned_objects + dropped} unreachable object(s) and {pruned_commits} commit(s).")
+    print(f"Repository size: {size_before // 1024} KiB -> {size_after // 1024} KiB "
+          f"({max(0, size_before - size_after) // 1024} KiB reclaimed).")
+
+def _repack(repo_path, reachable, cutoff: float):
+    """
+    Write the objects in reachable (or all objects, if it is None) that are
+    loose or in the current packs into a new pack, and delete the loose
+    copies. Unreachable objects are left out: loose ones stay loose, and
+    packed ones are written out loose if their pack is younger than cutoff,
+    or else returned as (pack, hash) candidates for pruning.
+
+    Returns (new pack path or None, objects packed, old packs, candidates).
+    """
+    old_packs = load_packs(repo_path)
+    loose = list(iter_loose_objects(repo_path))
+
+    paths = _path_hints(repo_path)
+    objects = {}
+    for obj_hash in loose:
+        if reachable is None or obj_hash in reachable:
+            obj_type, size = object_header(repo_path, obj_hash)
+            objects[obj_hash] = (obj_hash, obj_type, size, paths.get(obj_hash, ""))
+    candidates = []
+    for pack in old_packs:
+        recent = pack.path.stat().st_mtime >= cutoff
+        for obj_hash in pack.index:
+            if obj_hash in objects:
+                continue
+            if reachable is not None and obj_hash not in reachable:
+                if recent:
+                    _unpack(repo_path, pack, obj_hash)
+                else:
+                    candidates.append((pack, obj_hash))
+                continue
+            obj_type, size = pack.object_header(obj_hash)
+            objects[obj_hash] = (obj_hash, obj_type, size, paths.get(obj_hash, ""))
+
+    if not objects:
+        return None, 0, old_packs, candidates
+    pack_path = write_pack(repo_path / "objects" / "pack", list(objects.values()),
+                           lambda obj_hash: read_object(repo_path, obj_hash, expand=False)[1])
+
+    # The new pack is complete, so the loose copies of its objects are redundant
+    for obj_hash in loose:
+        if obj_hash in objects:
+            _remove_loose(repo_path, obj_hash)
+    return pack_path, len(objects), old_packs, candidates
+
+def _unpack(repo_path, pack, obj_hash) -> None:
+    """
+    Write a packed object out as a loose one, dated like its pack so that
+    it expires when the pack would have.
+    """
+    obj_type, content = pack.read(obj_hash)
+    write_object(repo_path, content, obj_type, loose=True, obj_hash=obj_hash)
+    mtime = pack.path.stat().st_mtime
+    os.utime(object_path(repo_path, obj_hash), (mtime, mtime))
+
+def _remove_loose(repo_path, obj_hash) -> int:
+    """
+    Delete a loose object, and its shard directory if now empty. Returns
+    the bytes freed.
+    """
+    path = object_path(repo_path, obj_hash)
+    size = path.stat().st_size
+    path.unlink()
+    if not any(path.parent.iterdir()):
+        path.parent.rmdir()
+    return size
+
+def _prune(repo_path, commits: set, objects: set, cutoff: float) -> tuple[int, int]:
+    """
+    Delete loose objects and commits that are unreachable and older than
+    cutoff, along with stale temporary files. Returns the number of objects
+    and commits deleted.
+    """
+    pruned_objects = 0
+    for obj_hash in list(iter_loose_objects(repo_path)):
+        path = object_path(repo_path, obj_hash)
+        if obj_hash not in objects and path.stat().st_mtime < cutoff:
+            _remove_loose(repo_path, obj_hash)
+            pruned_objects += 1
+
+    pruned_commits = 0
+    in_graph = False
+    graph = load_commit_graph(repo_path)
+    commits_dir = repo_path / "commits"
+    if commits_dir.exists():
+        for commit_file in commits_dir.glob("*.json"):
+            if commit_file.stem not in commits and commit_file.stat().st_mtime < cutoff:
+                in_graph = in_graph or commit_file.stem in graph
+                commit_file.unlink()
+                pruned_commits += 1
+    if in_graph:
+        write_commit_graph(repo_path)
+
+    for directory in (repo_path / "objects", repo_path / "objects" / "pack", repo_path / "commit-graph"):
+        if directory.exists():
+            for path in directory.iterdir():
+                if path.name.startswith(TEMP_PREFIXES) and path.stat().st_mtime < cutoff:
+                    path.unlink()
+    # Written by versions of pygit that staged files as copies
+    staging_dir = repo_path / "staging"
+    if staging_dir.exists():
+        for path in staging_dir.iterdir():
+            path.unlink()
+        staging_dir.rmdir()
+    return pruned_objects, pruned_commits
+
+def _path_hints(repo_path):
+    """
+    Map object hashes to a path they were committed or staged at, so that
+    versions of the same file (or directory) are delta-compressed against
+    each other. Trees shared between commits are only walked once.
+    """
+    paths = {}
+    seen_trees = set()
+
+    def walk(tree_hash, prefix):
+        if tree_hash in seen_trees:
+            return
+        seen_trees.add(tree_hash)
+        paths.setdefault(tree_hash, prefix)
+        for name, (obj_type, obj_hash) in read_tree(repo_path, tree_hash).items():
+            if obj_type == "tree":
+                walk(obj_hash, f"{prefix}{name}/")
+            else:
+                paths.setdefault(obj_hash, f"{prefix}{name}")
+
+    commits_dir = repo_path / "commits"
+    if commits_dir.exists():
+        for commit_file in commits_dir.glob("*.json"):
+            commit = json.loads(commit_file.read_text())
+            if "tree" in commit:
+                walk(commit["tree"], "")
+            for path, blob_hash in commit.get("files", {}).items():
+                paths.setdefault(blob_hash, path)
+    for path, blob_hash in load_index(repo_path).items():
+        paths.setdefault(blob_hash, path)
+    return paths
+
+def _disk_usage(repo_path):
+    return sum(p.stat().st_size
+               for directory in ("objects", "commits", "commit-graph")
+               for p in (repo_path / directory).rglob("*") if p.is_file())
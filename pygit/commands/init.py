@@ -1,19 +1,21 @@
 from pathlib import Path
+from pygit.core.index import save_index
 
 def run(repo_dir=".pygit"):
+    create_repository(Path(repo_dir))
+    print("Initialized empty pygit repository.")
+
+def create_repository(repo_path: Path) -> None:
     """
     Initialize a new pygit repository.
     """
-    repo_path = Path(repo_dir)
     (repo_path / "objects").mkdir(parents=True, exist_ok=True)
     (repo_path / "refs" / "heads").mkdir(parents=True, exist_ok=True)
 
     (repo_path / "HEAD").write_text("ref: refs/heads/master\n")
-    (repo_path / "index").write_text("{}")
+    save_index(repo_path, {})
 
     repo_root = repo_path.parent
     pygitignore_path = repo_root / ".pygitignore"
     if not pygitignore_path.exists():
         pygitignore_path.write_text("# Add files or directories to ignore, one per line\n")
-
-    print("Initialized empty pygit repository.")
@@ -0,0 +1,82 @@
+import time
+from pygit.core import stats
+from pygit.core.bloom import maybe_changed
+from pygit.core.commit_graph import NULL_HASH, get_commit_info, iter_history
+from pygit.core.repo import get_repo_path, get_head_commit_hash
+from pygit.core.tree import read_tree
+
+def run(max_count=None, oneline=False, paths=(), repo_dir=".pygit"):
+    """
+    Show the commit history from HEAD, newest first. Commits are read from
+    the commit-graph and printed as the walk finds them, so the first lines
+    appear immediately even in a long history.
+    """
+    repo_path = get_repo_path(repo_dir)
+    head = get_head_commit_hash(repo_path)
+    if head is None:
+        print("No commits yet.")
+        return
+
+    for shown, info in enumerate(iter_log(repo_path, head, max_count, paths), 1):
+        if oneline:
+            print(f"{info['hash'][:7]} {info['message'].splitlines()[0] if info['message'] else ''}")
+        else:
+            if shown > 1:
+                print()
+            print(f"commit {info['hash']}")
+            if len(info["parents"]) > 1:
+                print(f"Merge: {' '.join(p[:7] for p in info['parents'])}")
+            print(f"Date:   {time.strftime('%a %b %d %H:%M:%S %Y %z', time.localtime(info['timestamp']))}")
+            print()
+            for line in info["message"].splitlines():
+                print(f"    {line}")
+
+def iter_log(repo_path, head: str, max_count=None, paths=()):
+    """
+    Yield the commit-graph info (hash, tree, parents, timestamp, message) of
+    up to max_count commits reachable from head, newest first, skipping
+    those that did not change any of paths.
+    """
+    shown = 0
+    for info in iter_history(repo_path, [head]):
+        if max_count is not None and shown >= max_count:
+            return
+        if paths and not touches_paths(repo_path, info, paths):
+            continue
+        shown += 1
+        yield info
+
+def touches_paths(repo_path, info, paths) -> bool:
+    """
+    Return True if the commit changed anything at or below one of paths
+    compared to its first parent (or, for a root commit, if they exist).
+
+    The commit's changed-path filter rules out most commits without reading
+    anything; otherwise only the trees along each path are read.
+    """
+    bloom = info.get("bloom")
+    if bloom is not None and not any(maybe_changed(bloom, path) for path in paths):
+        stats.increment("commits_skipped")
+        return False
+    parent_tree = None
+    if info["parents"]:
+        parent_tree = get_commit_info(repo_path, info["parents"][0])["tree"]
+    return any(
+        lookup_path(repo_path, info["tree"], path) != lookup_path(repo_path, parent_tree, path)
+        for path in paths
+    )
+
+def lookup_path(repo_path, tree_hash, path):
+    """
+    Return the (type, hash) of the object at path in a tree, or None.
+    """
+    if tree_hash is None or tree_hash == NULL_HASH.hex():
+        return None
+    entry = ("tree", tree_hash)
+    for name in path.strip("/").split("/"):
+        if entry is None or entry[0] != "tree":
+            return None
+        if name in ("", "."):
+            continue
+        entry = read_tree(repo_path, entry[1]).get(name)
+    return entry
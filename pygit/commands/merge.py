@@ -0,0 +1,143 @@
+from collections import namedtuple
+from pathlib import Path
+from pygit.commands.checkout import LocalChangesError, update_worktree
+from pygit.commands.commit import create_commit
+from pygit.core.commit_graph import NULL_HASH, get_commit_info, is_ancestor, merge_bases
+from pygit.core.index import locked_index
+from pygit.core.merge import clear_merge_state, load_merge_state, merge_trees, save_merge_state
+from pygit.core.repo import get_repo_path, resolve_commit, update_head
+from pygit.core.tree import LazyTree, diff_trees, write_tree
+
+# status: "up-to-date", "fast-forward", "merged" or "conflicts"
+# commit: the new HEAD (the merge commit, or the commit fast-forwarded to),
+#         or None if there are conflicts to resolve
+# base: the merge base used, or None
+# updated: names of the files written
+# removed: names of the files deleted
+# conflicts: (path, kind) for each file that could not be merged
+MergeOutcome = namedtuple("MergeOutcome", "status commit base updated removed conflicts")
+
+def run(target=None, repo_dir=".pygit", jobs=None, abort=False):
+    if abort:
+        try:
+            restored = abort_merge(get_repo_path(repo_dir), jobs=jobs)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        print(f"Merge aborted ({len(restored)} file(s) restored).")
+        return
+    try:
+        outcome = merge(get_repo_path(repo_dir), target, jobs=jobs)
+    except LocalChangesError as e:
+        print(f"Error: {e}")
+        for path in e.paths:
+            print(f"  {path}")
+        print("Commit or stage them before merging. Aborting.")
+        return
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    changed = len(outcome.updated) + len(outcome.removed)
+    if outcome.status == "up-to-date":
+        print("Already up to date.")
+    elif outcome.status == "fast-forward":
+        print(f"Fast-forward to {outcome.commit[:7]} ({changed} file(s) updated).")
+    elif outcome.status == "merged":
+        print(f"Merged '{target}' as {outcome.commit} ({changed} file(s) updated).")
+    else:
+        for path, kind in outcome.conflicts:
+            print(f"CONFLICT ({kind}): Merge conflict in {path}")
+        print("Automatic merge failed; fix the conflicts, add the files and commit the result.")
+
+def merge(repo_path: Path, target: str, jobs=None) -> MergeOutcome:
+    """
+    Merge a branch or commit into HEAD.
+
+    If target is already in HEAD's history, nothing happens; if HEAD is in
+    target's history, HEAD is fast-forwarded to it. Otherwise the trees of
+    HEAD and target are merged with the tree of their merge base (see
+    merge_trees) and the working tree is updated like a checkout, touching
+    only the paths the merge changed. Without conflicts the result is
+    committed with both commits as parents; with conflicts, the files are
+    left with conflict markers and the next commit concludes the merge.
+
+    Raises ValueError if target names no commit, a merge is already in
+    progress or changes are staged, and LocalChangesError if the merge
+    would overwrite local changes.
+    """
+    if load_merge_state(repo_path) is not None:
+        raise ValueError("A merge is in progress; commit it first.")
+    theirs = resolve_commit(repo_path, target)
+    if theirs is None:
+        raise ValueError(f"'{target}' is not a branch or commit.")
+    ours = resolve_commit(repo_path, "HEAD")
+    if ours is None:
+        raise ValueError("There are no commits to merge into yet.")
+    if ours == theirs or is_ancestor(repo_path, theirs, ours):
+        return MergeOutcome("up-to-date", ours, theirs, [], [], [])
+
+    ours_tree, theirs_tree = _commit_tree(repo_path, ours), _commit_tree(repo_path, theirs)
+    fast_forward = is_ancestor(repo_path, ours, theirs)
+    bases = [] if fast_forward else merge_bases(repo_path, ours, theirs)
+    base = ours if fast_forward else (bases[0] if bases else None)
+    if fast_forward:
+        result_tree, conflicts = theirs_tree, []
+    else:
+        # With several merge bases (criss-cross merges) the best one is used
+        result = merge_trees(repo_path, _commit_tree(repo_path, base) if base else None,
+                             ours_tree, theirs_tree, labels=("HEAD", target))
+        result_tree, conflicts = result.tree, result.conflicts
+
+    with locked_index(repo_path) as index:
+        if (write_tree(repo_path, index) if index else None) != ours_tree:
+            raise ValueError("Your index has staged changes; commit them before merging.")
+        changes = list(diff_trees(repo_path, ours_tree, result_tree))
+        target_files = LazyTree(repo_path, result_tree) if result_tree else {}
+        updated, removed = update_worktree(repo_path, index, changes, target_files, jobs=jobs, action="merge")
+        # Conflicted files stay staged as they were in HEAD, without stat
+        # data, until their resolution is added
+        ours_files = LazyTree(repo_path, ours_tree) if ours_tree else {}
+        for path, _ in conflicts:
+            if path in ours_files:
+                index[path] = {"hash": ours_files[path]}
+            else:
+                index.pop(path, None)
+
+    if fast_forward:
+        update_head(repo_path, theirs)
+        return MergeOutcome("fast-forward", theirs, base, updated, removed, [])
+    save_merge_state(repo_path, theirs, [path for path, _ in conflicts])
+    if conflicts:
+        return MergeOutcome("conflicts", None, base, updated, removed, conflicts)
+    commit_hash = create_commit(repo_path, f"Merge '{target}'")
+    return MergeOutcome("merged", commit_hash, base, updated, removed, [])
+
+def abort_merge(repo_path: Path, jobs=None) -> list:
+    """
+    Give up the merge in progress: put the index and the files the merge
+    touched back as they are at HEAD, and remove MERGE_HEAD. Returns the
+    paths restored. Raises ValueError if no merge is in progress.
+    """
+    merging = load_merge_state(repo_path)
+    if merging is None:
+        raise ValueError("There is no merge to abort.")
+    head = resolve_commit(repo_path, "HEAD")
+    head_tree = _commit_tree(repo_path, head)
+    target = LazyTree(repo_path, head_tree)
+    with locked_index(repo_path) as index:
+        index_tree = write_tree(repo_path, index) if index else None
+        changes = list(diff_trees(repo_path, index_tree, head_tree))
+        # Unresolved files are staged as at HEAD, but hold the merge's version
+        changed = {path for path, _, _ in changes}
+        changes += [(path, index.get(path, {}).get("hash"), target.get(path))
+                    for path in merging[1] if path not in changed]
+        update_worktree(repo_path, index, changes, target, jobs=jobs, force=True, action="merge")
+    clear_merge_state(repo_path)
+    return sorted(path for path, _, _ in changes)
+
+def _commit_tree(repo_path: Path, commit_hash: str):
+    info = get_commit_info(repo_path, commit_hash)
+    if info["tree"] == NULL_HASH.hex():
+        raise ValueError(f"Commit {commit_hash[:7]} predates trees and cannot be merged.")
+    return info["tree"]
@@ -0,0 +1,19 @@
+from pygit.core.commit_graph import merge_bases
+from pygit.core.repo import get_repo_path, resolve_commit
+
+def run(commits, all_bases=False, repo_dir=".pygit"):
+    """
+    Print the best common ancestor of two commits, or with all_bases, every one
+    of them (there can be several after criss-cross merges).
+    """
+    repo_path = get_repo_path(repo_dir)
+    hashes = [resolve_commit(repo_path, name) for name in commits]
+    for name, commit_hash in zip(commits, hashes):
+        if commit_hash is None:
+            print(f"Error: '{name}' is not a branch or commit.")
+            return
+    bases = merge_bases(repo_path, *hashes)
+    if not bases:
+        print("No common ancestor.")
+    for base in bases if all_bases else bases[:1]:
+        print(base)
@@ -0,0 +1,132 @@
+import sys
+from collections import namedtuple
+from pathlib import Path
+from pygit.commands.checkout import file_mode, remove_file, write_file
+from pygit.core.hashing import hash_file
+from pygit.core.index import locked_index, index_mtime_ns, is_stat_clean, make_entry
+from pygit.core.repo import get_repo_path
+from pygit.core.sparse import SPARSE_FILE, is_sparse_dir, load_sparse
+from pygit.core.tree import LazyTree, invalidate_cache_tree, load_cache_tree, write_tree
+
+# written: names of the files checked out because they are now in the cone
+# removed: names of the files deleted because they are now outside it
+# kept: names of files outside the cone left in place, having local changes
+SparseResult = namedtuple("SparseResult", "written removed kept")
+
+def run(action="list", dirs=(), repo_dir=".pygit"):
+    """
+    Manage the sparse-checkout cone: "set" it to dirs, "add" dirs to it,
+    "list" its directories, or "disable" it to check out every file again.
+    """
+    repo_path = get_repo_path(repo_dir)
+    cone = load_sparse(repo_path)
+    if action == "list":
+        if cone is None:
+            print("Sparse checkout is not enabled.")
+        for directory in sorted(cone.dirs if cone else ()):
+            print(directory)
+        return
+    if action in ("set", "add"):
+        if not dirs and action == "add":
+            print("Error: you must specify a directory to add.")
+            return
+        if action == "add" and cone is not None:
+            dirs = [*cone.dirs, *dirs]
+        cone = set_sparse(repo_path, dirs)
+    elif action == "disable":
+        cone = None
+        (repo_path / SPARSE_FILE).unlink(missing_ok=True)
+    else:
+        print(f"Unknown sparse-checkout action: {action}")
+        return
+
+    result = reapply(repo_path, cone)
+    for name in result.kept:
+        print(f"warning: '{name}' has local changes and was left in place.", file=sys.stderr)
+    print(f"Checked out {len(result.written)} file(s), removed {len(result.removed)} file(s).")
+
+def set_sparse(repo_path: Path, dirs):
+    """
+    Write the sparse-checkout file listing dirs and return the new cone.
+    """
+    dirs = sorted({directory.strip("/") for directory in dirs if directory.strip("/")})
+    (repo_path / SPARSE_FILE).write_text("".join(f"{directory}\n" for directory in dirs))
+    return load_sparse(repo_path)
+
+def reapply(repo_path: Path, cone) -> SparseResult:
+    """
+    Make the working tree and index match a cone (None for the whole tree).
+
+    Files entering the cone are written from the index and files leaving it
+    are deleted, unless they have local changes, and get the skip-worktree
+    flag. Then every directory whose entries are all outside the cone is
+    collapsed into a single "dir/" entry holding its tree hash, so the
+    index, and everything reading it, scales with the cone rather than with
+    the repository. Collapsed directories are only expanded again if part
+    of them enters the cone.
+    """
+    repo_root = repo_path.resolve().parent
+    written, removed, kept = [], [], []
+    with locked_index(repo_path) as index:
+        index_mtime = index_mtime_ns(repo_path)
+        expanded = [name for name in index if is_sparse_dir(name)
+                    and (cone is None or cone.includes_dir(name[:-1]))]
+        for name in expanded:
+            entry = index.pop(name)
+            for path, blob_hash in LazyTree(repo_path, entry["hash"]).items():
+                index[name + path] = {"hash": blob_hash, "skip_worktree": True}
+        invalidate_cache_tree(index, expanded)
+
+        mode = file_mode()
+        for name, entry in sorted(index.items()):
+            if is_sparse_dir(name):
+                continue
+            file_path = repo_root / name
+            if cone is None or cone.includes(name):
+                if not entry.get("skip_worktree"):
+                    continue
+                if file_path.exists():
+                    # Keep the file there; status compares it with the entry
+                    index[name] = {"hash": entry["hash"]}
+                else:
+                    index[name] = make_entry(entry["hash"], write_file(repo_path, repo_root, name, entry["hash"], mode))
+                    written.append(name)
+            elif not entry.get("skip_worktree"):
+                try:
+                    st = file_path.stat()
+                except FileNotFoundError:
+                    index[name] = {"hash": entry["hash"], "skip_worktree": True}
+                    continue
+                if is_stat_clean(entry, st, index_mtime) or hash_file(file_path) == entry["hash"]:
+                    remove_file(repo_root, name)
+                    index[name] = {"hash": entry["hash"], "skip_worktree": True}
+                    removed.append(name)
+                else:
+                    kept.append(name)
+
+        if cone is not None:
+            _collapse(repo_path, index, cone)
+    return SparseResult(written, removed, kept)
+
+def _collapse(repo_path: Path, index, cone) -> None:
+    """
+    Replace the entries of each directory outside the cone by one entry for
+    the directory, unless a file in it was kept because of local changes.
+    """
+    groups = {}
+    for name, entry in index.items():
+        if is_sparse_dir(name) or not cone.includes(name):
+            groups.setdefault(cone.collapsed_dir(name), []).append(name)
+    blocked = {directory for directory, names in groups.items()
+               if any(not index[name].get("skip_worktree") for name in names)}
+    if len(blocked) == len(groups):
+        return
+    # Writing the whole tree leaves the hash of every directory in the
+    # cache-tree; the trees already stored are not written again
+    write_tree(repo_path, index)
+    trees = load_cache_tree(index)
+    for directory, names in groups.items():
+        if directory not in blocked and names != [directory + "/"]:
+            for name in names:
+                del index[name]
+            index[directory + "/"] = {"hash": trees[directory], "skip_worktree": True}
@@ -1,41 +1,378 @@
+import heapq
+import os
+import sys
+from collections import namedtuple
+from operator import itemgetter
 from pathlib import Path
-from pygit.core.repo import get_repo_path, get_head_commit_hash, is_ignored
-from pygit.core.index import load_index
-from pygit.core.objects import load_commit_tree
+from pygit.core import fsmonitor, stats, trace
+from pygit.core.repo import get_repo_path, get_head_commit_hash
+from pygit.core.ignore import IgnoreRules
+from pygit.core.index import load_index_entries, locked_index, index_mtime_ns, is_stat_clean, refresh_entry
+from pygit.core.objects import load_commit_tree, read_object
 from pygit.core.hashing import hash_file
+from pygit.core.merge import load_merge_state
+from pygit.core.renames import detect_renames
+from pygit.core.sparse import is_sparse_dir
+from pygit.core.tree import LazyTree, load_cache_tree
 
-def run():
-    repo_path = get_repo_path(".pygit")
-    index = load_index(repo_path)
-    head_commit_hash = get_head_commit_hash(repo_path)
-    committed = load_commit_tree(repo_path, head_commit_hash)
-    working = get_working_directory_files(repo_path)
+class StatusResult(namedtuple("StatusResult", "staged modified untracked removed deleted renames")):
+    """
+    The paths that are staged (the index differs from HEAD), modified (the
+    working tree differs from the index), untracked, removed (in HEAD but
+    not in the index) and deleted (in the index but not in the working
+    tree). renames maps the new path of each staged or untracked file found
+    to be a moved file to its Rename.
+    """
+    __slots__ = ()
 
-    staged = [f for f, h in index.items() if f not in committed or committed.get(f) != h]
-    modified = [f for f, h in working.items() if f in index and index[f] != h]
-    untracked = [f for f in working if f not in index]
+    @property
+    def clean(self) -> bool:
+        return not (self.staged or self.modified or self.untracked or self.removed or self.deleted)
 
-    if staged:
+# One changed path, as found by iter_status: code is two letters as in
+# `git status --porcelain`, X comparing the index with HEAD and Y the
+# working tree with the index ("A" added, "M" modified, "D" removed or
+# deleted, " " unchanged, and "??" for an untracked file); head, index and
+# worktree are its hashes there, or None.
+FileStatus = namedtuple("FileStatus", "path code head index worktree")
+
+def run(show_stats=False, porcelain=False, null_terminated=False, repo_dir=".pygit"):
+    stats.reset()
+    repo_path = get_repo_path(repo_dir)
+    if porcelain or null_terminated:
+        print_porcelain(repo_path, null_terminated)
+    else:
+        result = get_status(repo_path)
+        merging = load_merge_state(repo_path)
+        if merging is not None:
+            print(f"Merging {merging[0][:7]}: add the resolved files and commit to conclude the merge.\n")
+        print_status(result)
+    if stats.get("renames_skipped"):
+        print(f"\nwarning: inexact rename detection was skipped for {stats.get('renames_skipped')} "
+              "file(s); set PYGIT_RENAME_LIMIT to raise the limit.", file=sys.stderr)
+    if show_stats and not (porcelain or null_terminated):
+        print(f"\nHashed {stats.get('files_hashed')} file(s), "
+              f"skipped {stats.get('files_skipped')} unchanged file(s).")
+        print(f"Object cache: {stats.get('cache_hits')} hit(s), {stats.get('cache_misses')} miss(es).")
+
+def get_status(repo_path: Path, entries=None, rules=None, committed=None) -> StatusResult:
+    """
+    Compare HEAD, the index and the working tree (see iter_status). The
+    index entries, ignore rules and the files at HEAD (a mapping of path to
+    blob hash) are loaded unless given.
+
+    Files removed from the index are paired with files added to it, and
+    files deleted from the working tree with untracked files, to find
+    renames (see detect_renames). Exact renames cost a hash lookup; only the
+    remaining files are read and compared.
+    """
+    staged, modified, untracked, removed, deleted = [], [], [], [], []
+    candidates = ({}, {}, {}, {})  # Removed, added, deleted and untracked files
+    for change in iter_status(repo_path, entries, rules, committed):
+        _add_rename_candidate(candidates, change)
+        if change.code == "??":
+            untracked.append(change.path)
+            continue
+        index_code, worktree_code = change.code
+        if index_code in ("A", "M"):
+            staged.append(change.path)
+        elif index_code == "D":
+            removed.append(change.path)
+        if worktree_code == "M":
+            modified.append(change.path)
+        elif worktree_code == "D":
+            deleted.append(change.path)
+    with trace.span("status: detect renames"):
+        renames = find_renames(repo_path, *candidates)
+    return StatusResult(staged, modified, untracked, removed, deleted, renames)
+
+def _add_rename_candidate(candidates, change: FileStatus) -> None:
+    removed, added, deleted, untracked = candidates
+    if change.code == "??":
+        untracked[change.path] = change.worktree
+        return
+    if change.code[0] == "D":
+        removed[change.path] = change.head
+    elif change.code[0] == "A" and not is_sparse_dir(change.path):
+        added[change.path] = change.index
+    if change.code[1] == "D":
+        deleted[change.path] = change.index
+
+def find_renames(repo_path: Path, removed: dict, added: dict, deleted: dict, untracked: dict) -> dict:
+    """
+    Pair files removed from the index with files added to it, and files
+    deleted from the working tree with untracked files (each a dict of path
+    to hash). Returns a dict of new path to Rename.
+    """
+    renames = {}
+    if not (removed and added or deleted and untracked):
+        return renames
+    repo_root = repo_path.resolve().parent
+
+    def read_blob(path, blob_hash):
+        return read_object(repo_path, blob_hash)[1]
+
+    def read_file(path, blob_hash):
+        return (repo_root / path).read_bytes()
+
+    if removed and added:
+        for rename in detect_renames(removed, added, read_blob, read_blob):
+            renames[rename.new] = rename
+    if deleted and untracked:
+        for rename in detect_renames(deleted, untracked, read_blob, read_file):
+            renames[rename.new] = rename
+    return renames
+
+def iter_status(repo_path: Path, entries=None, rules=None, committed=None):
+    """
+    Yield a FileStatus for each path that differs between HEAD, the index
+    and the working tree, in path order, as soon as it is found. A path
+    removed from the index but still on disk is yielded twice, as removed
+    ("D ") and as untracked ("??").
+
+    The working tree is walked in sorted order and merged in a single pass
+    with the index and the HEAD tree, which are sorted the same way, so
+    nothing but the index and the trees being walked is held in memory.
+    Directories whose cache-tree matches HEAD are not read at all.
+    """
+    if entries is None:
+        entries = load_index_entries(repo_path)
+    if committed is None:
+        committed = load_commit_tree(repo_path, get_head_commit_hash(repo_path))
+    if isinstance(committed, LazyTree):
+        head = committed.walk_against(entries, load_cache_tree(entries))
+    else:
+        head = iter(sorted(committed.items()))
+    index = ((name, entries[name]) for name in sorted(entries))
+    with trace.span("status: scan working tree"):
+        working = iter_working_files(repo_path, entries, rules)
+        same_dir = None  # A directory holding the same files at HEAD and in the index
+        for path, (head_hash, entry, work_hash) in merge_join(head, index, working):
+            if entry is None and (not path or path.endswith("/")):
+                same_dir = path
+                continue
+            if same_dir is not None and not path.startswith(same_dir):
+                same_dir = None
+            if entry is None:
+                if head_hash is not None:
+                    yield FileStatus(path, "D ", head_hash, None, None)
+                if work_hash is not None:
+                    yield FileStatus(path, "??", None, None, work_hash)
+                continue
+            if same_dir is not None:
+                head_hash = entry["hash"]
+            index_code = "A" if head_hash is None else "M" if head_hash != entry["hash"] else " "
+            # Files outside the sparse-checkout cone are not expected on disk
+            if entry.get("skip_worktree"):
+                worktree_code = " "
+            else:
+                worktree_code = "D" if work_hash is None else "M" if work_hash != entry["hash"] else " "
+            if index_code != " " or worktree_code != " ":
+                yield FileStatus(path, index_code + worktree_code, head_hash, entry["hash"], work_hash)
+
+def merge_join(*streams):
+    """
+    Merge iterators of (path, value) pairs, each sorted by path, and yield
+    (path, values) for each path, with None for the streams lacking it.
+    """
+    current = [next(stream, None) for stream in streams]
+    while True:
+        paths = [item[0] for item in current if item is not None]
+        if not paths:
+            return
+        path = min(paths)
+        values = []
+        for i, item in enumerate(current):
+            if item is not None and item[0] == path:
+                values.append(item[1])
+                current[i] = next(streams[i], None)
+            else:
+                values.append(None)
+        yield path, values
+
+def print_porcelain(repo_path: Path, null_terminated=False) -> None:
+    """
+    Print a stable, machine-readable line per changed path, "XY path" (see
+    FileStatus), as soon as it is found. A rename is "XY old -> new", with X
+    "R" for a staged rename and Y "R" for a file moved in the working tree.
+    The files that may be half of a rename (added, removed, deleted and
+    untracked ones) are held back until the walk is over and printed last,
+    in path order. With null_terminated, each line ends with NUL instead of
+    a newline and a rename is "XY new" NUL "old", so any path can be parsed.
+    """
+    end = "\0" if null_terminated else "\n"
+    candidates = ({}, {}, {}, {})
+    held = []
+    for change in iter_status(repo_path):
+        if change.code == "??" or "A" in change.code or "D" in change.code:
+            _add_rename_candidate(candidates, change)
+            held.append(change)
+        else:
+            print(_porcelain_line(change.code, change.path, None, null_terminated), end=end)
+
+    renames = find_renames(repo_path, *candidates)
+    _, added, _, untracked = candidates
+    staged_from = {rename.old for path, rename in renames.items() if path in added}
+    moved_from = {rename.old for path, rename in renames.items() if path in untracked}
+    for change in sorted(held, key=lambda change: change.path):
+        code, old = change.code, None
+        rename = renames.get(change.path)
+        if code == "D " and change.path in staged_from:
+            continue
+        if code[1] == "D" and change.path in moved_from:
+            if code[0] == " ":
+                continue
+            code = code[0] + " "
+        elif rename is not None and code == "??":
+            code, old = " R", rename.old
+        elif rename is not None and code[0] == "A":
+            code, old = "R" + code[1], rename.old
+        print(_porcelain_line(code, change.path, old, null_terminated), end=end)
+
+def _porcelain_line(code: str, path: str, old, null_terminated: bool) -> str:
+    if old is None:
+        return f"{code} {path}"
+    return f"{code} {path}\0{old}" if null_terminated else f"{code} {old} -> {path}"
+
+def print_status(result: StatusResult) -> None:
+    renamed_from = {rename.old for rename in result.renames.values()}
+    staged = [f for f in result.staged if f not in result.renames]
+    removed = [f for f in result.removed if f not in renamed_from]
+    staged_renames = [r for f, r in result.renames.items() if f in result.staged]
+    if staged or removed or staged_renames:
         print("Changes to be committed:")
         for f in staged:
             print(f"  staged:   {f}")
+        for rename in staged_renames:
+            print(f"  renamed:  {_describe(rename)}")
+        for f in removed:
+            print(f"  removed:  {f}")
     else:
         print("No changes to be committed.")
 
-    if modified:
+    deleted = [f for f in result.deleted if f not in renamed_from]
+    moves = [r for f, r in result.renames.items() if f in result.untracked]
+    if result.modified or deleted or moves:
         print("\nChanges not staged for commit:")
-        for f in modified:
+        for f in result.modified:
             print(f"  modified: {f}")
+        for rename in moves:
+            print(f"  renamed:  {_describe(rename)}")
+        for f in deleted:
+            print(f"  deleted:  {f}")
 
+    untracked = [f for f in result.untracked if f not in result.renames]
     if untracked:
         print("\nUntracked files:")
         for f in untracked:
             print(f"  untracked: {f}")
 
-def get_working_directory_files(repo_path: Path) -> dict:
-    files = {}
-    for path in Path(".").rglob("*"):
-        if path.is_file() and not is_ignored(path, repo_path):
-            files[str(path)] = hash_file(path)
-    return files
+def _describe(rename) -> str:
+    similarity = "" if rename.similarity == 100 else f" ({rename.similarity}%)"
+    return f"{rename.old} -> {rename.new}{similarity}"
+
+def get_working_directory_files(repo_path: Path, entries=None, rules=None) -> dict:
+    """
+    Map each working file that is not ignored to its content hash (see
+    iter_working_files).
+    """
+    return dict(iter_working_files(repo_path, entries, rules))
+
+def iter_working_files(repo_path: Path, entries=None, rules=None):
+    """
+    Yield (path, content hash) for each working file that is not ignored,
+    sorted by path. Ignored directories, and those outside the
+    sparse-checkout cone, are pruned from the walk without being entered.
+    Files whose index entry has matching stat data reuse the indexed hash
+    instead of being rehashed, and entries whose stat data went stale
+    without a content change are refreshed in the index file once the walk
+    is over; entries itself is not modified.
+
+    If the filesystem monitor daemon is running and the index holds a valid
+    token from it, only the paths it reports as changed are looked at; every
+    other file keeps its hash from the last status (its indexed hash, unless
+    it was modified, untracked or missing then) without even being stat-ed.
+    """
+    entries = entries if entries is not None else {}
+    index_mtime = index_mtime_ns(repo_path)
+    rules = rules if rules is not None else IgnoreRules(repo_path)
+    old_token, dirty = fsmonitor.load_state(entries)
+    token, changed = fsmonitor.changed_since(repo_path, entries)
+    refreshed = {}
+    if changed is None:
+        # Walked files are stat-ed by path; a Path is only made for those to hash
+        streams = [rules.walk()]
+        known = []
+    else:
+        # Files the monitor saw no change to keep their last hash, and those
+        # missing then (recorded as None) are still missing
+        unchanged = ((name, dirty.get(name, entries[name]["hash"])) for name in sorted(entries)
+                     if not entries[name].get("skip_worktree") and not fsmonitor.is_changed(name, changed)
+                     and dirty.get(name, "") is not None)
+        untracked = sorted((name, file_hash) for name, file_hash in dirty.items()
+                           if name not in entries and file_hash is not None
+                           and not fsmonitor.is_changed(name, changed))
+        streams = [sorted(fsmonitor.changed_files(rules, changed).items())]
+        known = [_counted(unchanged), untracked]
+    if rules.sparse is not None:
+        # Files outside the cone that were kept because of local changes
+        kept = [(name, rules.repo_root / name) for name, entry in sorted(entries.items())
+                if not entry.get("skip_worktree") and rules.outside_cone(name)
+                and (changed is None or fsmonitor.is_changed(name, changed))]
+        streams.append([(name, path) for name, path in kept if path.is_file()])
+
+    def hashed(candidates):
+        for name, path in candidates:
+            st = os.stat(path)
+            entry = entries.get(name)
+            if entry is not None and is_stat_clean(entry, st, index_mtime):
+                stats.increment("files_skipped")
+                yield name, entry["hash"]
+                continue
+            file_hash = hash_file(Path(path))
+            # A copy is refreshed, since entries may be shared (see Repository.index)
+            fresh = dict(entry) if entry is not None else None
+            if fresh is not None and refresh_entry(fresh, st, file_hash):
+                refreshed[name] = fresh
+            yield name, file_hash
+
+    now_dirty = {}
+    seen = set()
+    for name, file_hash in heapq.merge(*known, *map(hashed, streams), key=itemgetter(0)):
+        if name not in entries or entries[name]["hash"] != file_hash:
+            now_dirty[name] = file_hash
+        else:
+            seen.add(name)
+        yield name, file_hash
+    # Tracked files that were not found are recorded as missing, or the next
+    # status would take the monitor's silence for their indexed hash
+    now_dirty.update((name, None) for name, entry in entries.items()
+                     if name not in seen and name not in now_dirty and not entry.get("skip_worktree"))
+    if refreshed or token != old_token:
+        _save_refreshed(repo_path, refreshed, entries, (token, now_dirty))
+
+def _counted(files):
+    for item in files:
+        stats.increment("files_skipped")
+        yield item
+
+def _save_refreshed(repo_path: Path, refreshed: dict, entries=None, monitor_state=None) -> None:
+    """
+    Write refreshed stat data and the filesystem monitor state back to the
+    index, unless another process holds the index lock (both are only
+    optimizations) or restaged the file in the meantime.
+    """
+    try:
+        with locked_index(repo_path, timeout=0) as current:
+            for name, entry in refreshed.items():
+                if name in current and current[name]["hash"] == entry["hash"]:
+                    current[name] = entry
+            # The recorded hashes are only valid for the index they were
+            # compared against
+            if monitor_state is not None and _same_hashes(current, entries):
+                fsmonitor.store_state(current, *monitor_state)
+    except TimeoutError:
+        pass
 
+def _same_hashes(a: dict, b: dict) -> bool:
+    return a.keys() == b.keys() and all(a[name]["hash"] == b[name]["hash"] for name in a)
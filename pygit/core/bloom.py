@@ -0,0 +1,67 @@
+import hashlib
+import struct
+from pathlib import Path
+from pygit.core.tree import diff_trees
+
+# Changed-path Bloom filters of commits (see docs/log.md). Each path sets
+# BLOOM_HASHES bits, taken from its BLAKE2b digest, in BITS_PER_PATH bits per path.
+
+BLOOM_HASHES = 7
+BITS_PER_PATH = 10
+MAX_CHANGED_PATHS = 512
+FULL_FILTER = b"\xff"  # Rules out nothing, for commits changing too many paths
+
+def path_keys(path: str) -> list:
+    """
+    Return the keys a path is stored under: each of its leading directories,
+    then the path itself, e.g. ["src", "src/app.py"].
+    """
+    parts = [part for part in path.strip("/").split("/") if part not in ("", ".")]
+    return ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+_DIGEST = struct.Struct(f">{BLOOM_HASHES}I")
+
+def _bit_positions(key: str, bits: int):
+    digest = hashlib.blake2b(key.encode(), digest_size=_DIGEST.size).digest()
+    return [value % bits for value in _DIGEST.unpack(digest)]
+
+def build_filter(keys) -> bytes:
+    """
+    Return the Bloom filter of a set of keys (see path_keys).
+    """
+    if len(keys) > MAX_CHANGED_PATHS:
+        return FULL_FILTER
+    size = (len(keys) * BITS_PER_PATH + 7) // 8
+    data = bytearray(size)
+    for key in keys:
+        for position in _bit_positions(key, size * 8):
+            data[position // 8] |= 1 << (position % 8)
+    return bytes(data)
+
+def maybe_changed(bloom: bytes, path: str) -> bool:
+    """
+    Return False if a commit whose filter is bloom definitely did not change
+    anything at or below path, True if it may have.
+    """
+    if not bloom:
+        return False
+    keys = path_keys(path)
+    bits = len(bloom) * 8
+    # Every leading directory of a changed path was added too
+    return all(
+        bloom[position // 8] & (1 << (position % 8))
+        for key in keys
+        for position in _bit_positions(key, bits)
+    )
+
+def changed_path_filter(repo_path: Path, parent_tree, tree):
+    """
+    Return the filter of the paths changed between two root trees (parent_tree
+    is None for a root commit), reading only the subtrees that differ.
+    """
+    keys = set()
+    for path, _, _ in diff_trees(repo_path, parent_tree, tree):
+        keys.update(path_keys(path))
+        if len(keys) > MAX_CHANGED_PATHS:
+            return FULL_FILTER
+    return build_filter(keys)
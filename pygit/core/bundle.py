@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+from collections import namedtuple
+from pathlib import Path
+from pygit.core.commit_graph import NULL_HASH, append_commits, commits_between, load_commit_graph
+from pygit.core.objects import (BLOCK_SIZE, generate_commit_hash, iter_raw_object, load_commit,
+                                object_exists, save_commit, store_raw_object)
+from pygit.core.reachability import iter_blob_objects, iter_tree_objects
+from pygit.core.trace import traced
+
+# A bundle carries commits and the objects they need to another repository in a
+# single file, written and read in one pass; the format is in docs/bundle.md.
+
+BUNDLE_SIGNATURE = b"# pygit bundle v1\n"
+
+# prerequisites: (hash, message) of the commits the bundle relies on
+# refs: dictionary of ref name ("refs/heads/<name>") to commit hash
+BundleHeader = namedtuple("BundleHeader", "prerequisites refs")
+
+# commits, objects: how many were in the bundle; new_*: how many were new
+UnbundleResult = namedtuple("UnbundleResult", "refs commits objects new_commits new_objects")
+
+@traced
+def write_bundle(repo_path: Path, bundle_path: Path, refs: dict, bases=()) -> tuple[int, int]:
+    """
+    Write a bundle of the commits reachable from refs but not from bases, and
+    return the number of commits and objects in it. Raises ValueError if empty.
+    """
+    commits, boundary = commits_between(repo_path, refs.values(), bases)
+    if not commits:
+        raise ValueError("Refusing to create an empty bundle.")
+
+    seen = set()
+    for info in boundary:
+        for _ in _new_objects(repo_path, info, seen):
+            pass
+
+    bundle_path = Path(bundle_path)
+    tmp_path = bundle_path.with_name(f".{bundle_path.name}.tmp")
+    checksum = hashlib.sha1()
+    objects = 0
+    try:
+        with open(tmp_path, "wb") as out:
+            def emit(data: bytes):
+                checksum.update(data)
+                out.write(data)
+
+            emit(BUNDLE_SIGNATURE)
+            for info in boundary:
+                emit(f"-{info['hash']} {(info['message'].splitlines() or [''])[0]}\n".encode())
+            for name, commit_hash in refs.items():
+                emit(f"{commit_hash} {name}\n".encode())
+            emit(b"\n")
+
+            for info in reversed(commits):
+                for obj_hash in _new_objects(repo_path, info, seen):
+                    size, blocks = iter_raw_object(repo_path, obj_hash)
+                    emit(f"object {obj_hash} {size}\n".encode())
+                    for block in blocks:
+                        emit(block)
+                    objects += 1
+                data = (repo_path / "commits" / f"{info['hash']}.json").read_bytes()
+                emit(f"commit {info['hash']} {len(data)}\n".encode())
+                emit(data)
+            out.write(f"end {checksum.hexdigest()}\n".encode())
+        os.replace(tmp_path, bundle_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(commits), objects
+
+def _new_objects(repo_path: Path, info: dict, seen: set):
+    """
+    Yield the objects of a commit (given by its graph row) not in seen.
+    """
+    if info["tree"] != NULL_HASH.hex():
+        yield from iter_tree_objects(repo_path, info["tree"], seen)
+        return
+    # Commits written before trees existed only have a flat file list
+    for blob_hash in (load_commit(repo_path, info["hash"]) or {}).get("files", {}).values():
+        yield from iter_blob_objects(repo_path, blob_hash, seen)
+
+class _BundleReader:
+    """
+    Reads a bundle, keeping the checksum of everything read so far.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.checksum = hashlib.sha1()
+
+    def readline(self) -> bytes:
+        line = self.f.readline()
+        self.checksum.update(line)
+        return line
+
+    def blocks(self, size: int):
+        """
+        Yield the next size bytes in blocks of at most BLOCK_SIZE bytes.
+        """
+        while size:
+            block = self.f.read(min(size, BLOCK_SIZE))
+            if not block:
+                raise ValueError("The bundle is truncated.")
+            self.checksum.update(block)
+            size -= len(block)
+            yield block
+
+def read_bundle_header(f) -> BundleHeader:
+    """
+    Read the header of a bundle opened in binary mode, leaving f at the
+    first record. Raises ValueError if f is not a bundle.
+    """
+    reader = f if isinstance(f, _BundleReader) else _BundleReader(f)
+    if reader.readline() != BUNDLE_SIGNATURE:
+        raise ValueError("Not a pygit bundle.")
+    prerequisites = []
+    refs = {}
+    while (line := reader.readline().decode()) not in ("\n", ""):
+        if line.startswith("-"):
+            commit_hash, _, message = line[1:].rstrip("\n").partition(" ")
+            prerequisites.append((commit_hash, message))
+        else:
+            commit_hash, _, name = line.rstrip("\n").partition(" ")
+            refs[name] = commit_hash
+    if not line:
+        raise ValueError("The bundle is truncated.")
+    return BundleHeader(prerequisites, refs)
+
+@traced
+def read_bundle(repo_path: Path, bundle_path: Path, store: bool = True) -> UnbundleResult:
+    """
+    Check a bundle and store the objects and commits the repository lacks, unless
+    store is False. Raises ValueError if it is incomplete or does not match.
+    """
+    with open(bundle_path, "rb") as f:
+        reader = _BundleReader(f)
+        header = read_bundle_header(reader)
+        missing = [commit_hash for commit_hash, _ in header.prerequisites
+                   if not (repo_path / "commits" / f"{commit_hash}.json").exists()]
+        if missing:
+            raise ValueError(f"The repository lacks the prerequisite commit(s) {', '.join(missing)}.")
+
+        commits = objects = new_objects = 0
+        new_commits = 0
+        graph = load_commit_graph(repo_path)
+        ungraphed = []
+        while True:
+            line = reader.f.readline()
+            if line.startswith(b"end "):
+                if line.decode().split()[1] != reader.checksum.hexdigest():
+                    raise ValueError("The bundle's checksum does not match its content.")
+                break
+            reader.checksum.update(line)
+            try:
+                kind, obj_hash, size = line.decode().split()
+                size = int(size)
+            except ValueError:
+                raise ValueError("The bundle is truncated or corrupt.") from None
+            blocks = reader.blocks(size)
+            if kind == "object":
+                objects += 1
+                if store and not object_exists(repo_path, obj_hash):
+                    store_raw_object(repo_path, obj_hash, blocks)
+                    new_objects += 1
+            elif kind == "commit":
+                commits += 1
+                commit = json.loads(b"".join(blocks))
+                if generate_commit_hash(commit) != obj_hash:
+                    raise ValueError(f"Commit {obj_hash} does not match its content.")
+                if store and not (repo_path / "commits" / f"{obj_hash}.json").exists():
+                    save_commit(repo_path, obj_hash, commit)
+                    new_commits += 1
+                if store and graph.lookup(obj_hash) is None:
+                    ungraphed.append((obj_hash, commit))
+            else:
+                raise ValueError(f"Unknown bundle record '{kind}'.")
+            for _ in blocks:
+                pass  # Skip what was not stored
+
+    if ungraphed:
+        append_commits(repo_path, ungraphed)
+    return UnbundleResult(header.refs, commits, objects, new_commits, new_objects)
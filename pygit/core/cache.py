@@ -0,0 +1,70 @@
+import os
+import threading
+from collections import OrderedDict
+from pygit.core import stats
+
+# Default budget of the object cache, overridden by PYGIT_CACHE_BYTES
+# (0 disables it).
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+
+# Objects bigger than this fraction of the budget are never cached, so that
+# reading one large blob doesn't evict everything else.
+MAX_ENTRY_FRACTION = 16
+
+class ObjectCache:
+    """
+    A least-recently-used cache of decoded objects with a budget in bytes.
+    Cached values are shared between callers and must not be modified.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None.
+        """
+        with self._lock:
+            found = self._entries.get(key)
+            if found is None:
+                stats.increment("cache_misses")
+                return None
+            self._entries.move_to_end(key)
+        stats.increment("cache_hits")
+        return found[0]
+
+    def put(self, key, value, size: int) -> None:
+        """
+        Cache value, which takes about size bytes, unless it is too big.
+        """
+        if not self.max_bytes or size * MAX_ENTRY_FRACTION > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+def _budget() -> int:
+    try:
+        return max(0, int(os.environ.get("PYGIT_CACHE_BYTES", DEFAULT_CACHE_BYTES)))
+    except ValueError:
+        return DEFAULT_CACHE_BYTES
+
+# Shared by every repository in the process: keys are content hashes, so the
+# same object read through different repositories is cached once.
+objects = ObjectCache(_budget())
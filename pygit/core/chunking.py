@@ -0,0 +1,77 @@
+import re
+from pathlib import Path
+from pygit.core.ignore import translate_pattern
+
+# Files matching a pattern in this file (one gitignore-style glob per line,
+# relative to the repository root) are stored in chunks: see iter_chunks().
+CHUNKED_FILE = "chunked"
+
+# Chunk sizes in the style of FastCDC: cuts are harder to find before NORMAL_CHUNK
+# and easier after it. Files smaller than MAX_CHUNK are stored whole.
+MIN_CHUNK = 256 * 1024
+NORMAL_CHUNK = 1024 * 1024
+MAX_CHUNK = 4 * 1024 * 1024
+
+# Files are read this much at a time while chunking.
+READ_SIZE = 16 * 1024 * 1024
+
+# A cut is made after a run of bytes whose gear bit is set, found with
+# bytes.translate() and bytes.find() rather than a rolling hash in Python.
+STRICT_RUN = b"\1" * 21
+LOOSE_RUN = b"\1" * 17
+
+def _gear_bits() -> bytes:
+    import hashlib
+
+    return bytes(hashlib.sha1(bytes([i])).digest()[0] & 1 for i in range(256))
+
+GEAR_BITS = _gear_bits()
+
+def find_cut(data: bytes, start: int, end: int) -> int:
+    """
+    Return the offset at which the chunk starting at start ends, looking
+    no further than end (the end of the data read so far).
+    """
+    if end - start <= MIN_CHUNK:
+        return end
+    limit = min(end, start + MAX_CHUNK)
+    bits = data[start + MIN_CHUNK:limit].translate(GEAR_BITS)
+    normal = NORMAL_CHUNK - MIN_CHUNK
+    run = bits.find(STRICT_RUN, 0, normal)
+    if run >= 0:
+        return start + MIN_CHUNK + run + len(STRICT_RUN)
+    run = bits.find(LOOSE_RUN, max(0, normal - len(LOOSE_RUN) + 1))
+    if run >= 0:
+        return start + MIN_CHUNK + run + len(LOOSE_RUN)
+    return limit
+
+def iter_chunks(f):
+    """
+    Split a binary file object into content-defined chunks, yielded as
+    memoryviews valid only until the next chunk is requested.
+    """
+    data = f.read(READ_SIZE)
+    pos = 0
+    while pos < len(data):
+        if len(data) - pos < MAX_CHUNK:
+            more = f.read(READ_SIZE)
+            if more:
+                data = data[pos:] + more
+                pos = 0
+        cut = find_cut(data, pos, len(data))
+        yield memoryview(data)[pos:cut]
+        pos = cut
+
+def load_chunk_patterns(repo_path: Path):
+    """
+    Return a compiled regex matching the repository-relative paths to store
+    in chunks, or None if no pattern is configured.
+    """
+    try:
+        lines = (repo_path / CHUNKED_FILE).read_text().splitlines()
+    except FileNotFoundError:
+        return None
+    patterns = [line.strip() for line in lines if line.strip() and not line.startswith("#")]
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{translate_pattern(p)})" for p in patterns))
@@ -0,0 +1,487 @@
+import heapq
+import mmap
+import os
+import struct
+from pathlib import Path
+from pygit.core import stats
+from pygit.core.bloom import changed_path_filter
+from pygit.core.objects import load_commit
+from pygit.core.trace import traced
+
+# The commit-graph caches each commit's parents, tree, generation, timestamp and
+# message in a chain of sorted layer files (see docs/log.md).
+
+GRAPH_MAGIC = b"PCGR"
+GRAPH_VERSION = 2
+HEADER = struct.Struct(">4sII")
+ROW = struct.Struct(">20s20s20sIdIIII")
+ROW_V1 = struct.Struct(">20s20s20sIdII")
+NO_FILTER = 0xFFFFFFFF  # Filter length of a commit whose filter was never computed
+FANOUT_OFFSET = HEADER.size
+HASHES_OFFSET = FANOUT_OFFSET + 256 * 4
+NULL_HASH = bytes(20)
+
+def graph_dir(repo_path: Path) -> Path:
+    return repo_path / "commit-graph"
+
+class GraphLayer:
+    """
+    One mmap-ed layer file. Lookups binary search the hashes sharing the
+    commit's first byte, found through the fanout table.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self.mm)
+        if magic != GRAPH_MAGIC or version not in (1, GRAPH_VERSION):
+            raise ValueError(f"{path} is not a commit-graph layer")
+        self.row_struct = ROW if version == GRAPH_VERSION else ROW_V1
+        self.rows_offset = HASHES_OFFSET + 20 * self.count
+        self.messages_offset = self.rows_offset + self.row_struct.size * self.count
+
+    def _position(self, key: bytes):
+        first = key[0]
+        lo = struct.unpack_from(">I", self.mm, FANOUT_OFFSET + (first - 1) * 4)[0] if first else 0
+        hi = struct.unpack_from(">I", self.mm, FANOUT_OFFSET + first * 4)[0]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = HASHES_OFFSET + 20 * mid
+            mid_key = self.mm[start:start + 20]
+            if mid_key == key:
+                return mid
+            if mid_key < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def lookup(self, commit_hash: str):
+        try:
+            key = bytes.fromhex(commit_hash)
+        except ValueError:
+            return None
+        position = self._position(key) if len(key) == 20 else None
+        return None if position is None else self.row(position)
+
+    def row(self, position: int) -> dict:
+        start = HASHES_OFFSET + 20 * position
+        commit_hash = self.mm[start:start + 20].hex()
+        tree, parent1, parent2, generation, timestamp, msg_offset, msg_length, *bloom = \
+            self.row_struct.unpack_from(self.mm, self.rows_offset + self.row_struct.size * position)
+        msg_start = self.messages_offset + msg_offset
+        bloom_start = self.messages_offset + bloom[0] if bloom and bloom[1] != NO_FILTER else None
+        return {
+            "hash": commit_hash,
+            "tree": tree.hex(),
+            "parents": [p.hex() for p in (parent1, parent2) if p != NULL_HASH],
+            "generation": generation,
+            "timestamp": timestamp,
+            "message": self.mm[msg_start:msg_start + msg_length].decode(),
+            "bloom": None if bloom_start is None else self.mm[bloom_start:bloom_start + bloom[1]],
+        }
+
+    def __iter__(self):
+        for position in range(self.count):
+            yield self.row(position)
+
+class CommitGraph:
+    def __init__(self, layers: list):
+        self.layers = layers
+
+    def lookup(self, commit_hash: str):
+        """
+        Return the graph row of a commit as a dict, or None if the commit is not
+        in the graph.
+        """
+        for layer in reversed(self.layers):
+            row = layer.lookup(commit_hash)
+            if row is not None:
+                return row
+        return None
+
+    def __contains__(self, commit_hash: str) -> bool:
+        return self.lookup(commit_hash) is not None
+
+    def __len__(self) -> int:
+        return sum(layer.count for layer in self.layers)
+
+_graph_cache = {}
+
+@traced
+def load_commit_graph(repo_path: Path) -> CommitGraph:
+    """
+    Return the commit-graph of a repository (empty if none was written). The
+    layers are cached and only reopened when the chain file changes.
+    """
+    chain = graph_dir(repo_path) / "chain"
+    try:
+        st = chain.stat()
+    except FileNotFoundError:
+        return CommitGraph([])
+    key = str(chain)
+    cached = _graph_cache.get(key)
+    if cached is None or cached[0] != (st.st_mtime_ns, st.st_size):
+        names = chain.read_text().split()
+        graph = CommitGraph([GraphLayer(graph_dir(repo_path) / name) for name in names])
+        cached = _graph_cache[key] = ((st.st_mtime_ns, st.st_size), graph)
+    return cached[1]
+
+def _write_layer(directory: Path, rows: list) -> str:
+    import hashlib
+    import tempfile
+
+    rows = sorted(rows, key=lambda row: row["hash"])
+    fanout = [0] * 256
+    for row in rows:
+        fanout[int(row["hash"][:2], 16)] += 1
+    for i in range(1, 256):
+        fanout[i] += fanout[i - 1]
+
+    data = bytearray(HEADER.pack(GRAPH_MAGIC, GRAPH_VERSION, len(rows)))
+    data += struct.pack(">256I", *fanout)
+    for row in rows:
+        data += bytes.fromhex(row["hash"])
+    messages = bytearray()
+    spans = []
+    for row in rows:
+        message = row["message"].encode()
+        spans.append((len(messages), len(message)))
+        messages += message
+    for i, row in enumerate(rows):
+        bloom = row.get("bloom")
+        spans[i] += (len(messages), NO_FILTER) if bloom is None else (len(messages), len(bloom))
+        messages += bloom or b""
+    for row, span in zip(rows, spans):
+        if len(row["parents"]) > 2:
+            raise ValueError("The commit-graph supports at most two parents per commit")
+        parents = [bytes.fromhex(p) for p in row["parents"]] + [NULL_HASH, NULL_HASH]
+        data += ROW.pack(bytes.fromhex(row["tree"]), parents[0], parents[1],
+                         row["generation"], row["timestamp"], *span)
+    data += messages
+    checksum = hashlib.sha1(data).digest()
+    data += checksum
+
+    name = f"graph-{checksum.hex()}.graph"
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="tmp_graph_")
+    with os.fdopen(fd, "wb") as out:
+        out.write(data)
+    os.replace(tmp_path, directory / name)
+    return name
+
+def _write_chain(repo_path: Path, names: list, obsolete: list) -> None:
+    import tempfile
+
+    directory = graph_dir(repo_path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="tmp_chain_")
+    with os.fdopen(fd, "w") as out:
+        out.write("".join(f"{name}\n" for name in names))
+    os.replace(tmp_path, directory / "chain")
+    for name in obsolete:
+        if name not in names:
+            (directory / name).unlink(missing_ok=True)
+
+def commit_row(commit_hash: str, commit: dict, generation: int, bloom=None) -> dict:
+    return {
+        "hash": commit_hash,
+        "tree": commit.get("tree") or NULL_HASH.hex(),
+        "parents": commit_parents(commit),
+        "generation": generation,
+        "timestamp": commit.get("timestamp", 0),
+        "message": commit.get("message", ""),
+        "bloom": bloom,
+    }
+
+def commit_filter(repo_path: Path, tree, parent_tree):
+    """
+    Return the changed-path filter of a commit given its root tree and its first
+    parent's, or None if either predates trees or cannot be read.
+    """
+    if not tree or tree == NULL_HASH.hex() or parent_tree == NULL_HASH.hex():
+        return None
+    try:
+        return changed_path_filter(repo_path, parent_tree, tree)
+    except FileNotFoundError:
+        return None
+
+def commit_parents(commit: dict) -> list:
+    """
+    Return the parent hashes of a commit as a list, whether it records a
+    single "parent" or a list of "parents".
+    """
+    parents = commit["parents"] if "parents" in commit else [commit.get("parent")]
+    # Early commits could record "ref: ..." instead of a hash; skip those
+    return [p for p in parents if p and len(p) == 40 and p.isalnum()]
+
+@traced
+def append_commit(repo_path: Path, commit_hash: str, commit: dict) -> None:
+    """
+    Add a newly written commit to the commit-graph as a new layer, or rebuild
+    the graph if its parents are not in it yet.
+    """
+    append_commits(repo_path, [(commit_hash, commit)])
+
+@traced
+def append_commits(repo_path: Path, commits: list) -> None:
+    """
+    Add new (hash, commit) pairs, parents before children, to the
+    commit-graph as a single layer: see append_commit.
+    """
+    graph = load_commit_graph(repo_path)
+    added = {}
+    rows = []
+    for commit_hash, commit in commits:
+        parents = [added.get(parent) or graph.lookup(parent) for parent in commit_parents(commit)]
+        if any(parent is None for parent in parents):
+            write_commit_graph(repo_path)
+            return
+        generation = 1 + max((parent["generation"] for parent in parents), default=0)
+        bloom = commit_filter(repo_path, commit.get("tree"), parents[0]["tree"] if parents else None)
+        added[commit_hash] = commit_row(commit_hash, commit, generation, bloom)
+        rows.append(added[commit_hash])
+    if not rows:
+        return
+
+    layers = list(graph.layers)
+    merged = []
+    while layers and layers[-1].count <= 2 * len(rows):
+        layer = layers.pop()
+        merged.append(layer.path.name)
+        rows.extend(layer)
+
+    directory = graph_dir(repo_path)
+    directory.mkdir(exist_ok=True)
+    name = _write_layer(directory, rows)
+    _write_chain(repo_path, [layer.path.name for layer in layers] + [name], merged)
+
+@traced
+def write_commit_graph(repo_path: Path, changed_paths=False) -> int:
+    """
+    Rebuild the commit-graph as a single layer and return the number of commits
+    written. With changed_paths, missing changed-path filters are computed too.
+    """
+    from pygit.core.repo import list_branch_tips
+
+    commits = {}
+    pending = list(list_branch_tips(repo_path))
+    while pending:
+        commit_hash = pending.pop()
+        if commit_hash in commits:
+            continue
+        commit = load_commit(repo_path, commit_hash)
+        if commit is None:
+            continue
+        commits[commit_hash] = commit
+        pending.extend(commit_parents(commit))
+
+    # Assign generation numbers parents-first, without recursion
+    generations = {}
+    for start in commits:
+        stack = [start]
+        while stack:
+            commit_hash = stack[-1]
+            if commit_hash in generations:
+                stack.pop()
+                continue
+            parents = [p for p in commit_parents(commits[commit_hash]) if p in commits]
+            missing = [p for p in parents if p not in generations]
+            if missing:
+                stack.extend(missing)
+                continue
+            generations[commit_hash] = 1 + max((generations[p] for p in parents), default=0)
+            stack.pop()
+
+    directory = graph_dir(repo_path)
+    directory.mkdir(exist_ok=True)
+    old = (directory / "chain").read_text().split() if (directory / "chain").exists() else []
+    if commits:
+        graph = load_commit_graph(repo_path)
+        rows = []
+        for commit_hash, commit in commits.items():
+            row = graph.lookup(commit_hash)
+            bloom = row["bloom"] if row is not None else None
+            if bloom is None and changed_paths:
+                parents = commit_parents(commit)
+                parent_tree = None
+                if parents:
+                    parent = commits.get(parents[0])
+                    parent_tree = (parent.get("tree") if parent else None) or NULL_HASH.hex()
+                bloom = commit_filter(repo_path, commit.get("tree"), parent_tree)
+            rows.append(commit_row(commit_hash, commit, generations[commit_hash], bloom))
+        _write_chain(repo_path, [_write_layer(directory, rows)], old)
+    else:
+        _write_chain(repo_path, [], old)
+    return len(commits)
+
+def get_commit_info(repo_path: Path, commit_hash: str, graph=None):
+    """
+    Return a commit's graph row, falling back to its JSON file (with a
+    generation of 0, i.e. unknown) for commits not in the graph.
+    """
+    graph = graph if graph is not None else load_commit_graph(repo_path)
+    row = graph.lookup(commit_hash)
+    if row is not None:
+        return row
+    commit = load_commit(repo_path, commit_hash)
+    if commit is None:
+        return None
+    return commit_row(commit_hash, commit, 0)
+
+def iter_history(repo_path: Path, start_hashes):
+    """
+    Lazily yield the graph rows of the commits reachable from start_hashes,
+    newest first (by timestamp), each commit once.
+    """
+    graph = load_commit_graph(repo_path)
+    heap = []
+    seen = set()
+    for commit_hash in start_hashes:
+        if commit_hash and commit_hash not in seen:
+            info = get_commit_info(repo_path, commit_hash, graph)
+            if info is not None:
+                seen.add(commit_hash)
+                heapq.heappush(heap, (-info["timestamp"], commit_hash, info))
+    while heap:
+        _, _, info = heapq.heappop(heap)
+        yield info
+        for parent in info["parents"]:
+            if parent not in seen:
+                seen.add(parent)
+                parent_info = get_commit_info(repo_path, parent, graph)
+                if parent_info is not None:
+                    heapq.heappush(heap, (-parent_info["timestamp"], parent, parent_info))
+
+@traced
+def is_ancestor(repo_path: Path, ancestor: str, descendant: str) -> bool:
+    """
+    Return True if ancestor is reachable from descendant, walking only commits
+    with a larger generation number than the ancestor's.
+    """
+    graph = load_commit_graph(repo_path)
+    target = get_commit_info(repo_path, ancestor, graph)
+    if target is None:
+        return False
+    cutoff = target["generation"]
+    pending = [descendant]
+    seen = set()
+    while pending:
+        commit_hash = pending.pop()
+        if commit_hash == ancestor:
+            return True
+        if commit_hash in seen:
+            continue
+        seen.add(commit_hash)
+        info = get_commit_info(repo_path, commit_hash, graph)
+        if info is None or (cutoff and info["generation"] and info["generation"] <= cutoff):
+            continue
+        pending.extend(info["parents"])
+    return False
+
+# Flags painted on commits by merge_bases()
+_PARENT1, _PARENT2, _STALE = 1, 2, 4
+
+# Commits not in the graph have an unknown generation, and are walked first
+_GENERATION_INFINITY = 1 << 32
+
+@traced
+def merge_bases(repo_path: Path, one: str, two: str) -> list:
+    """
+    Return the best common ancestors of two commits, best first, walking in
+    generation order until only stale commits are left.
+    """
+    graph = load_commit_graph(repo_path)
+    if one == two:
+        return [one]
+    flags = {}
+    queued = {}  # Commits in the heap, with their graph rows
+    heap = []
+    nonstale = 0  # How many queued commits are not painted stale
+
+    def paint(commit_hash, flag):
+        nonlocal nonstale
+        old = flags.get(commit_hash, 0)
+        if old & flag == flag:
+            return
+        flags[commit_hash] = old | flag
+        if commit_hash in queued:
+            if flag & _STALE and not old & _STALE:
+                nonstale -= 1
+            return
+        info = get_commit_info(repo_path, commit_hash, graph)
+        if info is not None:
+            queued[commit_hash] = info
+            heapq.heappush(heap, (-(info["generation"] or _GENERATION_INFINITY),
+                                  -info["timestamp"], commit_hash))
+            nonstale += not flags[commit_hash] & _STALE
+
+    paint(one, _PARENT1)
+    paint(two, _PARENT2)
+    found = []
+    while nonstale:
+        _, _, commit_hash = heapq.heappop(heap)
+        info = queued.pop(commit_hash)
+        stats.increment("commits_walked")
+        flag = flags[commit_hash]
+        if not flag & _STALE:
+            nonstale -= 1
+        if flag & (_PARENT1 | _PARENT2) == _PARENT1 | _PARENT2:
+            if not flag & _STALE:
+                found.append(commit_hash)
+            flag = flags[commit_hash] = flag | _STALE
+        for parent in info["parents"]:
+            paint(parent, flag)
+    return _remove_redundant(repo_path, found)
+
+def _remove_redundant(repo_path: Path, commits: list) -> list:
+    """
+    Drop the commits that are ancestors of another one in the list.
+    """
+    return [commit for commit in commits
+            if not any(other != commit and is_ancestor(repo_path, commit, other) for other in commits)]
+
+@traced
+def commits_between(repo_path: Path, tips, bases=()) -> tuple:
+    """
+    Return the commits reachable from tips but not from bases, newest first, and
+    the boundary: the commits reachable from bases that are parents of one of them.
+    """
+    graph = load_commit_graph(repo_path)
+    excluded = {}  # Whether each queued or visited commit is reachable from bases
+    queued = {}
+    heap = []
+    wanted = 0  # How many queued commits are not excluded
+
+    def push(commit_hash, exclude):
+        nonlocal wanted
+        if commit_hash in excluded:
+            if exclude and not excluded[commit_hash]:
+                excluded[commit_hash] = True
+                wanted -= commit_hash in queued
+            return
+        info = get_commit_info(repo_path, commit_hash, graph)
+        if info is None:
+            return
+        excluded[commit_hash] = exclude
+        queued[commit_hash] = info
+        heapq.heappush(heap, (-(info["generation"] or _GENERATION_INFINITY), -info["timestamp"], commit_hash))
+        wanted += not exclude
+
+    for base in bases:
+        push(base, True)
+    for tip in tips:
+        push(tip, False)
+    commits = []
+    boundary = {}
+    while wanted:
+        _, _, commit_hash = heapq.heappop(heap)
+        info = queued.pop(commit_hash)
+        stats.increment("commits_walked")
+        exclude = excluded[commit_hash]
+        if not exclude:
+            wanted -= 1
+            commits.append(info)
+            boundary.update(dict.fromkeys(info["parents"]))
+        for parent in info["parents"]:
+            push(parent, exclude)
+    return commits, [get_commit_info(repo_path, c, graph) for c in boundary if excluded.get(c)]
@@ -0,0 +1,210 @@
+# Line diffs using the linear-space form of Myers' O(ND) algorithm.
+from itertools import chain
+from pygit.core.trace import traced
+
+# Files whose first block contains a NUL byte are treated as binary, as Git does
+BINARY_CHECK_SIZE = 8000
+
+def is_binary(data: bytes) -> bool:
+    return b"\0" in data[:BINARY_CHECK_SIZE]
+
+def sniff(content) -> tuple:
+    """
+    Read up to BINARY_CHECK_SIZE bytes of content, given as bytes or blocks.
+    Returns them and an iterator over all the blocks of content.
+    """
+    if isinstance(content, (bytes, bytearray)):
+        return content[:BINARY_CHECK_SIZE], iter((content,))
+    blocks = iter(content)
+    head = []
+    size = 0
+    for block in blocks:
+        head.append(block)
+        size += len(block)
+        if size >= BINARY_CHECK_SIZE:
+            break
+    return b"".join(head), chain(head, blocks)
+
+def _middle_snake(a, b, left, top, right, bottom):
+    """
+    Return (x1, y1, x2, y2), the diagonal run of matching lines in the middle
+    of an optimal edit path from (left, top) to (right, bottom).
+    """
+    width, height = right - left, bottom - top
+    size = width + height
+    delta = width - height
+    max_d = (size + 1) // 2
+    vf = [0] * (2 * max_d + 2)
+    vb = [0] * (2 * max_d + 2)
+    vf[1] = left
+    vb[1] = bottom
+
+    for d in range(max_d + 1):
+        for k in range(d, -d - 1, -2):
+            c = k - delta
+            if k == -d or (k != d and vf[k - 1] < vf[k + 1]):
+                x = vf[k + 1]
+            else:
+                x = vf[k - 1] + 1
+            y = top + (x - left) - k
+            x1, y1 = x, y
+            while x < right and y < bottom and a[x] == b[y]:
+                x += 1
+                y += 1
+            vf[k] = x
+            if delta % 2 and -(d - 1) <= c <= d - 1 and y >= vb[c]:
+                return x1, y1, x, y
+
+        for c in range(d, -d - 1, -2):
+            k = c + delta
+            if c == -d or (c != d and vb[c - 1] > vb[c + 1]):
+                y = vb[c + 1]
+            else:
+                y = vb[c - 1] - 1
+            x = left + (y - top) + k
+            x2, y2 = x, y
+            while x > left and y > top and a[x - 1] == b[y - 1]:
+                x -= 1
+                y -= 1
+            vb[c] = y
+            if not delta % 2 and -d <= k <= d and x <= vf[k]:
+                return x, y, x2, y2
+    raise AssertionError("No middle snake found")
+
+@traced
+def matching_blocks(a, b):
+    """
+    Lazily yield the runs of lines common to a and b in an optimal diff, in
+    order, as (i, j, n) meaning a[i:i+n] == b[j:j+n]. Adjacent runs are merged.
+    """
+    pending = None
+    for i, j, n in _runs(a, b):
+        if pending is not None and pending[0] + pending[2] == i and pending[1] + pending[2] == j:
+            pending = (pending[0], pending[1], pending[2] + n)
+            continue
+        if pending is not None:
+            yield pending
+        pending = (i, j, n)
+    if pending is not None:
+        yield pending
+
+def _runs(a, b):
+    # Compare small integers instead of the lines themselves
+    ids = {}
+    a = [ids.setdefault(line, len(ids)) for line in a]
+    b = [ids.setdefault(line, len(ids)) for line in b]
+
+    # Regions still to split, and the runs between them, in reverse order
+    stack = [(0, 0, len(a), len(b))]
+    while stack:
+        item = stack.pop()
+        if len(item) == 3:
+            yield item
+            continue
+        left, top, right, bottom = item
+        start = left
+        while left < right and top < bottom and a[left] == b[top]:
+            left += 1
+            top += 1
+        if left > start:
+            yield start, top - (left - start), left - start
+        end = right
+        while right > left and bottom > top and a[right - 1] == b[bottom - 1]:
+            right -= 1
+            bottom -= 1
+        if end > right:
+            stack.append((right, bottom, end - right))
+        if left == right or top == bottom:
+            continue
+        x1, y1, x2, y2 = _middle_snake(a, b, left, top, right, bottom)
+        stack.append((x2, y2, right, bottom))
+        if x2 > x1:
+            stack.append((x1, y1, x2 - x1))
+        stack.append((left, top, x1, y1))
+
+def opcodes(a, b):
+    """
+    Yield ("equal" | "delete" | "insert" | "replace", i1, i2, j1, j2) tuples
+    describing how to turn a into b, in the style of difflib.
+    """
+    i = j = 0
+    for bi, bj, n in chain(matching_blocks(a, b), [(len(a), len(b), 0)]):
+        if i < bi and j < bj:
+            yield "replace", i, bi, j, bj
+        elif i < bi:
+            yield "delete", i, bi, j, j
+        elif j < bj:
+            yield "insert", i, i, j, bj
+        if n:
+            yield "equal", bi, bi + n, bj, bj + n
+        i, j = bi + n, bj + n
+
+def hunks(a, b, context: int = 3):
+    """
+    Lazily yield hunks, each a list of opcodes with at most context lines of
+    unchanged text at either end.
+    """
+    hunk = []
+    for tag, i1, i2, j1, j2 in opcodes(a, b):
+        if tag == "equal":
+            if not hunk:
+                hunk.append((tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2))
+                continue
+            if i2 - i1 > 2 * context:
+                hunk.append((tag, i1, i1 + context, j1, j1 + context))
+                yield hunk
+                hunk = [(tag, i2 - context, i2, j2 - context, j2)]
+                continue
+        hunk.append((tag, i1, i2, j1, j2))
+    if hunk and not (len(hunk) == 1 and hunk[0][0] == "equal"):
+        if hunk[-1][0] == "equal":
+            tag, i1, i2, j1, j2 = hunk[-1]
+            hunk[-1] = (tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context))
+        yield hunk
+
+def _range(start: int, length: int) -> str:
+    if length == 1:
+        return str(start + 1)
+    if length == 0:
+        return f"{start},0"
+    return f"{start + 1},{length}"
+
+def _lines(prefix: str, lines):
+    for line in lines:
+        text = line.decode(errors="replace")
+        if text.endswith("\n"):
+            yield prefix + text[:-1]
+        else:
+            yield prefix + text
+            yield "\\ No newline at end of file"
+
+def unified_diff(old, new, old_name: str, new_name: str, context: int = 3):
+    """
+    Lazily yield the lines of a unified diff between two contents, each given
+    as bytes or as an iterable of blocks. Nothing is yielded if they are equal.
+    """
+    if old == new:
+        return
+    old_head, old = sniff(old)
+    new_head, new = sniff(new)
+    if is_binary(old_head) or is_binary(new_head):
+        yield f"Binary files {old_name} and {new_name} differ"
+        return
+    old, new = b"".join(old), b"".join(new)
+    if old == new:
+        return
+    a = old.splitlines(keepends=True)
+    b = new.splitlines(keepends=True)
+    yield f"--- {old_name}"
+    yield f"+++ {new_name}"
+    for hunk in hunks(a, b, context):
+        first, last = hunk[0], hunk[-1]
+        old_range = _range(first[1], last[2] - first[1])
+        new_range = _range(first[3], last[4] - first[3])
+        yield f"@@ -{old_range} +{new_range} @@"
+        for tag, i1, i2, j1, j2 in hunk:
+            if tag == "equal":
+                yield from _lines(" ", a[i1:i2])
+                continue
+            yield from _lines("-", a[i1:i2])
+            yield from _lines("+", b[j1:j2])
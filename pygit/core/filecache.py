@@ -0,0 +1,51 @@
+import os
+import time
+
+# Values read from a file modified this recently are not reused, since coarse
+# timestamps may hide a later change (the "racily clean" problem of the index).
+RACY_NS = 2_000_000_000
+
+def signature(path):
+    """
+    Return (inode, size, mtime) for a file, or None if it does not exist.
+    Files replaced by renaming get a new inode even if size and mtime match.
+    """
+    try:
+        st = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+def is_racy(file_signature, loaded_ns: int) -> bool:
+    return file_signature is not None and file_signature[2] >= loaded_ns - RACY_NS
+
+class FileCache:
+    """
+    Values loaded from files, each reused for as long as the signatures of
+    the files it was loaded from stay the same.
+    """
+
+    def __init__(self):
+        self._values = {}
+
+    def get(self, key, paths, load):
+        """
+        Return the value cached under key if none of paths changed since it
+        was loaded, otherwise call load() and cache its result.
+        """
+        signatures = tuple(signature(path) for path in paths)
+        cached = self._values.get(key)
+        if cached is not None and cached[0] == signatures:
+            return cached[1]
+        # The signatures are taken before loading: if a file changes in
+        # between, the next call sees a new signature and loads it again
+        loaded_ns = time.time_ns()
+        value = load()
+        if any(is_racy(s, loaded_ns) for s in signatures):
+            self._values.pop(key, None)
+        else:
+            self._values[key] = (signatures, value)
+        return value
+
+    def clear(self) -> None:
+        self._values.clear()
@@ -0,0 +1,111 @@
+from pathlib import Path
+from pygit.core.ignore import IGNORE_FILE
+from pygit.core.trace import traced
+
+# Client side of the filesystem monitor daemon (fsmonitor_daemon.py), which is
+# described in docs/fsmonitor.md. Tokens are "<instance>:<sequence>".
+
+FSMONITOR_EXTENSION = "FSMN"
+SOCKET_NAME = "fsmonitor.sock"
+COOKIE_DIR = "fsmonitor-cookies"
+# Recorded in place of a hash for a tracked file that was missing
+DELETED = "-"
+QUERY_TIMEOUT = 2.0
+
+def request(repo_path: Path, message: dict, timeout: float = QUERY_TIMEOUT):
+    """
+    Send one request to the daemon and return its reply, or None if no daemon
+    is listening.
+    """
+    socket_path = Path(repo_path) / SOCKET_NAME
+    if not socket_path.exists():
+        return None  # Checked first to avoid importing socket and json
+    import json
+    import socket
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(timeout)
+            conn.connect(str(socket_path))
+            conn.sendall(json.dumps(message).encode() + b"\n")
+            data = b""
+            while not data.endswith(b"\n"):
+                chunk = conn.recv(65536)
+                if not chunk:
+                    return None
+                data += chunk
+    except OSError:
+        return None
+    return json.loads(data)
+
+def load_state(index) -> tuple:
+    """
+    Return the token and the files that differed from the index ({name: hash},
+    None for a missing file) recorded by the last status, or (None, {}).
+    """
+    data = getattr(index, "extensions", {}).get(FSMONITOR_EXTENSION)
+    if not data:
+        return None, {}
+    token, *lines = data.decode().split("\n")
+    dirty = {}
+    for line in lines:
+        if line:
+            file_hash, name = line.split(" ", 1)
+            dirty[name] = None if file_hash == DELETED else file_hash
+    return token, dirty
+
+def store_state(index, token, dirty: dict) -> None:
+    if token is None:
+        index.extensions.pop(FSMONITOR_EXTENSION, None)
+        return
+    index.extensions[FSMONITOR_EXTENSION] = "".join(
+        [token] + [f"\n{file_hash or DELETED} {name}" for name, file_hash in sorted(dirty.items())]
+    ).encode()
+
+@traced
+def changed_since(repo_path: Path, index) -> tuple:
+    """
+    Return the daemon's current token and the set of paths changed since the
+    token in index, or None for the paths if the whole tree must be walked.
+    """
+    old_token, _ = load_state(index)
+    reply = request(repo_path, {"token": old_token})
+    if reply is None:
+        return None, None
+    paths = reply["paths"]
+    if old_token is None or paths is None:
+        return reply["token"], None
+    if "" in paths or any(path.rpartition("/")[2] == IGNORE_FILE for path in paths):
+        return reply["token"], None
+    return reply["token"], set(paths)
+
+def is_changed(name: str, changed: set) -> bool:
+    """
+    Return True if name, or a directory containing it, is in changed.
+    """
+    if name in changed:
+        return True
+    parts = name.split("/")
+    return any("/".join(parts[:depth]) in changed for depth in range(1, len(parts)))
+
+def changed_files(rules, changed: set, rel_dir: str = "") -> dict:
+    """
+    Map each existing, non-ignored file in the cone at or below a changed path
+    (and below rel_dir) to its path on disk.
+    """
+    files = {}
+    for path in sorted(changed):
+        if rel_dir and not (path == rel_dir or path.startswith(rel_dir + "/") or rel_dir.startswith(path + "/")):
+            continue
+        full_path = rules.repo_root / path
+        if rules.outside_cone(path, is_dir=full_path.is_dir()):
+            continue
+        if full_path.is_dir() and not full_path.is_symlink():
+            if not rules.is_ignored(full_path):
+                start = rel_dir if rel_dir.startswith(path + "/") else path
+                for name, entry in rules.walk(start):
+                    files[name] = Path(entry.path)
+        elif full_path.is_file() and not rules.is_ignored(full_path):
+            if not rel_dir or path.startswith(rel_dir + "/"):
+                files[path] = full_path
+    return files
@@ -0,0 +1,232 @@
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import socket
+import struct
+import threading
+from pathlib import Path
+from pygit.core.fsmonitor import COOKIE_DIR, QUERY_TIMEOUT, SOCKET_NAME
+
+# The filesystem monitor daemon: watches the working tree with inotify and
+# answers change queries from the functions in fsmonitor.py.
+
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT = struct.Struct("iIII")
+
+class Inotify:
+    """
+    A minimal ctypes wrapper around the inotify system calls.
+    """
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def add_watch(self, path: str):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        # The directory may have been removed before it could be watched
+        return wd if wd >= 0 else None
+
+    def rm_watch(self, wd: int) -> None:
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self) -> list:
+        """
+        Return the pending events as (watch descriptor, mask, name) tuples.
+        """
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+class FSMonitor:
+    """
+    The daemon: keeps an inotify watch on every directory of the working tree
+    (except .pygit) and the sequence number of the last change to each path.
+    """
+
+    def __init__(self, repo_path: Path):
+        self.repo_path = Path(repo_path).resolve()
+        self.repo_root = self.repo_path.parent
+        self.socket_path = self.repo_path / SOCKET_NAME
+        self.cookie_dir = self.repo_path / COOKIE_DIR
+        self.inotify = None
+        self.watches = {}  # watch descriptor -> repo-relative directory
+        self.cookie_wd = None  # Kept apart, as a worktree directory may share its name
+        self.changed = {}  # repo-relative path -> sequence number of its last event
+        self.sequence = 0
+        self.instance = os.urandom(6).hex()
+        self.cookies = set()
+        self.ready = threading.Event()
+        self._stopping = False
+
+    @property
+    def token(self) -> str:
+        return f"{self.instance}:{self.sequence}"
+
+    def _watch_tree(self, rel_dir: str) -> None:
+        pending = [rel_dir]
+        while pending:
+            rel_dir = pending.pop()
+            path = self.repo_root / rel_dir
+            wd = self.inotify.add_watch(str(path))
+            if wd is None:
+                continue
+            self.watches[wd] = rel_dir
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False) and not (rel_dir == "" and entry.name == self.repo_path.name):
+                            pending.append(f"{rel_dir}/{entry.name}" if rel_dir else entry.name)
+            except OSError:
+                continue
+
+    def _unwatch_tree(self, rel_dir: str) -> None:
+        for wd, watched in list(self.watches.items()):
+            if watched == rel_dir or watched.startswith(rel_dir + "/"):
+                del self.watches[wd]
+                self.inotify.rm_watch(wd)
+
+    def _mark(self, path: str) -> None:
+        self.sequence += 1
+        self.changed[path] = self.sequence
+
+    def _process(self, events) -> None:
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: start over with a new instance
+                self.instance = os.urandom(6).hex()
+                self.changed.clear()
+                self.sequence = 0
+                self._watch_tree("")
+                continue
+            if wd == self.cookie_wd:
+                self.cookies.discard(name)
+                continue
+            rel_dir = self.watches.get(wd)
+            if rel_dir is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                continue
+            if not name:
+                # The watched directory itself was deleted or moved
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    self._mark(rel_dir)
+                continue
+            path = f"{rel_dir}/{name}" if rel_dir else name
+            self._mark(path)
+            if mask & IN_ISDIR:
+                if mask & IN_MOVED_FROM:
+                    self._unwatch_tree(path)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_tree(path)
+
+    def _sync(self, timeout: float = QUERY_TIMEOUT) -> bool:
+        """
+        Wait until every change made before this call has been processed, using
+        the event of a new cookie file.
+        """
+        name = f"{os.getpid()}-{self.sequence}-{os.urandom(4).hex()}"
+        self.cookies.add(name)
+        cookie = self.cookie_dir / name
+        cookie.touch()
+        try:
+            while name in self.cookies:
+                readable, _, _ = select.select([self.inotify.fd], [], [], timeout)
+                if not readable:
+                    self.cookies.discard(name)
+                    return False
+                self._process(self.inotify.read())
+            return True
+        finally:
+            cookie.unlink(missing_ok=True)
+
+    def answer(self, request: dict) -> dict:
+        if request.get("command") == "stop":
+            self._stopping = True
+            return {"token": self.token, "paths": None}
+        synced = self._sync()
+        instance, _, sequence = (request.get("token") or "").partition(":")
+        if not synced or instance != self.instance or not sequence.isdigit() or int(sequence) > self.sequence:
+            return {"token": self.token, "paths": None}
+        since = int(sequence)
+        paths = sorted(path for path, seq in self.changed.items() if seq > since)
+        return {"token": self.token, "paths": paths}
+
+    def _handle(self, conn: socket.socket) -> None:
+        with conn:
+            conn.settimeout(QUERY_TIMEOUT)
+            data = b""
+            while not data.endswith(b"\n"):
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                data += chunk
+            reply = self.answer(json.loads(data))
+            conn.sendall(json.dumps(reply).encode() + b"\n")
+
+    def serve_forever(self) -> None:
+        """
+        Watch the working tree and answer queries until stopped.
+        """
+        self.inotify = Inotify()
+        self.cookie_dir.mkdir(exist_ok=True)
+        self._watch_tree("")
+        self.cookie_wd = self.inotify.add_watch(str(self.cookie_dir))
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket_path.unlink(missing_ok=True)
+        server.bind(str(self.socket_path))
+        server.listen()
+        self.ready.set()
+        try:
+            while not self._stopping:
+                readable, _, _ = select.select([self.inotify.fd, server], [], [], 0.5)
+                if self.inotify.fd in readable:
+                    self._process(self.inotify.read())
+                if server in readable:
+                    conn, _ = server.accept()
+                    try:
+                        self._handle(conn)
+                    except (OSError, ValueError):
+                        pass
+        finally:
+            server.close()
+            self.socket_path.unlink(missing_ok=True)
+            self.inotify.close()
+
+    def stop(self) -> None:
+        self._stopping = True
@@ -1,8 +1,24 @@
-import hashlib
+import os
+from pygit.core import stats
+from pygit.core.trace import traced
 
+# Files are read into a reused buffer this large: hashing large files in
+# small reads spends more time in system calls than in SHA-1.
+READ_SIZE = 1024 * 1024
+
+@traced
 def hash_file(path):
+    import hashlib
+
     hash_object = hashlib.sha1()
-    with path.open("rb") as f:
-        while chunk := f.read(4096):
-            hash_object.update(chunk)
+    size = 0
+    with path.open("rb", buffering=0) as f:
+        length = min(READ_SIZE, max(os.fstat(f.fileno()).st_size, 1))
+        buffer = bytearray(length)
+        view = memoryview(buffer)
+        while n := f.readinto(buffer):
+            hash_object.update(view[:n])
+            size += n
+    stats.increment("files_hashed")
+    stats.increment("bytes_hashed", size)
     return hash_object.hexdigest()
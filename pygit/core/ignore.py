@@ -0,0 +1,194 @@
+import os
+import re
+import time
+from pathlib import Path
+from pygit.core import stats
+from pygit.core.filecache import is_racy, signature
+from pygit.core.sparse import load_sparse
+from pygit.core.trace import traced
+
+IGNORE_FILE = ".pygitignore"
+
+def translate_pattern(pattern: str) -> str:
+    """
+    Translate a gitignore-style glob into a regex matching paths relative to
+    the directory containing the ignore file.
+    """
+    anchored = "/" in pattern.rstrip("/")
+    pattern = pattern.strip("/")
+
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            regex += "/.*"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            regex += f"[{body}]"
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+
+    # Patterns without a slash match a name at any depth
+    return regex if anchored else "(?:.*/)?" + regex
+
+class IgnoreFile:
+    """
+    The patterns of one ignore file, compiled into a regex for files and one for
+    directories. Alternatives are in reverse order so the last pattern wins.
+    """
+
+    def __init__(self, patterns: list[str]):
+        self.negated = {}
+        self.file_regex = self._compile(patterns, directory=False)
+        self.dir_regex = self._compile(patterns, directory=True)
+
+    def _compile(self, patterns, directory):
+        alternatives = []
+        negations = []
+        for pattern in reversed(patterns):
+            negate = pattern.startswith("!")
+            if negate:
+                pattern = pattern[1:]
+            elif pattern.startswith("\\"):
+                pattern = pattern[1:]
+            if not pattern or (pattern.endswith("/") and not directory):
+                continue
+            alternatives.append(f"({translate_pattern(pattern)})")
+            negations.append(negate)
+        self.negated[directory] = negations
+        return re.compile("|".join(alternatives)) if alternatives else None
+
+    def match(self, rel_path: str, is_dir: bool):
+        """
+        Return True if the path is ignored, False if it is explicitly
+        re-included by a negated pattern, or None if no pattern matches.
+        """
+        regex = self.dir_regex if is_dir else self.file_regex
+        if regex is None:
+            return None
+        m = regex.fullmatch(rel_path)
+        if m is None:
+            return None
+        return not self.negated[is_dir][m.lastindex - 1]
+
+class IgnoreRules:
+    """
+    Ignore rules for a working tree, from the .pygitignore of every directory.
+    Each ignore file is compiled once, until refresh() finds it changed.
+    """
+
+    def __init__(self, repo_path: Path):
+        self.repo_path = Path(repo_path).resolve()
+        self.repo_root = self.repo_path.parent
+        self._files = {}
+        self._loaded = {}  # rel_dir -> (signature of the ignore file, load time)
+        self.sparse = load_sparse(self.repo_path)
+
+    def _ignore_file(self, rel_dir: str):
+        if rel_dir not in self._files:
+            path = self.repo_root / rel_dir / IGNORE_FILE
+            file_signature = signature(path)
+            self._loaded[rel_dir] = (file_signature, time.time_ns())
+            patterns = load_ignore_patterns(path) if file_signature is not None else []
+            self._files[rel_dir] = IgnoreFile(patterns) if patterns else None
+        return self._files[rel_dir]
+
+    def refresh(self) -> None:
+        """
+        Forget the ignore files changed since they were read and reload the
+        sparse-checkout cone.
+        """
+        for rel_dir, (file_signature, loaded_ns) in list(self._loaded.items()):
+            path = self.repo_root / rel_dir / IGNORE_FILE
+            if is_racy(file_signature, loaded_ns) or signature(path) != file_signature:
+                del self._files[rel_dir], self._loaded[rel_dir]
+        self.sparse = load_sparse(self.repo_path)
+
+    def outside_cone(self, rel_path: str, is_dir: bool = False) -> bool:
+        """
+        Whether rel_path is outside the sparse-checkout cone, if there is one.
+        """
+        if self.sparse is None:
+            return False
+        return not (self.sparse.includes_dir(rel_path) if is_dir else self.sparse.includes(rel_path))
+
+    def _is_excluded(self, rel_path: str, is_dir: bool) -> bool:
+        """
+        Check rel_path against the ignore files of its parent directories,
+        deepest first, assuming none of those directories is ignored.
+        """
+        parts = rel_path.split("/")
+        if parts[-1] == IGNORE_FILE and not is_dir:
+            return True
+        for depth in range(len(parts) - 1, -1, -1):
+            ignore_file = self._ignore_file("/".join(parts[:depth]))
+            if ignore_file is not None:
+                result = ignore_file.match("/".join(parts[depth:]), is_dir)
+                if result is not None:
+                    return result
+        return False
+
+    @traced
+    def is_ignored(self, path: Path) -> bool:
+        path = Path(path).resolve()
+        if path == self.repo_path or self.repo_path in path.parents:
+            return True
+        try:
+            rel_path = path.relative_to(self.repo_root).as_posix()
+        except ValueError:
+            return False  # If path is outside the repo, don't ignore it
+        if rel_path == ".":
+            return False
+
+        # A path inside an ignored directory is ignored too
+        parts = rel_path.split("/")
+        for depth in range(1, len(parts)):
+            if self._is_excluded("/".join(parts[:depth]), is_dir=True):
+                return True
+        return self._is_excluded(rel_path, is_dir=path.is_dir())
+
+    def walk(self, rel_dir: str = ""):
+        """
+        Yield (relative path, os.DirEntry) for every non-ignored file below rel_dir,
+        in index order. Ignored directories and those outside the cone are not entered.
+        """
+        with os.scandir(self.repo_root / rel_dir) as it:
+            entries = sorted(it, key=lambda e: e.name + "/" if e.is_dir(follow_symlinks=False) else e.name)
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if not rel_dir and entry.name == self.repo_path.name:
+                    continue  # The repository, whose parent is the root
+                if self.outside_cone(rel_path, is_dir=True):
+                    continue
+                if not self._is_excluded(rel_path, is_dir=True):
+                    yield from self.walk(rel_path)
+            elif entry.is_file() and not self._is_excluded(rel_path, is_dir=False):
+                stats.increment("files_walked")
+                yield rel_path, entry
+
+@traced
+def load_ignore_patterns(ignore_file: Path) -> list[str]:
+    if not ignore_file.exists():
+        return []
+    with ignore_file.open() as f:
+        lines = f.readlines()
+    return [line.strip() for line in lines if line.strip() and not line.startswith("#")]
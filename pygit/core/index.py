@@ -1,27 +1,392 @@
-import json
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from pygit.core.trace import traced
+
+# Binary index format, described in docs/foundations.md. The sorted offset table
+# lets lookups binary search an mmap-ed index without decoding every entry.
+INDEX_MAGIC = b"PGIX"
+INDEX_VERSION = 1
+HEADER = struct.Struct(">4sIII")
+ENTRY = struct.Struct(">qqQQIH20s")
+EXTENSION = struct.Struct(">4sI")
+FLAG_STAT_VALID = 0x1
+# The entry is outside the sparse-checkout cone and its file is not in the working tree
+FLAG_SKIP_WORKTREE = 0x2
+
+# Seconds to wait for another process to release index.lock
+LOCK_TIMEOUT = 5.0
+
+# Stat data recorded for each index entry. If none of these change, the file's
+# content is assumed unchanged and its hash is reused instead of rehashing.
+STAT_FIELDS = ("mtime_ns", "ctime_ns", "size", "ino", "mode")
 
 def load_index(repo_path: Path) -> dict:
     """
     Load the index file as a dictionary of filename to hash.
     If the index file does not exist, return an empty dictionary.
     """
+    return {name: entry["hash"] for name, entry in load_index_entries(repo_path).items()}
+
+class IndexEntries(dict):
+    """
+    The index as a dictionary of filename to entry, plus the raw data of its
+    extension sections, which save_index() writes back unchanged.
+    """
+
+    def __init__(self, *args, extensions=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.extensions = dict(extensions or {})
+
+@traced
+def load_index_entries(repo_path: Path) -> IndexEntries:
+    """
+    Load the index file as a dictionary of filename to entry.
+    JSON indexes written by older versions of pygit are still read.
+    """
+    import hashlib
+
     index_file = repo_path / "index"
     if not index_file.exists():
-        return {}
-    return json.loads(index_file.read_text())
+        return IndexEntries()
+    data = index_file.read_bytes()
+    if data[:4] != INDEX_MAGIC:
+        import json
 
-def save_index(repo_path: Path, index: dict) -> None:
+        raw = json.loads(data or b"{}")
+        return IndexEntries({
+            name: dict(value) if isinstance(value, dict) else {"hash": value}
+            for name, value in raw.items()
+        })
+
+    if hashlib.sha1(data[:-20]).digest() != data[-20:]:
+        raise ValueError(f"Corrupt index file: {index_file}")
+    _, version, count, ext_offset = HEADER.unpack_from(data)
+    if version != INDEX_VERSION:
+        raise ValueError(f"Unsupported index version {version}")
+    entries = IndexEntries()
+    for i in range(count):
+        offset = struct.unpack_from(">I", data, HEADER.size + 4 * i)[0]
+        name, entry = _decode_entry(data, offset)
+        entries[name] = entry
+
+    pos = ext_offset
+    while pos < len(data) - 20:
+        signature, length = EXTENSION.unpack_from(data, pos)
+        pos += EXTENSION.size
+        entries.extensions[signature.decode()] = bytes(data[pos:pos + length])
+        pos += length
+    return entries
+
+@traced
+def lookup_index_entry(repo_path: Path, name: str):
     """
-    Save the index dictionary to the index file in JSON format.
+    Look up a single path in an mmap-ed binary index without decoding the other
+    entries. Returns the entry, or None if the path is not staged.
     """
     index_file = repo_path / "index"
-    index_file.write_text(json.dumps(index, indent=2))
-
-def clear_index(repo_path: Path):
-    (repo_path / "index").unlink(missing_ok=True)
-    staging_dir = repo_path / "staging"
-    if staging_dir.exists():
-        for f in staging_dir.iterdir():
-            f.unlink()
-        staging_dir.rmdir()
+    if not index_file.exists() or index_file.stat().st_size == 0:
+        return None
+    with open(index_file, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:4] != INDEX_MAGIC:
+                return load_index_entries(repo_path).get(name)
+            _, _, count, _ = HEADER.unpack_from(mm)
+            key = name.encode()
+            lo, hi = 0, count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                offset = struct.unpack_from(">I", mm, HEADER.size + 4 * mid)[0]
+                path_len = struct.unpack_from(">H", mm, offset + ENTRY.size)[0]
+                start = offset + ENTRY.size + 2
+                mid_key = mm[start:start + path_len]
+                if mid_key == key:
+                    return _decode_entry(mm, offset)[1]
+                if mid_key < key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+    return None
+
+def _decode_entry(data, offset: int) -> tuple[str, dict]:
+    mtime_ns, ctime_ns, size, ino, mode, flags, raw_hash = ENTRY.unpack_from(data, offset)
+    path_len = struct.unpack_from(">H", data, offset + ENTRY.size)[0]
+    start = offset + ENTRY.size + 2
+    name = bytes(data[start:start + path_len]).decode()
+    entry = {"hash": raw_hash.hex()}
+    if flags & FLAG_STAT_VALID:
+        entry.update(mtime_ns=mtime_ns, ctime_ns=ctime_ns, size=size, ino=ino, mode=mode)
+    if flags & FLAG_SKIP_WORKTREE:
+        entry["skip_worktree"] = True
+    return name, entry
+
+def _encode_entry(name: str, entry) -> bytes:
+    if not isinstance(entry, dict):
+        entry = {"hash": entry}
+    flags = FLAG_STAT_VALID if all(field in entry for field in STAT_FIELDS) else 0
+    stat_values = [entry.get(field, 0) if flags else 0 for field in STAT_FIELDS]
+    if entry.get("skip_worktree"):
+        flags |= FLAG_SKIP_WORKTREE
+    path = name.encode()
+    return (ENTRY.pack(*stat_values, flags, bytes.fromhex(entry["hash"]))
+            + struct.pack(">H", len(path)) + path)
+
+def _encode_extensions(extensions: dict) -> bytes:
+    return b"".join(EXTENSION.pack(signature.encode(), len(ext_data)) + ext_data
+                    for signature, ext_data in sorted(extensions.items()))
+
+def _encode_index(index: dict) -> bytes:
+    import hashlib
+
+    entries = bytearray()
+    offsets = []
+    names = sorted(index, key=lambda name: name.encode())
+    base = HEADER.size + 4 * len(names)
+    for name in names:
+        offsets.append(base + len(entries))
+        entries += _encode_entry(name, index[name])
+
+    data = bytearray(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(names), base + len(entries)))
+    data += struct.pack(f">{len(offsets)}I", *offsets)
+    data += entries
+    data += _encode_extensions(getattr(index, "extensions", {}))
+    data += hashlib.sha1(data).digest()
+    return bytes(data)
+
+class IndexPatch:
+    """
+    A binary index opened to change a few of its entries: only the entries looked
+    up are decoded, and the unchanged ones are written back as raw bytes.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        _, _, self.count, self.ext_offset = HEADER.unpack_from(data)
+        self.offsets = struct.unpack_from(f">{self.count}I", data, HEADER.size)
+        self.extensions = {}
+        pos = self.ext_offset
+        while pos < len(data) - 20:
+            signature, length = EXTENSION.unpack_from(data, pos)
+            pos += EXTENSION.size
+            self.extensions[signature.decode()] = bytes(data[pos:pos + length])
+            pos += length
+        self.changes = {}  # name -> new entry, or None if removed
+
+    def _find(self, key: bytes) -> tuple[int, bool]:
+        """
+        Return the position of the entry for key, or where it would be
+        inserted, and whether it exists.
+        """
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = self.offsets[mid]
+            path_len = struct.unpack_from(">H", self.data, offset + ENTRY.size)[0]
+            start = offset + ENTRY.size + 2
+            mid_key = self.data[start:start + path_len]
+            if mid_key == key:
+                return mid, True
+            if mid_key < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo, False
+
+    def get(self, name: str, default=None):
+        if name in self.changes:
+            entry = self.changes[name]
+            return default if entry is None else entry
+        position, found = self._find(name.encode())
+        return _decode_entry(self.data, self.offsets[position])[1] if found else default
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def __getitem__(self, name: str) -> dict:
+        entry = self.get(name)
+        if entry is None:
+            raise KeyError(name)
+        return entry
+
+    def __setitem__(self, name: str, entry: dict) -> None:
+        self.changes[name] = entry
+
+    def pop(self, name: str, default=None):
+        entry = self.get(name, default)
+        self.changes[name] = None
+        return entry
+
+    def __delitem__(self, name: str) -> None:
+        if name not in self:
+            raise KeyError(name)
+        self.changes[name] = None
+
+    def encode(self) -> bytes:
+        import hashlib
+
+        changes = []
+        count = self.count
+        for name in sorted(self.changes, key=lambda name: name.encode()):
+            position, found = self._find(name.encode())
+            entry = self.changes[name]
+            count += (entry is not None) - found
+            changes.append((position, found, None if entry is None else _encode_entry(name, entry)))
+
+        base = HEADER.size + 4 * count
+        offsets = []
+        entries = bytearray()
+
+        def copy_run(start: int, end: int) -> None:
+            if start < end:
+                shift = base + len(entries) - self.offsets[start]
+                offsets.extend(offset + shift for offset in self.offsets[start:end])
+                stop = self.offsets[end] if end < self.count else self.ext_offset
+                entries.extend(self.data[self.offsets[start]:stop])
+
+        position = 0
+        for change_position, found, encoded in changes:
+            copy_run(position, change_position)
+            position = change_position + found
+            if encoded is not None:
+                offsets.append(base + len(entries))
+                entries.extend(encoded)
+        copy_run(position, self.count)
+
+        data = bytearray(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, count, base + len(entries)))
+        data += struct.pack(f">{count}I", *offsets)
+        data += entries
+        data += _encode_extensions(self.extensions)
+        data += hashlib.sha1(data).digest()
+        return bytes(data)
+
+@contextmanager
+def index_lock(repo_path: Path, timeout: float = LOCK_TIMEOUT):
+    """
+    Hold .pygit/index.lock for the duration of the block, waiting up to timeout
+    seconds for another process to release it.
+    """
+    lock_path = repo_path / "index.lock"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            break
+        except FileExistsError:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(
+                    f"Unable to lock '{lock_path}': another pygit process is updating the index. "
+                    "If no other process is running, remove the lock file."
+                )
+            time.sleep(0.01)
+    try:
+        os.close(fd)
+        yield lock_path
+    finally:
+        lock_path.unlink(missing_ok=True)
+
+@traced
+def _write_index(repo_path: Path, lock_path: Path, index: dict) -> None:
+    """
+    Write the index into the held lock file and rename it into place, dropping
+    the stat data of racily clean entries so the next status rehashes them.
+    """
+    # Entries an IndexPatch didn't change were checked when first written
+    encode = index.encode if isinstance(index, IndexPatch) else lambda: _encode_index(index)
+    entries = index.changes.values() if isinstance(index, IndexPatch) else index.values()
+    lock_path.write_bytes(encode())
+    written_ns = lock_path.stat().st_mtime_ns
+    racy = [
+        entry for entry in entries
+        if isinstance(entry, dict) and entry.get("mtime_ns", -1) >= written_ns
+    ]
+    if racy:
+        for entry in racy:
+            for field in STAT_FIELDS:
+                entry.pop(field, None)
+        lock_path.write_bytes(encode())
+    os.replace(lock_path, repo_path / "index")
+
+def save_index(repo_path: Path, index: dict) -> None:
+    """
+    Save the index dictionary to the index file in pygit's binary format.
+    Use locked_index() to update it while other processes may be writing.
+    """
+    with index_lock(repo_path) as lock_path:
+        _write_index(repo_path, lock_path, index)
+
+@contextmanager
+def locked_index(repo_path: Path, timeout: float = LOCK_TIMEOUT, partial: bool = False):
+    """
+    Load the index under index.lock, yield it for modification and write it back.
+    With partial=True, a binary index is yielded as an IndexPatch.
+    """
+    with index_lock(repo_path, timeout) as lock_path:
+        index = None
+        if partial:
+            index = _load_patch(repo_path)
+        if index is None:
+            index = load_index_entries(repo_path)
+        yield index
+        _write_index(repo_path, lock_path, index)
+
+def _load_patch(repo_path: Path):
+    """
+    Open the index as an IndexPatch, or return None if it is not a valid
+    binary index.
+    """
+    import hashlib
+
+    try:
+        data = (repo_path / "index").read_bytes()
+    except FileNotFoundError:
+        return None
+    if data[:4] != INDEX_MAGIC or HEADER.unpack_from(data)[1] != INDEX_VERSION:
+        return None
+    if hashlib.sha1(data[:-20]).digest() != data[-20:]:
+        raise ValueError(f"Corrupt index file: {repo_path / 'index'}")
+    return IndexPatch(data)
+
+def index_mtime_ns(repo_path: Path) -> int:
+    """
+    Return the modification time of the index file, or 0 if there is none.
+    """
+    try:
+        return (repo_path / "index").stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+def stat_data(st: os.stat_result) -> dict:
+    return {
+        "mtime_ns": st.st_mtime_ns,
+        "ctime_ns": st.st_ctime_ns,
+        "size": st.st_size,
+        "ino": st.st_ino,
+        "mode": st.st_mode,
+    }
+
+def make_entry(file_hash: str, st: os.stat_result) -> dict:
+    return {"hash": file_hash, **stat_data(st)}
+
+def is_stat_clean(entry: dict, st: os.stat_result, index_mtime: int) -> bool:
+    """
+    Return True if the entry's stat data matches st and the entry is not racily clean.
+    """
+    if entry.get("mtime_ns", index_mtime) >= index_mtime:
+        return False
+    return all(entry.get(field) == value for field, value in stat_data(st).items())
+
+def refresh_entry(entry: dict, st: os.stat_result, file_hash: str) -> bool:
+    """
+    Record fresh stat data on an entry whose content matches file_hash.
+    Returns True if the entry changed.
+    """
+    if entry["hash"] != file_hash:
+        return False
+    fresh = stat_data(st)
+    if all(entry.get(field) == value for field, value in fresh.items()):
+        return False
+    entry.update(fresh)
+    return True
@@ -0,0 +1,169 @@
+from collections import namedtuple
+from pathlib import Path
+from pygit.core import stats
+from pygit.core.diff import is_binary, matching_blocks
+from pygit.core.objects import read_object, write_object
+from pygit.core.trace import traced
+from pygit.core.tree import read_tree, serialize_tree, walk_tree
+
+# tree: the merged root tree, or None if empty; conflicts: (path, kind) pairs
+MergeResult = namedtuple("MergeResult", "tree conflicts")
+
+MARKER_SIZE = 7
+
+# The commit being merged, followed by the paths whose conflicts are not resolved yet
+MERGE_HEAD = "MERGE_HEAD"
+
+def load_merge_state(repo_path: Path):
+    """
+    Return (commit hash, unresolved paths) of the merge in progress, or None.
+    """
+    try:
+        commit_hash, *paths = (Path(repo_path) / MERGE_HEAD).read_text().splitlines()
+    except FileNotFoundError:
+        return None
+    return commit_hash, paths
+
+def save_merge_state(repo_path: Path, commit_hash: str, paths) -> None:
+    (Path(repo_path) / MERGE_HEAD).write_text("".join(f"{line}\n" for line in [commit_hash, *paths]))
+
+def clear_merge_state(repo_path: Path) -> None:
+    (Path(repo_path) / MERGE_HEAD).unlink(missing_ok=True)
+
+def has_conflict_markers(data: bytes) -> bool:
+    return data.startswith(b"<" * MARKER_SIZE + b" ") or b"\n" + b"<" * MARKER_SIZE + b" " in data
+
+def merge_lines(base: list, ours: list, theirs: list, labels=("ours", "theirs")) -> tuple:
+    """
+    Merge two versions of a list of lines with their common ancestor, and return
+    the merged lines and whether any conflict, written between conflict markers.
+    """
+    merged = []
+    conflicted = False
+    z = a = b = 0  # Positions in base, ours and theirs
+    for z_start, z_end, a_start, b_start in _sync_regions(base, ours, theirs):
+        base_part, ours_part, theirs_part = base[z:z_start], ours[a:a_start], theirs[b:b_start]
+        if ours_part == theirs_part or theirs_part == base_part:
+            merged += ours_part
+        elif ours_part == base_part:
+            merged += theirs_part
+        else:
+            conflicted = True
+            merged.append(f"{'<' * MARKER_SIZE} {labels[0]}\n".encode())
+            merged += _terminated(ours_part)
+            merged.append(f"{'=' * MARKER_SIZE}\n".encode())
+            merged += _terminated(theirs_part)
+            merged.append(f"{'>' * MARKER_SIZE} {labels[1]}\n".encode())
+        merged += base[z_start:z_end]
+        length = z_end - z_start
+        z, a, b = z_end, a_start + length, b_start + length
+    return merged, conflicted
+
+def _terminated(lines: list) -> list:
+    """
+    Make sure the last line ends with a newline, so a marker can follow it.
+    """
+    if lines and not lines[-1].endswith(b"\n"):
+        return lines[:-1] + [lines[-1] + b"\n"]
+    return lines
+
+def _sync_regions(base: list, ours: list, theirs: list):
+    """
+    Yield (base start, base end, ours start, theirs start) for each run of
+    base lines matched on both sides, then an empty one at the very end.
+    """
+    ours_blocks = list(matching_blocks(base, ours))
+    theirs_blocks = list(matching_blocks(base, theirs))
+    i = j = 0
+    while i < len(ours_blocks) and j < len(theirs_blocks):
+        a_base, a, a_len = ours_blocks[i]
+        b_base, b, b_len = theirs_blocks[j]
+        start = max(a_base, b_base)
+        end = min(a_base + a_len, b_base + b_len)
+        if start < end:
+            yield start, end, a + start - a_base, b + start - b_base
+        if a_base + a_len < b_base + b_len:
+            i += 1
+        else:
+            j += 1
+    yield len(base), len(base), len(ours), len(theirs)
+
+def merge_blobs(repo_path: Path, base, ours: str, theirs: str, labels) -> tuple:
+    """
+    Merge the contents of two blobs (base may be None) and return the merged
+    blob's hash and whether it conflicts. Binary files keep ours, as a conflict.
+    """
+    stats.increment("files_merged")
+    base_data = read_object(repo_path, base)[1] if base else b""
+    ours_data = read_object(repo_path, ours)[1]
+    theirs_data = read_object(repo_path, theirs)[1]
+    if any(is_binary(data) for data in (base_data, ours_data, theirs_data)):
+        return ours, True
+    lines, conflicted = merge_lines(base_data.splitlines(keepends=True), ours_data.splitlines(keepends=True),
+                                    theirs_data.splitlines(keepends=True), labels)
+    return write_object(repo_path, b"".join(lines)), conflicted
+
+@traced
+def merge_trees(repo_path: Path, base, ours, theirs, labels=("ours", "theirs")) -> MergeResult:
+    """
+    Three-way merge two trees (None for an empty tree) with their common ancestor,
+    reading only the entries both sides changed, and return a MergeResult.
+    """
+    conflicts = []
+    tree = _merge_tree(repo_path, base, ours, theirs, "", labels, conflicts)
+    return MergeResult(tree, conflicts)
+
+def _merge_tree(repo_path: Path, base, ours, theirs, prefix: str, labels, conflicts: list):
+    if ours == theirs or base == theirs:
+        return ours
+    if base == ours:
+        return theirs
+    base_entries = read_tree(repo_path, base) if base else {}
+    ours_entries = read_tree(repo_path, ours) if ours else {}
+    theirs_entries = read_tree(repo_path, theirs) if theirs else {}
+    merged = {}
+    for name in sorted(base_entries.keys() | ours_entries.keys() | theirs_entries.keys()):
+        base_entry = base_entries.get(name)
+        ours_entry = ours_entries.get(name)
+        theirs_entry = theirs_entries.get(name)
+        if ours_entry == theirs_entry or base_entry == theirs_entry:
+            entry = ours_entry
+        elif base_entry == ours_entry:
+            entry = theirs_entry
+        else:
+            entry = _merge_entry(repo_path, base_entry, ours_entry, theirs_entry,
+                                 prefix + name, labels, conflicts)
+        if entry is not None:
+            merged[name] = entry
+    if not merged:
+        return None
+    return write_object(repo_path, serialize_tree(merged), "tree")
+
+def _merge_entry(repo_path: Path, base, ours, theirs, path: str, labels, conflicts: list):
+    """
+    Merge a tree entry, a (type, hash) pair or None, changed on both sides.
+    """
+    def hash_of(entry, obj_type):
+        return entry[1] if entry is not None and entry[0] == obj_type else None
+
+    if ours is not None and theirs is not None and ours[0] == theirs[0] == "tree":
+        tree = _merge_tree(repo_path, hash_of(base, "tree"), ours[1], theirs[1], f"{path}/",
+                           labels, conflicts)
+        return ("tree", tree) if tree else None
+    if ours is not None and theirs is not None and ours[0] == theirs[0] == "blob":
+        blob, conflicted = merge_blobs(repo_path, hash_of(base, "blob"), ours[1], theirs[1], labels)
+        if conflicted:
+            conflicts.append((path, "content" if hash_of(base, "blob") else "add/add"))
+        return ("blob", blob)
+    if ours is None or theirs is None:
+        # Deleted on one side, changed on the other: keep the changed version,
+        # with a conflict for each file, which is what gets resolved
+        kept = ours or theirs
+        if kept[0] == "tree":
+            conflicts.extend((f"{path}/{name}", "modify/delete")
+                             for name, obj_type, _ in walk_tree(repo_path, kept[1]) if obj_type == "blob")
+        else:
+            conflicts.append((path, "modify/delete"))
+        return kept
+    conflicts.append((path, "file/directory"))
+    return ours
@@ -1,22 +1,376 @@
-import json
-import hashlib
+import os
+import zlib
 from pathlib import Path
-from typing import Optional
+from pygit.core import cache, stats
+from pygit.core.pack import load_packs
+from pygit.core.trace import traced
+
+# Files are streamed through the hasher and compressor in blocks of this size,
+# so adding a file takes bounded memory regardless of its size.
+BLOCK_SIZE = 64 * 1024
+
+# A file stored in chunks is a "manifest" object listing its chunk blobs as
+# "<chunk hash> <size>" lines, named by the hash of the whole file's content.
 
 def generate_commit_hash(commit_data):
+    import hashlib
+    import json
+
     data_str = json.dumps(commit_data, sort_keys=True)
     return hashlib.sha1(data_str.encode()).hexdigest()
 
+@traced
 def save_commit(repo_path: Path, commit_hash: str, commit_data: dict):
+    import json
+
     commits_dir = repo_path / "commits"
     commits_dir.mkdir(exist_ok=True)
     (commits_dir / f"{commit_hash}.json").write_text(json.dumps(commit_data, indent=2))
 
-def load_commit_tree(repo_path: Path, commit_hash: Optional[str]) -> dict:
+@traced
+def load_commit(repo_path: Path, commit_hash: "str | None") -> "dict | None":
+    import json
+
     if not commit_hash:
-        return {}
+        return None
+    commit = cache.objects.get(("commit", commit_hash))
+    if commit is not None:
+        return commit
     commit_path = repo_path / "commits" / f"{commit_hash}.json"
     if not commit_path.exists():
+        return None
+    text = commit_path.read_text()
+    commit = json.loads(text)
+    cache.objects.put(("commit", commit_hash), commit, len(text))
+    return commit
+
+def load_commit_tree(repo_path: Path, commit_hash: "str | None"):
+    """
+    Return a mapping of file path to blob hash for a commit, a LazyTree when it
+    has a root tree. The tree is taken from the commit-graph when possible.
+    """
+    from pygit.core.commit_graph import NULL_HASH, load_commit_graph
+    from pygit.core.tree import LazyTree
+
+    row = load_commit_graph(repo_path).lookup(commit_hash) if commit_hash else None
+    if row is not None and row["tree"] != NULL_HASH.hex():
+        return LazyTree(repo_path, row["tree"])
+    commit = load_commit(repo_path, commit_hash)
+    if commit is None:
         return {}
-    commit = json.loads(commit_path.read_text())
+    if "tree" in commit:
+        return LazyTree(repo_path, commit["tree"])
     return commit.get("files", {})
+
+def object_path(repo_path: Path, obj_hash: str) -> Path:
+    """
+    Objects are sharded by the first two hex digits of their hash, e.g.
+    .pygit/objects/ab/cdef..., to keep directories small.
+    """
+    return repo_path / "objects" / obj_hash[:2] / obj_hash[2:]
+
+def object_exists(repo_path: Path, obj_hash: str) -> bool:
+    if object_path(repo_path, obj_hash).exists():
+        return True
+    return any(obj_hash in pack for pack in load_packs(repo_path))
+
+def _read_packed(repo_path: Path, obj_hash: str) -> tuple[str, bytes]:
+    for pack in load_packs(repo_path):
+        found = pack.read(obj_hash)
+        if found is not None:
+            stats.increment("objects_read")
+            return found
+    raise FileNotFoundError(f"Object {obj_hash} not found")
+
+def iter_loose_objects(repo_path: Path):
+    """
+    Yield the hashes of all loose (unpacked) objects.
+    """
+    objects_dir = repo_path / "objects"
+    if not objects_dir.exists():
+        return
+    for shard in sorted(objects_dir.iterdir()):
+        if len(shard.name) == 2 and shard.is_dir():
+            for path in sorted(shard.iterdir()):
+                yield shard.name + path.name
+
+def _store(repo_path: Path, obj_hash: str, tmp_path: str) -> None:
+    """
+    Atomically move a fully written temporary object into place, or discard
+    it if the object already exists.
+    """
+    final_path = object_path(repo_path, obj_hash)
+    if final_path.exists():
+        os.unlink(tmp_path)
+        return
+    final_path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_path, final_path)
+    stats.increment("objects_written")
+
+def _temp_object(repo_path: Path):
+    import tempfile
+
+    objects_dir = repo_path / "objects"
+    objects_dir.mkdir(parents=True, exist_ok=True)
+    return tempfile.mkstemp(dir=objects_dir, prefix="tmp_obj_")
+
+@traced
+def write_object(repo_path: Path, data: bytes, obj_type: str = "blob", loose: bool = False,
+                 obj_hash: "str | None" = None) -> str:
+    """
+    Store data as a zlib-compressed object and return its hash (obj_hash if given).
+    With loose=True, a loose copy is written even if the object is packed.
+    """
+    import hashlib
+
+    if obj_hash is None:
+        obj_hash = hashlib.sha1(data).hexdigest()
+    if object_path(repo_path, obj_hash).exists() or (not loose and object_exists(repo_path, obj_hash)):
+        return obj_hash
+    fd, tmp_path = _temp_object(repo_path)
+    with os.fdopen(fd, "wb") as out:
+        out.write(zlib.compress(f"{obj_type} {len(data)}\0".encode() + data))
+    _store(repo_path, obj_hash, tmp_path)
+    return obj_hash
+
+@traced
+def write_blob(repo_path: Path, file_path: Path, chunked: bool = False) -> str:
+    """
+    Store the contents of a file as a blob in one streaming pass and return its
+    hash. With chunked=True, large files are stored in chunks instead.
+    """
+    import hashlib
+
+    if chunked:
+        from pygit.core.chunking import MAX_CHUNK
+
+        if os.stat(file_path).st_size >= MAX_CHUNK:
+            return _write_chunked(repo_path, file_path)
+    fd, tmp_path = _temp_object(repo_path)
+    try:
+        with open(file_path, "rb") as f, os.fdopen(fd, "wb") as out:
+            size = os.fstat(f.fileno()).st_size
+            hash_object = hashlib.sha1()
+            compressor = zlib.compressobj()
+            out.write(compressor.compress(f"blob {size}\0".encode()))
+            read = 0
+            while block := f.read(BLOCK_SIZE):
+                read += len(block)
+                hash_object.update(block)
+                out.write(compressor.compress(block))
+            out.write(compressor.flush())
+        if read != size:
+            raise OSError(f"'{file_path}' changed while it was being stored")
+        stats.increment("bytes_hashed", read)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    stats.increment("files_hashed")
+    obj_hash = hash_object.hexdigest()
+    _store(repo_path, obj_hash, tmp_path)
+    return obj_hash
+
+@traced
+def _write_chunked(repo_path: Path, file_path: Path) -> str:
+    """
+    Store a file as content-defined chunks and a manifest listing them, and
+    return the hash of its content.
+    """
+    import hashlib
+    from pygit.core.chunking import iter_chunks
+
+    hash_object = hashlib.sha1()
+    manifest = []
+    read = 0
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        for chunk in iter_chunks(f):
+            hash_object.update(chunk)
+            manifest.append(f"{write_object(repo_path, chunk)} {len(chunk)}\n")
+            read += len(chunk)
+    if read != size:
+        raise OSError(f"'{file_path}' changed while it was being stored")
+    stats.increment("bytes_hashed", read)
+    stats.increment("files_hashed")
+    obj_hash = hash_object.hexdigest()
+    return write_object(repo_path, "".join(manifest).encode(), "manifest", obj_hash=obj_hash)
+
+def parse_manifest(data: bytes) -> list:
+    """
+    Return the (chunk hash, size) pairs listed by a manifest.
+    """
+    return [(line[:40], int(line[41:])) for line in data.decode().splitlines()]
+
+def _inflate(f):
+    """
+    Decompress a zlib stream from a file object, yielding at most BLOCK_SIZE
+    bytes at a time.
+    """
+    decompressor = zlib.decompressobj()
+    while block := f.read(BLOCK_SIZE):
+        while block:
+            yield decompressor.decompress(block, BLOCK_SIZE)
+            block = decompressor.unconsumed_tail
+    yield decompressor.flush()
+
+def iter_object(repo_path: Path, obj_hash: str):
+    """
+    Decompress an object incrementally, yielding its type and then its content
+    in blocks of at most BLOCK_SIZE bytes.
+    """
+    obj_type, _, blocks = open_object(repo_path, obj_hash)
+    yield obj_type
+    yield from blocks
+
+def open_object(repo_path: Path, obj_hash: str) -> tuple[str, int, object]:
+    """
+    Return the type and size of an object, read from its header, and an iterator
+    over its content in blocks. A manifest is returned as the blob it stands for.
+    """
+    blocks = _iter_stored(repo_path, obj_hash)
+    obj_type, size = next(blocks)
+    if obj_type != "manifest":
+        return obj_type, size, blocks
+    chunks = parse_manifest(b"".join(blocks))
+    return "blob", sum(chunk_size for _, chunk_size in chunks), _iter_chunks(repo_path, chunks)
+
+def _iter_chunks(repo_path: Path, chunks):
+    for chunk_hash, _ in chunks:
+        chunk_blocks = _iter_stored(repo_path, chunk_hash)
+        next(chunk_blocks)
+        yield from chunk_blocks
+
+def _iter_stored(repo_path: Path, obj_hash: str):
+    """
+    Yield the (type, size) of a stored object, then its content in blocks.
+    """
+    try:
+        f = object_path(repo_path, obj_hash).open("rb")
+    except FileNotFoundError:
+        obj_type, content = _read_packed(repo_path, obj_hash)
+        yield obj_type, len(content)
+        for start in range(0, len(content), BLOCK_SIZE):
+            yield content[start:start + BLOCK_SIZE]
+        return
+
+    header = b""
+    with f:
+        for data in _inflate(f):
+            if header is not None:
+                header += data
+                if b"\0" not in header:
+                    continue
+                head, data = header.split(b"\0", 1)
+                header = None
+                obj_type, size = head.split(b" ")
+                yield obj_type.decode(), int(size)
+            if data:
+                yield data
+    stats.increment("objects_read")
+
+def iter_raw_object(repo_path: Path, obj_hash: str) -> tuple[int, object]:
+    """
+    Return the size of an object in its stored form and an iterator over it in
+    blocks of at most BLOCK_SIZE bytes, for copying it to another repository.
+    """
+    path = object_path(repo_path, obj_hash)
+    if not path.exists():
+        obj_type, content = _read_packed(repo_path, obj_hash)
+        data = zlib.compress(f"{obj_type} {len(content)}\0".encode() + content)
+        return len(data), (data[start:start + BLOCK_SIZE] for start in range(0, len(data), BLOCK_SIZE))
+
+    def blocks(f):
+        with f:
+            while block := f.read(BLOCK_SIZE):
+                yield block
+
+    f = path.open("rb")
+    return os.fstat(f.fileno()).st_size, blocks(f)
+
+def store_raw_object(repo_path: Path, obj_hash: str, blocks) -> None:
+    """
+    Store an object given in its stored form by iter_raw_object, checking that
+    its content matches obj_hash.
+    """
+    import hashlib
+
+    fd, tmp_path = _temp_object(repo_path)
+    try:
+        decompressor = zlib.decompressobj()
+        hash_object = hashlib.sha1()
+        header = b""
+        with os.fdopen(fd, "wb") as out:
+            for block in blocks:
+                out.write(block)
+                while block:
+                    data = decompressor.decompress(block, BLOCK_SIZE)
+                    block = decompressor.unconsumed_tail
+                    if header is not None:
+                        header += data
+                        if b"\0" not in header:
+                            continue
+                        header, data = header.split(b"\0", 1)
+                        obj_type = header.split(b" ")[0].decode()
+                        header = None
+                    hash_object.update(data)
+        if header is not None or not decompressor.eof:
+            raise ValueError(f"Object {obj_hash} is corrupt")
+        if obj_type != "manifest" and hash_object.hexdigest() != obj_hash:
+            raise ValueError(f"Object {obj_hash} does not match its content")
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    _store(repo_path, obj_hash, tmp_path)
+
+def object_type(repo_path: Path, obj_hash: str) -> str:
+    """
+    Return the type of a stored object, decompressing only its header.
+    """
+    return object_header(repo_path, obj_hash)[0]
+
+def object_header(repo_path: Path, obj_hash: str) -> tuple[str, int]:
+    """
+    Return the (type, size) of a stored object, as stored (a manifest is not
+    expanded), decompressing only its header.
+    """
+    path = object_path(repo_path, obj_hash)
+    if not path.exists():
+        for pack in load_packs(repo_path):
+            header = pack.object_header(obj_hash)
+            if header is not None:
+                return header
+        raise FileNotFoundError(f"Object {obj_hash} not found")
+    decompressor = zlib.decompressobj()
+    header = b""
+    with path.open("rb") as f:
+        while b"\0" not in header:
+            block = f.read(64)
+            if not block:
+                raise ValueError(f"Object {obj_hash} is corrupt")
+            header += decompressor.decompress(block)
+    obj_type, size = header.split(b"\0", 1)[0].split(b" ")
+    return obj_type.decode(), int(size)
+
+@traced
+def read_object(repo_path: Path, obj_hash: str, expand: bool = True) -> tuple[str, bytes]:
+    """
+    Return the (type, content) of a stored object, loose or packed. A manifest
+    is returned as the blob it stands for, unless expand is False.
+    """
+    found = cache.objects.get(("blob", obj_hash)) if expand else None
+    if found is not None:
+        return found
+    path = object_path(repo_path, obj_hash)
+    if not path.exists():
+        found = _read_packed(repo_path, obj_hash)
+    else:
+        data = zlib.decompress(path.read_bytes())
+        header, content = data.split(b"\0", 1)
+        stats.increment("objects_read")
+        found = header.split(b" ")[0].decode(), content
+    if found[0] == "manifest" and expand:
+        found = "blob", b"".join(read_object(repo_path, chunk_hash)[1]
+                                 for chunk_hash, _ in parse_manifest(found[1]))
+    if found[0] == "blob":
+        cache.objects.put(("blob", obj_hash), found, len(found[1]))
+    return found
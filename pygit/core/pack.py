@@ -0,0 +1,392 @@
+import bisect
+from collections import OrderedDict
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+from pygit.core.trace import traced
+
+# Packfiles and their .idx lookup tables; the format is described in docs/gc.md.
+
+PACK_MAGIC = b"PACK"
+INDEX_MAGIC = b"PIDX"
+VERSION = 1
+
+TYPE_CODES = {"blob": 1, "tree": 2, "commit": 3, "manifest": 4}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+DELTA = 7
+
+# Each object is deltified against the previous DELTA_WINDOW objects of its type.
+DELTA_WINDOW = 10
+DELTA_MAX_DEPTH = 10
+DELTA_MAX_SIZE = 1024 * 1024
+DELTA_BLOCK = 16
+
+# Bytes of recently decoded delta bases kept per pack, so reads of objects
+# sharing a delta chain don't re-apply the whole chain each time.
+DELTA_BASE_CACHE_BYTES = 16 * 1024 * 1024
+
+FANOUT_OFFSET = 8
+HASHES_OFFSET = FANOUT_OFFSET + 256 * 4
+
+def encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def decode_varint(data, pos: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+def _emit_insert(out: bytearray, data: bytes) -> None:
+    for start in range(0, len(data), 127):
+        chunk = data[start:start + 127]
+        out.append(len(chunk))
+        out += chunk
+
+def _emit_copy(out: bytearray, offset: int, size: int) -> None:
+    while size:
+        length = min(size, 0xFFFFFF)
+        op = 0x80
+        args = bytearray()
+        for shift in range(4):
+            byte = (offset >> (8 * shift)) & 0xFF
+            if byte:
+                op |= 1 << shift
+                args.append(byte)
+        for shift in range(3):
+            byte = (length >> (8 * shift)) & 0xFF
+            if byte:
+                op |= 0x10 << shift
+                args.append(byte)
+        out.append(op)
+        out += args
+        offset += length
+        size -= length
+
+def delta_index(base: bytes) -> dict:
+    """
+    Index base by its aligned DELTA_BLOCK-byte blocks.
+    """
+    index = {}
+    for i in range(0, len(base) - DELTA_BLOCK + 1, DELTA_BLOCK):
+        index.setdefault(base[i:i + DELTA_BLOCK], i)
+    return index
+
+def create_delta(base: bytes, target: bytes, max_size=None, index=None):
+    """
+    Encode target as copy/insert instructions against base. Returns None if
+    the delta would be larger than max_size.
+    """
+    if index is None:
+        index = delta_index(base)
+
+    out = bytearray(encode_varint(len(base)) + encode_varint(len(target)))
+    literal_start = i = 0
+    n = len(target)
+    while i <= n - DELTA_BLOCK:
+        offset = index.get(target[i:i + DELTA_BLOCK])
+        if offset is None:
+            i += 1
+            continue
+        start, base_start = i, offset
+        while start > literal_start and base_start > 0 and target[start - 1] == base[base_start - 1]:
+            start -= 1
+            base_start -= 1
+        end, base_end = i + DELTA_BLOCK, offset + DELTA_BLOCK
+        while target[end:end + 256] == base[base_end:base_end + 256] and end + 256 <= n:
+            end += 256
+            base_end += 256
+        while end < n and base_end < len(base) and target[end] == base[base_end]:
+            end += 1
+            base_end += 1
+
+        _emit_insert(out, target[literal_start:start])
+        _emit_copy(out, base_start, end - start)
+        literal_start = i = end
+        if max_size is not None and len(out) > max_size:
+            return None
+
+    _emit_insert(out, target[literal_start:])
+    if max_size is not None and len(out) > max_size:
+        return None
+    return bytes(out)
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    base_size, pos = decode_varint(delta, 0)
+    result_size, pos = decode_varint(delta, pos)
+    if base_size != len(base):
+        raise ValueError("Delta does not apply to this base object")
+    out = bytearray()
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            offset = size = 0
+            for shift in range(4):
+                if op & (1 << shift):
+                    offset |= delta[pos] << (8 * shift)
+                    pos += 1
+            for shift in range(3):
+                if op & (0x10 << shift):
+                    size |= delta[pos] << (8 * shift)
+                    pos += 1
+            out += base[offset:offset + size]
+        else:
+            out += delta[pos:pos + op]
+            pos += op
+    if len(out) != result_size:
+        raise ValueError("Corrupt delta")
+    return bytes(out)
+
+@traced
+def write_pack(pack_dir: Path, objects, read) -> Path:
+    """
+    Write objects, a list of (hash, type, size, path), into a new packfile and
+    index in pack_dir, reading each through read(hash). Returns the .pack path.
+    """
+    import hashlib
+    import tempfile
+
+    pack_dir.mkdir(parents=True, exist_ok=True)
+    ordered = sorted(objects, key=lambda o: (o[1], o[3], -o[2], o[0]))
+    offsets = {}
+    window = []  # (type, data, index, offset, depth) of recently written objects
+
+    fd, tmp_pack = tempfile.mkstemp(dir=pack_dir, prefix="tmp_pack_")
+    checksum = hashlib.sha1()
+    with os.fdopen(fd, "wb") as out:
+        def emit(data: bytes):
+            checksum.update(data)
+            out.write(data)
+
+        emit(PACK_MAGIC + struct.pack(">II", VERSION, len(ordered)))
+        offset = 12
+        for obj_hash, obj_type, size, _ in ordered:
+            data = read(obj_hash)
+            best = None
+            if len(data) <= DELTA_MAX_SIZE:
+                for base_type, base_data, base_index, base_offset, depth in reversed(window):
+                    if base_type != obj_type or depth >= DELTA_MAX_DEPTH:
+                        continue
+                    if len(base_data) > 2 * len(data) + 64:
+                        continue
+                    limit = (len(best[0]) if best else len(data) // 2) - 1
+                    delta = create_delta(base_data, data, max_size=limit, index=base_index)
+                    if delta is not None:
+                        best = (delta, base_offset, depth + 1)
+
+            if best:
+                delta, base_offset, depth = best
+                body = zlib.compress(delta)
+                header = (bytes([DELTA]) + encode_varint(len(delta)) + encode_varint(len(body))
+                          + encode_varint(offset - base_offset))
+            else:
+                depth = 0
+                body = zlib.compress(data)
+                header = bytes([TYPE_CODES[obj_type]]) + encode_varint(len(data)) + encode_varint(len(body))
+
+            offsets[obj_hash] = offset
+            emit(header)
+            emit(body)
+            offset += len(header) + len(body)
+
+            if len(data) <= DELTA_MAX_SIZE:
+                window.append((obj_type, data, delta_index(data), offsets[obj_hash], depth))
+                if len(window) > DELTA_WINDOW:
+                    window.pop(0)
+
+        pack_checksum = checksum.digest()
+        out.write(pack_checksum)
+
+    name = f"pack-{hashlib.sha1(''.join(sorted(offsets)).encode()).hexdigest()}"
+    pack_path = pack_dir / f"{name}.pack"
+    os.replace(tmp_pack, pack_path)
+    write_pack_index(pack_dir / f"{name}.idx", offsets, pack_checksum)
+    return pack_path
+
+def write_pack_index(idx_path: Path, offsets: dict, pack_checksum: bytes) -> None:
+    import hashlib
+    import tempfile
+
+    hashes = sorted(offsets)
+    fanout = [0] * 256
+    for obj_hash in hashes:
+        fanout[int(obj_hash[:2], 16)] += 1
+    for i in range(1, 256):
+        fanout[i] += fanout[i - 1]
+
+    data = bytearray(INDEX_MAGIC + struct.pack(">I", VERSION))
+    data += struct.pack(">256I", *fanout)
+    for obj_hash in hashes:
+        data += bytes.fromhex(obj_hash)
+    data += struct.pack(f">{len(hashes)}Q", *(offsets[h] for h in hashes))
+    data += pack_checksum
+    data += hashlib.sha1(data).digest()
+
+    fd, tmp_idx = tempfile.mkstemp(dir=idx_path.parent, prefix="tmp_idx_")
+    with os.fdopen(fd, "wb") as out:
+        out.write(data)
+    os.replace(tmp_idx, idx_path)
+
+class _HashList:
+    """
+    A read-only sequence view of the sorted hashes in an mmap-ed index, so
+    bisect can search it without copying it.
+    """
+
+    def __init__(self, mm, count):
+        self.mm = mm
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        start = HASHES_OFFSET + 20 * i
+        return self.mm[start:start + 20]
+
+class PackIndex:
+    """
+    A pack's .idx file, mmap-ed so a lookup reads only the fanout entry and
+    about log2(n) hashes instead of loading the whole index.
+    """
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:4] != INDEX_MAGIC:
+            raise ValueError(f"{path} is not a pack index")
+        self.count = struct.unpack_from(">I", self.mm, FANOUT_OFFSET + 255 * 4)[0]
+        self.hashes = _HashList(self.mm, self.count)
+        self.offsets_start = HASHES_OFFSET + 20 * self.count
+
+    def find(self, obj_hash: str):
+        """
+        Return the pack offset of the object, or None if it is not in the pack.
+        """
+        key = bytes.fromhex(obj_hash)
+        first = key[0]
+        lo = struct.unpack_from(">I", self.mm, FANOUT_OFFSET + (first - 1) * 4)[0] if first else 0
+        hi = struct.unpack_from(">I", self.mm, FANOUT_OFFSET + first * 4)[0]
+        i = bisect.bisect_left(self.hashes, key, lo, hi)
+        if i < hi and self.hashes[i] == key:
+            return struct.unpack_from(">Q", self.mm, self.offsets_start + 8 * i)[0]
+        return None
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.hashes[i].hex()
+
+class Pack:
+    def __init__(self, pack_path: Path):
+        self.path = pack_path
+        self.index = PackIndex(pack_path.with_suffix(".idx"))
+        with open(pack_path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:4] != PACK_MAGIC:
+            raise ValueError(f"{pack_path} is not a packfile")
+        self._bases = OrderedDict()
+        self._bases_size = 0
+
+    def __contains__(self, obj_hash: str) -> bool:
+        return self.index.find(obj_hash) is not None
+
+    @traced
+    def read(self, obj_hash: str):
+        """
+        Return (type, content) of an object, or None if it is not in the pack.
+        """
+        offset = self.index.find(obj_hash)
+        if offset is None:
+            return None
+        return self._read_at(offset)
+
+    def object_type(self, obj_hash: str):
+        """
+        Return the type of an object without decompressing it, or None if
+        it is not in the pack.
+        """
+        offset = self.index.find(obj_hash)
+        if offset is None:
+            return None
+        while self.mm[offset] == DELTA:
+            _, pos = decode_varint(self.mm, offset + 1)
+            _, pos = decode_varint(self.mm, pos)
+            distance, _ = decode_varint(self.mm, pos)
+            offset -= distance
+        return TYPE_NAMES[self.mm[offset]]
+
+    def object_header(self, obj_hash: str):
+        """
+        Return the (type, size) of an object, decompressing at most the
+        start of a delta, or None if it is not in the pack.
+        """
+        offset = self.index.find(obj_hash)
+        if offset is None:
+            return None
+        code = self.mm[offset]
+        size, pos = decode_varint(self.mm, offset + 1)
+        if code != DELTA:
+            return TYPE_NAMES[code], size
+        compressed_size, pos = decode_varint(self.mm, pos)
+        _, pos = decode_varint(self.mm, pos)
+        # A delta starts with the sizes of its base and of its result
+        head = zlib.decompressobj().decompress(self.mm[pos:pos + compressed_size], 20)
+        _, head_pos = decode_varint(head, 0)
+        return self.object_type(obj_hash), decode_varint(head, head_pos)[0]
+
+    def _read_at(self, offset: int) -> tuple[str, bytes]:
+        code = self.mm[offset]
+        size, pos = decode_varint(self.mm, offset + 1)
+        compressed_size, pos = decode_varint(self.mm, pos)
+        if code == DELTA:
+            distance, pos = decode_varint(self.mm, pos)
+            obj_type, base = self._read_base(offset - distance)
+            delta = zlib.decompress(self.mm[pos:pos + compressed_size])
+            return obj_type, apply_delta(base, delta)
+        return TYPE_NAMES[code], zlib.decompress(self.mm[pos:pos + compressed_size])
+
+    def _read_base(self, offset: int) -> tuple[str, bytes]:
+        if offset in self._bases:
+            self._bases.move_to_end(offset)
+            return self._bases[offset]
+        base = self._bases[offset] = self._read_at(offset)
+        self._bases_size += len(base[1])
+        while self._bases_size > DELTA_BASE_CACHE_BYTES:
+            _, evicted = self._bases.popitem(last=False)
+            self._bases_size -= len(evicted[1])
+        return base
+
+_pack_cache = {}
+
+@traced
+def load_packs(repo_path: Path) -> list:
+    """
+    Return the packs of a repository. The list is cached and only rebuilt
+    when the pack directory changes.
+    """
+    pack_dir = repo_path / "objects" / "pack"
+    try:
+        mtime = pack_dir.stat().st_mtime_ns
+    except FileNotFoundError:
+        return []
+    key = str(pack_dir)
+    cached = _pack_cache.get(key)
+    if cached is None or cached[0] != mtime:
+        packs = [Pack(p.with_suffix(".pack")) for p in sorted(pack_dir.glob("pack-*.idx"))]
+        cached = _pack_cache[key] = (mtime, packs)
+    return cached[1]
@@ -0,0 +1,98 @@
+from pathlib import Path
+from pygit.core.commit_graph import NULL_HASH, get_commit_info, load_commit_graph
+from pygit.core.index import load_index_entries
+from pygit.core.merge import load_merge_state
+from pygit.core.objects import load_commit, object_type, parse_manifest, read_object
+from pygit.core.repo import list_branch_tips
+from pygit.core.trace import traced
+from pygit.core.tree import load_cache_tree, read_tree
+
+@traced
+def mark_reachable(repo_path: Path, commits=None, objects=None) -> tuple[set, set]:
+    """
+    Return the commits reachable from the branches, HEAD and MERGE_HEAD, and the
+    objects reachable from them or from the index, adding only to the given sets.
+    """
+    commits = set() if commits is None else commits
+    objects = set() if objects is None else objects
+    graph = load_commit_graph(repo_path)
+
+    roots = list_branch_tips(repo_path)
+    merging = load_merge_state(repo_path)
+    if merging is not None:
+        roots.append(merging[0])
+    pending = [tip for tip in roots if tip not in commits]
+    while pending:
+        commit_hash = pending.pop()
+        if commit_hash in commits:
+            continue
+        info = get_commit_info(repo_path, commit_hash, graph)
+        if info is None:
+            continue
+        commits.add(commit_hash)
+        if info["tree"] != NULL_HASH.hex():
+            _mark_tree(repo_path, info["tree"], objects)
+        else:
+            for blob_hash in (load_commit(repo_path, commit_hash) or {}).get("files", {}).values():
+                _mark_blob(repo_path, blob_hash, objects)
+        pending.extend(parent for parent in info["parents"] if parent not in commits)
+
+    index = load_index_entries(repo_path)
+    for name, entry in index.items():
+        if name.endswith("/"):
+            _mark_tree(repo_path, entry["hash"], objects)  # A sparse directory
+        else:
+            _mark_blob(repo_path, entry["hash"], objects)
+    for tree_hash in load_cache_tree(index).values():
+        _mark_tree(repo_path, tree_hash, objects)
+    return commits, objects
+
+def _mark_tree(repo_path: Path, tree_hash: str, objects: set) -> None:
+    for _ in iter_tree_objects(repo_path, tree_hash, objects):
+        pass
+
+def _mark_blob(repo_path: Path, blob_hash: str, objects: set) -> None:
+    for _ in iter_blob_objects(repo_path, blob_hash, objects):
+        pass
+
+def iter_tree_objects(repo_path: Path, tree_hash: str, seen: set):
+    """
+    Yield the hashes of the trees, blobs and chunks reachable from a tree that
+    are not in seen, adding them to it. Subtrees already in seen are not read.
+    """
+    pending = [tree_hash]
+    while pending:
+        tree_hash = pending.pop()
+        if tree_hash in seen:
+            continue
+        seen.add(tree_hash)
+        try:
+            entries = read_tree(repo_path, tree_hash)
+        except FileNotFoundError:
+            continue  # A cache-tree entry whose tree was never written
+        yield tree_hash
+        for obj_type, obj_hash in entries.values():
+            if obj_type == "tree":
+                pending.append(obj_hash)
+            else:
+                yield from iter_blob_objects(repo_path, obj_hash, seen)
+
+def iter_blob_objects(repo_path: Path, blob_hash: str, seen: set):
+    """
+    Yield a blob's hash unless it is in seen, followed by its chunks if it
+    is stored in chunks, adding them to seen.
+    """
+    if blob_hash in seen:
+        return
+    seen.add(blob_hash)
+    try:
+        obj_type = object_type(repo_path, blob_hash)
+    except FileNotFoundError:
+        return
+    yield blob_hash
+    if obj_type == "manifest":
+        _, data = read_object(repo_path, blob_hash, expand=False)
+        for chunk_hash, _ in parse_manifest(data):
+            if chunk_hash not in seen:
+                seen.add(chunk_hash)
+                yield chunk_hash
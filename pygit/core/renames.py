@@ -0,0 +1,131 @@
+import os
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from pygit.core import stats
+from pygit.core.diff import is_binary
+from pygit.core.trace import traced
+
+# A file renamed (or copied, if old still exists) from old to new; similarity in percent
+Rename = namedtuple("Rename", "old new similarity copied")
+
+# Files sharing at least this much content are paired, as with git's -M50%
+MIN_SIMILARITY = 50
+
+# Files on either side above which only exact renames are detected (PYGIT_RENAME_LIMIT)
+RENAME_LIMIT = 1000
+
+# Binary content is fingerprinted in blocks of this many bytes, text by line
+BINARY_BLOCK = 64
+
+EMPTY_HASH = "da39a3ee5e6b4b0d3255bfef95601890afd80709"
+
+def rename_limit() -> int:
+    return int(os.environ.get("PYGIT_RENAME_LIMIT", RENAME_LIMIT))
+
+def signature(data: bytes) -> dict:
+    """
+    Fingerprint content as a dictionary of line (or block) hash to the
+    number of bytes in lines with that hash.
+    """
+    if is_binary(data):
+        pieces = (data[i:i + BINARY_BLOCK] for i in range(0, len(data), BINARY_BLOCK))
+    else:
+        pieces = data.splitlines(keepends=True)
+    counts = {}
+    for piece in pieces:
+        key = hash(piece)
+        counts[key] = counts.get(key, 0) + len(piece)
+    return counts
+
+def similarity(old: dict, old_size: int, new: dict, new_size: int) -> int:
+    """
+    Return the percentage of the larger of two contents found in the other,
+    given their signatures and sizes.
+    """
+    if len(old) > len(new):
+        old, new = new, old
+    common = sum(min(size, new[key]) for key, size in old.items() if key in new)
+    return common * 100 // max(old_size, new_size, 1)
+
+@traced
+def detect_renames(deleted: dict, added: dict, read_old, read_new, copy_sources=None,
+                   limit=None, min_similarity: int = MIN_SIMILARITY) -> list:
+    """
+    Pair files that disappeared with files that appeared, exact renames first,
+    and return the pairs as a list of Rename. Copies are found from copy_sources.
+    """
+    limit = rename_limit() if limit is None else limit
+    renames = []
+    paired = set()  # Deleted paths already paired as a rename
+
+    # Exact renames, preferring a source with the same file name
+    by_hash = {}
+    for path, blob_hash in deleted.items():
+        by_hash.setdefault(blob_hash, []).append(path)
+    copied_from = {h: path for path, h in (copy_sources or {}).items()}
+    unmatched = {}
+    for new, blob_hash in sorted(added.items()):
+        sources = [path for path in by_hash.get(blob_hash, ()) if path not in paired]
+        if sources and blob_hash != EMPTY_HASH:
+            old = _closest(sources, new)
+            paired.add(old)
+            renames.append(Rename(old, new, 100, False))
+        elif copy_sources is not None and blob_hash in copied_from and blob_hash != EMPTY_HASH:
+            renames.append(Rename(copied_from[blob_hash], new, 100, True))
+        elif copy_sources is not None and by_hash.get(blob_hash) and blob_hash != EMPTY_HASH:
+            renames.append(Rename(_closest(by_hash[blob_hash], new), new, 100, True))
+        else:
+            unmatched[new] = blob_hash
+
+    sources = {path: h for path, h in deleted.items() if path not in paired}
+    sources.update(copy_sources or {})
+    if not sources or not unmatched:
+        return renames
+    if len(sources) > limit or len(unmatched) > limit:
+        stats.increment("renames_skipped", len(unmatched))
+        return renames
+
+    # Signatures of the sources, sorted by size for bisection
+    old_files = []
+    for path, blob_hash in sources.items():
+        data = read_old(path, blob_hash)
+        if data:
+            old_files.append((len(data), path, signature(data)))
+    old_files.sort(key=lambda item: item[0])
+    sizes = [size for size, _, _ in old_files]
+
+    candidates = []
+    for new, blob_hash in unmatched.items():
+        data = read_new(new, blob_hash)
+        if not data:
+            continue
+        size, new_sig = len(data), signature(data)
+        start = bisect_left(sizes, size * min_similarity / 100)
+        end = bisect_right(sizes, size * 100 / min_similarity)
+        for old_size, old, old_sig in old_files[start:end]:
+            score = similarity(old_sig, old_size, new_sig, size)
+            if score >= min_similarity:
+                same_name = old.rpartition("/")[2] == new.rpartition("/")[2]
+                candidates.append((score, same_name, old, new))
+
+    done = set()
+    for score, _, old, new in sorted(candidates, reverse=True):
+        if new in done:
+            continue
+        if old in deleted and old not in paired:
+            paired.add(old)
+            renames.append(Rename(old, new, score, False))
+        elif copy_sources is not None:
+            renames.append(Rename(old, new, score, True))
+        else:
+            continue
+        done.add(new)
+    return sorted(renames, key=lambda rename: rename.new)
+
+def _closest(paths: list, new: str) -> str:
+    """
+    Return the path in paths with the same file name as new, if any, or the
+    first one.
+    """
+    name = new.rpartition("/")[2]
+    return next((path for path in paths if path.rpartition("/")[2] == name), paths[0])
@@ -1,5 +1,6 @@
-import fnmatch
 from pathlib import Path
+from pygit.core.ignore import IgnoreRules, load_ignore_patterns
+from pygit.core.trace import traced
 
 def get_repo_path(repo_dir: str) -> Path:
     return Path(repo_dir)
@@ -19,45 +20,57 @@ def update_head(repo_path: Path, commit_hash: str):
         (repo_path / "HEAD").write_text(commit_hash)
 
 def get_head_commit_hash(repo_path: Path):
+    """
+    Return the commit hash HEAD points to, through its branch or directly
+    when HEAD is detached, or None before the first commit.
+    """
     head_ref = (repo_path / "HEAD").read_text().strip()
-    if head_ref.startswith("ref: "):
-        ref_path = repo_path / head_ref[5:]
-        if ref_path.exists():
-            return ref_path.read_text().strip()
+    if not head_ref.startswith("ref: "):
+        return head_ref or None
+    ref_path = repo_path / head_ref[5:]
+    if ref_path.exists():
+        return ref_path.read_text().strip() or None
     return None
 
-def is_ignored(path: Path, repo_path: Path) -> bool:
-    # Normalize and resolve paths
-    path = path.resolve()
-    repo_path = repo_path.resolve()
-    repo_root = repo_path.parent
-    pygitignore_path = repo_root / ".pygitignore"
-
-    # Always ignore anything inside .pygit (the repo path)
-    if repo_path in path.parents or path == repo_path:
-        return True
-
-    # Ignore the .pygitignore file itself
-    if path == pygitignore_path.resolve():
-        return True
-
-    # If there's no .pygitignore, nothing else to ignore
-    if not pygitignore_path.exists():
-        return False
-
-    patterns = load_ignore_patterns(pygitignore_path)
+@traced
+def list_branch_tips(repo_path: Path) -> list:
+    """
+    Return the commit hashes of every branch, plus HEAD if it is detached.
+    """
+    tips = []
+    heads_dir = repo_path / "refs" / "heads"
+    if heads_dir.exists():
+        for ref in sorted(heads_dir.rglob("*")):
+            if ref.is_file() and ref.read_text().strip():
+                tips.append(ref.read_text().strip())
+    head_file = repo_path / "HEAD"
+    if head_file.exists():
+        head = head_file.read_text().strip()
+        if head and not head.startswith("ref: "):
+            tips.append(head)
+    return tips
 
-    try:
-        rel_path = path.relative_to(repo_root)
-    except ValueError:
-        return False  # If path is outside the repo, don't ignore it
+@traced
+def resolve_commit(repo_path: Path, name: str):
+    """
+    Return the commit hash named by "HEAD", a branch name, a full commit hash
+    or a unique prefix of one, or None if it names no commit.
+    """
+    if name == "HEAD":
+        return get_head_commit_hash(repo_path)
+    branch = repo_path / "refs" / "heads" / name
+    if branch.is_file():
+        return branch.read_text().strip() or None
+    commits_dir = repo_path / "commits"
+    if len(name) >= 4 and all(c in "0123456789abcdef" for c in name) and commits_dir.exists():
+        matches = [p.stem for p in commits_dir.glob(f"{name}*.json")]
+        if len(matches) == 1:
+            return matches[0]
+    return None
 
-    # Match against each pattern using fnmatch
-    return any(fnmatch.fnmatch(str(rel_path), pat) for pat in patterns)
-    
-def load_ignore_patterns(ignore_file: Path) -> list[str]:
-    if not ignore_file.exists():
-        return []
-    with ignore_file.open() as f:
-        lines = f.readlines()
-    return [line.strip() for line in lines if line.strip() and not line.startswith("#")]
+def is_ignored(path: Path, repo_path: Path) -> bool:
+    """
+    Return True if path is inside .pygit or matched by the ignore rules.
+    To check many paths, build one IgnoreRules and reuse it instead.
+    """
+    return IgnoreRules(repo_path).is_ignored(path)
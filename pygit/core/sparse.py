@@ -0,0 +1,61 @@
+from pathlib import Path
+
+# The directories of a sparse checkout in cone mode, one per line
+SPARSE_FILE = "sparse-checkout"
+
+class SparseCone:
+    """
+    The part of the tree a sparse checkout materializes.
+    """
+
+    def __init__(self, dirs):
+        self.dirs = {d.strip("/") for d in dirs if d.strip("/")}
+        # Directories whose files are included but only some subdirectories
+        self.parents = {""}
+        for directory in self.dirs:
+            parts = directory.split("/")
+            self.parents.update("/".join(parts[:depth]) for depth in range(len(parts)))
+
+    def includes_dir(self, rel_dir: str) -> bool:
+        """
+        Whether any file below rel_dir ("" for the root) is checked out.
+        """
+        if rel_dir in self.parents:
+            return True
+        parts = rel_dir.split("/")
+        return any("/".join(parts[:depth]) in self.dirs for depth in range(1, len(parts) + 1))
+
+    def includes(self, path: str) -> bool:
+        """
+        Whether the file at path is checked out.
+        """
+        return self.includes_dir(path.rpartition("/")[0])
+
+    def collapsed_dir(self, path: str) -> str:
+        """
+        Return the outermost directory containing path that is entirely
+        outside the cone. path must be outside the cone.
+        """
+        parts = path.split("/")
+        for depth in range(1, len(parts)):
+            directory = "/".join(parts[:depth])
+            if directory not in self.parents:
+                return directory
+        raise ValueError(f"'{path}' is in the sparse-checkout cone")
+
+def load_sparse(repo_path: Path):
+    """
+    Return the SparseCone of a repository, or None if it is not sparse.
+    """
+    try:
+        lines = (Path(repo_path) / SPARSE_FILE).read_text().splitlines()
+    except FileNotFoundError:
+        return None
+    return SparseCone(line.strip() for line in lines if line.strip() and not line.startswith("#"))
+
+def is_sparse_dir(name: str) -> bool:
+    """
+    Whether an index entry stands for a whole directory outside the cone
+    rather than for a file.
+    """
+    return name.endswith("/")
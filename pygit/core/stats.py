@@ -0,0 +1,14 @@
+from collections import Counter
+
+# Per-process counters describing how much work a command did, e.g. how many
+# files were hashed and how many hashes were reused from the index stat cache.
+counters = Counter()
+
+def increment(name: str, amount: int = 1) -> None:
+    counters[name] += amount
+
+def get(name: str) -> int:
+    return counters[name]
+
+def reset() -> None:
+    counters.clear()
@@ -0,0 +1,122 @@
+import os
+import time
+from contextlib import nullcontext
+from pygit.core import stats
+
+# Tracing is enabled by PYGIT_TRACE (see docs/tracing.md). When it is off, @traced
+# returns functions unchanged and span() a shared no-op context manager.
+
+_TARGET = os.environ.get("PYGIT_TRACE", "")
+ENABLED = _TARGET.lower() not in ("", "0", "false", "no", "off")
+_NULL_SPAN = nullcontext()
+
+_events = []  # (call path, start ns, duration ns, thread id)
+
+if ENABLED:
+    import atexit
+    import threading
+
+    _local = threading.local()
+    _origin = time.perf_counter_ns()
+
+    class _Span:
+        __slots__ = ("name", "path", "start")
+
+        def __init__(self, name: str):
+            self.name = name
+
+        def __enter__(self):
+            stack = getattr(_local, "stack", None)
+            if stack is None:
+                stack = _local.stack = []
+            stack.append(self.name)
+            self.path = tuple(stack)
+            self.start = time.perf_counter_ns()
+            return self
+
+        def __exit__(self, *exc):
+            duration = time.perf_counter_ns() - self.start
+            _local.stack.pop()
+            _events.append((self.path, self.start - _origin, duration, threading.get_ident()))
+            return False
+
+def span(name: str):
+    """
+    Return a context manager timing the code it wraps as a span called name,
+    nested under any span already open in the same thread.
+    """
+    return _Span(name) if ENABLED else _NULL_SPAN
+
+def traced(func):
+    """
+    Decorator timing every call to func as a span named "<module>.<function>".
+    For generator functions the span covers the generator's whole lifetime.
+    """
+    if not ENABLED:
+        return func
+    import functools
+
+    name = f"{func.__module__.rpartition('.')[2]}.{func.__qualname__}"
+    if func.__code__.co_flags & 0x20:  # CO_GENERATOR
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            with _Span(name):
+                yield from func(*args, **kwargs)
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _Span(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+def format_text(events, counters) -> str:
+    """
+    Summarize events by call path, in order of first appearance.
+    """
+    totals = {}
+    for path, start, duration, _ in sorted(events, key=lambda e: e[1]):
+        total, calls = totals.get(path, (0, 0))
+        totals[path] = (total + duration, calls + 1)
+    lines = [f"{'total ms':>12} {'calls':>7}  span"]
+    for path, (total, calls) in totals.items():
+        lines.append(f"{total / 1e6:12.3f} {calls:7d}  {'  ' * (len(path) - 1)}{path[-1]}")
+    if counters:
+        lines.append("counters:")
+        lines.extend(f"  {name}: {value}" for name, value in sorted(counters.items()))
+    return "\n".join(lines) + "\n"
+
+def format_chrome(events, counters) -> str:
+    import json
+
+    pid = os.getpid()
+    trace_events = [
+        {"name": path[-1], "cat": "pygit", "ph": "X", "ts": start / 1000, "dur": duration / 1000,
+         "pid": pid, "tid": tid}
+        for path, start, duration, tid in events
+    ]
+    if counters:
+        end = max((start + duration for _, start, duration, _ in events), default=0)
+        trace_events.append({"name": "counters", "ph": "C", "ts": end / 1000, "pid": pid,
+                             "args": dict(counters)})
+    return json.dumps({"traceEvents": trace_events, "displayTimeUnit": "ms"})
+
+def write_trace() -> None:
+    """
+    Write the collected spans and counters to the PYGIT_TRACE target. Called
+    automatically at exit when tracing is enabled.
+    """
+    if not _events:
+        return
+    fmt = os.environ.get("PYGIT_TRACE_FORMAT") or ("chrome" if _TARGET.endswith(".json") else "text")
+    formatter = format_chrome if fmt == "chrome" else format_text
+    output = formatter(list(_events), stats.counters)
+    if _TARGET.lower() in ("1", "true", "yes", "on", "stderr"):
+        import sys
+        sys.stderr.write(output)
+    else:
+        with open(_TARGET, "w" if fmt == "chrome" else "a") as f:
+            f.write(output)
+
+if ENABLED:
+    atexit.register(write_trace)
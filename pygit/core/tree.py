@@ -0,0 +1,261 @@
+from collections.abc import Mapping
+from pathlib import Path
+from pygit.core import cache
+from pygit.core.objects import read_object, write_object
+from pygit.core.trace import traced
+
+# A tree object lists a directory's entries as "<type> <hash> <name>" lines,
+# sorted in index order (a directory sorts as "name/").
+
+# Index extension caching the tree hash of each directory whose entries are
+# unchanged since the tree was last written (see write_tree).
+CACHE_TREE_EXTENSION = "TREE"
+
+def _sort_key(item):
+    name, (obj_type, _) = item
+    return name + "/" if obj_type == "tree" else name
+
+def serialize_tree(entries: dict) -> bytes:
+    """
+    Serialize a dictionary of name to (type, hash) into a tree object.
+    """
+    return "".join(
+        f"{obj_type} {obj_hash} {name}\n"
+        for name, (obj_type, obj_hash) in sorted(entries.items(), key=_sort_key)
+    ).encode()
+
+def parse_tree(data: bytes) -> dict:
+    entries = {}
+    for line in data.decode().splitlines():
+        obj_type, obj_hash, name = line.split(" ", 2)
+        entries[name] = (obj_type, obj_hash)
+    return entries
+
+@traced
+def read_tree(repo_path: Path, tree_hash: str) -> dict:
+    """
+    Return the entries of a tree object as a dictionary of name to (type, hash).
+    The dictionary is shared through the object cache and must not be modified.
+    """
+    entries = cache.objects.get(("tree", tree_hash))
+    if entries is not None:
+        return entries
+    obj_type, data = read_object(repo_path, tree_hash)
+    if obj_type != "tree":
+        raise ValueError(f"Object {tree_hash} is a {obj_type}, not a tree")
+    entries = parse_tree(data)
+    cache.objects.put(("tree", tree_hash), entries, len(data))
+    return entries
+
+def load_cache_tree(index) -> dict:
+    """
+    Decode the cache-tree extension of an index into a dictionary of
+    directory ("" for the root) to tree hash.
+    """
+    data = getattr(index, "extensions", {}).get(CACHE_TREE_EXTENSION, b"")
+    cache = {}
+    for line in data.split(b"\n"):
+        if line:
+            directory, tree_hash = line.rsplit(b" ", 1)
+            cache[directory.decode()] = tree_hash.decode()
+    return cache
+
+def store_cache_tree(index, cache: dict) -> None:
+    index.extensions[CACHE_TREE_EXTENSION] = b"".join(
+        f"{directory} {tree_hash}\n".encode() for directory, tree_hash in sorted(cache.items())
+    )
+
+def invalidate_cache_tree(index, paths) -> None:
+    """
+    Drop the cached tree of every directory containing one of paths, after
+    their index entries were added, changed or removed.
+    """
+    cache = load_cache_tree(index)
+    if not cache:
+        return
+    for path in paths:
+        parts = path.split("/")
+        for depth in range(len(parts)):
+            cache.pop("/".join(parts[:depth]), None)
+    store_cache_tree(index, cache)
+
+@traced
+def write_tree(repo_path: Path, index) -> str:
+    """
+    Write tree objects for the directories in the index and return the root
+    tree's hash, reusing directories still in the index's cache-tree.
+    """
+    cache = load_cache_tree(index)
+
+    # Group the index by directory: the files directly in each directory as
+    # {name: (type, hash)}, and the names of its subdirectories
+    files = {}
+    subdirs = {}
+    seen = set()
+    for path, entry in index.items():
+        if path.endswith("/"):
+            # A directory outside the sparse-checkout cone, kept as its tree
+            directory, _, name = path[:-1].rpartition("/")
+            files.setdefault(directory, {})[name] = ("tree", entry["hash"])
+        else:
+            directory, _, name = path.rpartition("/")
+            files.setdefault(directory, {})[name] = ("blob", entry["hash"])
+        while directory not in seen:
+            seen.add(directory)
+            if not directory:
+                break
+            parent, _, child = directory.rpartition("/")
+            subdirs.setdefault(parent, set()).add(child)
+            directory = parent
+
+    def build(directory):
+        if directory in cache:
+            return cache[directory]
+        entries = dict(files.get(directory, {}))
+        for child in subdirs.get(directory, ()):
+            child_dir = f"{directory}/{child}" if directory else child
+            entries[child] = ("tree", build(child_dir))
+        tree_hash = write_object(repo_path, serialize_tree(entries), "tree")
+        cache[directory] = tree_hash
+        return tree_hash
+
+    root = build("")
+    # Keep only directories that still exist
+    store_cache_tree(index, {directory: cache[directory] for directory in seen | {""}})
+    return root
+
+class LazyTree(Mapping):
+    """
+    A read-only mapping of file path to blob hash for a tree, which reads
+    each tree object only when a path below it is looked up.
+    """
+
+    def __init__(self, repo_path: Path, tree_hash: str):
+        self.repo_path = repo_path
+        self.hash = tree_hash
+        self._entries = None
+        self._subtrees = {}
+
+    def entries(self) -> dict:
+        """
+        The entries of this directory as a dictionary of name to (type, hash).
+        """
+        if self._entries is None:
+            self._entries = read_tree(self.repo_path, self.hash)
+        return self._entries
+
+    def subtree(self, name: str) -> "LazyTree":
+        if name not in self._subtrees:
+            obj_type, obj_hash = self.entries()[name]
+            if obj_type != "tree":
+                raise KeyError(name)
+            self._subtrees[name] = LazyTree(self.repo_path, obj_hash)
+        return self._subtrees[name]
+
+    def __getitem__(self, path: str) -> str:
+        name, _, rest = path.partition("/")
+        if name not in self.entries():
+            raise KeyError(path)
+        obj_type, obj_hash = self.entries()[name]
+        if rest:
+            if obj_type != "tree":
+                raise KeyError(path)
+            try:
+                return self.subtree(name)[rest]
+            except KeyError:
+                raise KeyError(path) from None
+        if obj_type != "blob":
+            raise KeyError(path)
+        return obj_hash
+
+    def __iter__(self):
+        for name, (obj_type, _) in sorted(self.entries().items(), key=_sort_key):
+            if obj_type == "tree":
+                for path in self.subtree(name):
+                    yield f"{name}/{path}"
+            else:
+                yield name
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def missing_from(self, paths, cache_tree=None, prefix: str = ""):
+        """
+        Yield the paths of files in this tree that are not in paths, skipping
+        directories whose hash matches cache_tree or that paths holds as "dir/".
+        """
+        cache_tree = cache_tree or {}
+        if cache_tree.get(prefix.rstrip("/")) == self.hash or (prefix and prefix in paths):
+            return
+        for name, (obj_type, _) in self.entries().items():
+            path = prefix + name
+            if obj_type == "tree":
+                yield from self.subtree(name).missing_from(paths, cache_tree, f"{path}/")
+            elif path not in paths:
+                yield path
+
+    def walk_against(self, paths, cache_tree=None, prefix: str = ""):
+        """
+        Yield (path, hash) for the files of this tree sorted by path, yielding
+        directories that paths holds whole or that match cache_tree as ("dir/", tree hash).
+        """
+        cache_tree = cache_tree or {}
+        if cache_tree.get(prefix.rstrip("/")) == self.hash:
+            yield prefix, self.hash
+            return
+        for name, (obj_type, obj_hash) in sorted(self.entries().items(), key=_sort_key):
+            path = prefix + name
+            if obj_type != "tree":
+                yield path, obj_hash
+            elif f"{path}/" in paths:
+                yield f"{path}/", obj_hash
+            else:
+                yield from self.subtree(name).walk_against(paths, cache_tree, f"{path}/")
+
+def walk_tree(repo_path: Path, tree_hash: str, prefix: str = ""):
+    """
+    Yield (path, type, hash) for every entry below a tree, sorted by path, each
+    directory before its contents.
+    """
+    for name, (obj_type, obj_hash) in sorted(read_tree(repo_path, tree_hash).items(), key=_sort_key):
+        yield prefix + name, obj_type, obj_hash
+        if obj_type == "tree":
+            yield from walk_tree(repo_path, obj_hash, f"{prefix}{name}/")
+
+def subtree_hash(repo_path: Path, tree_hash, directory: str):
+    """
+    Return the hash of the tree at directory below a tree, or None if there
+    is no such directory.
+    """
+    for name in directory.split("/"):
+        if tree_hash is None:
+            return None
+        obj_type, tree_hash = read_tree(repo_path, tree_hash).get(name, (None, None))
+        if obj_type != "tree":
+            return None
+    return tree_hash
+
+def diff_trees(repo_path: Path, old_hash, new_hash, prefix: str = ""):
+    """
+    Yield (path, old blob hash, new blob hash) for every file that differs
+    between two trees, skipping subtrees with the same hash on both sides.
+    """
+    if old_hash == new_hash:
+        return
+    old = read_tree(repo_path, old_hash) if old_hash else {}
+    new = read_tree(repo_path, new_hash) if new_hash else {}
+    # Only the entries that differ are sorted
+    names = sorted((n for n in old.keys() | new.keys() if old.get(n) != new.get(n)),
+                   key=lambda n: _sort_key((n, (old.get(n) or new.get(n)))))
+    for name in names:
+        path = f"{prefix}{name}"
+        old_type, old_obj = old.get(name, (None, None))
+        new_type, new_obj = new.get(name, (None, None))
+        old_tree = old_obj if old_type == "tree" else None
+        new_tree = new_obj if new_type == "tree" else None
+        if old_tree or new_tree:
+            yield from diff_trees(repo_path, old_tree, new_tree, f"{path}/")
+        old_blob = old_obj if old_type == "blob" else None
+        new_blob = new_obj if new_type == "blob" else None
+        if old_blob != new_blob:
+            yield path, old_blob, new_blob
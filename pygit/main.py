@@ -1,33 +1,285 @@
 import sys
-from pygit.commands import init, add, commit, status
+from importlib import import_module
+from pygit.core import trace
+
+USAGE = "Usage: pygit [-C <dir>] [--git-dir <dir>] [--profile] <command> [<args>]"
+
+class UsageError(Exception):
+    pass
+
+def _pop_jobs(args):
+    """
+    Remove "-j <jobs>" from args and return the number, or None if absent.
+    """
+    if "-j" not in args:
+        return None
+    idx = args.index("-j")
+    if idx + 1 >= len(args) or not args[idx + 1].isdigit():
+        raise UsageError("-j requires a number of jobs.")
+    jobs = int(args[idx + 1])
+    del args[idx:idx + 2]
+    return jobs
+
+def _parse_add(args):
+    jobs = _pop_jobs(args)
+    if not args:
+        raise UsageError("You must specify a file to add.")
+    return {"paths": args, "jobs": jobs}
+
+def _parse_commit(args):
+    if "-m" not in args:
+        raise UsageError("-m flag is required to specify a commit message.")
+    idx = args.index("-m") + 1
+    if idx >= len(args):
+        raise UsageError("No commit message provided.")
+    return {"message": args[idx]}
+
+def _parse_status(args):
+    return {"show_stats": "--stats" in args, "porcelain": "--porcelain" in args, "null_terminated": "-z" in args}
+
+def _parse_diff(args):
+    context = 3
+    for arg in list(args):
+        if arg.startswith("-U"):
+            if not arg[2:].isdigit():
+                raise UsageError("-U requires a number of context lines.")
+            context = int(arg[2:])
+            args.remove(arg)
+    flags = ("--cached", "--staged", "--no-renames", "-C", "--find-copies")
+    cached = "--cached" in args or "--staged" in args
+    renames = "--no-renames" not in args
+    copies = "-C" in args or "--find-copies" in args
+    commits = [arg for arg in args if arg not in flags]
+    return {"commits": commits, "cached": cached, "context": context, "renames": renames, "copies": copies}
+
+def _parse_log(args):
+    max_count = None
+    if "-n" in args:
+        idx = args.index("-n")
+        if idx + 1 >= len(args) or not args[idx + 1].isdigit():
+            raise UsageError("-n requires a number of commits.")
+        max_count = int(args[idx + 1])
+        del args[idx:idx + 2]
+    oneline = "--oneline" in args
+    paths = [arg for arg in args if arg not in ("--oneline", "--")]
+    return {"max_count": max_count, "oneline": oneline, "paths": paths}
+
+def _parse_checkout(args, branch_only=False):
+    jobs = _pop_jobs(args)
+    force = "-f" in args or "--force" in args
+    targets = [arg for arg in args if arg not in ("-f", "--force")]
+    if len(targets) != 1:
+        raise UsageError(f"You must specify one {'branch' if branch_only else 'branch or commit'}.")
+    return {"target": targets[0], "jobs": jobs, "force": force, "branch_only": branch_only}
+
+def _parse_switch(args):
+    return _parse_checkout(args, branch_only=True)
+
+def _parse_branch(args):
+    delete = next((arg for arg in args if arg in ("-d", "-D")), None)
+    names = [arg for arg in args if arg not in ("-d", "-D")]
+    if delete is not None:
+        if len(names) != 1:
+            raise UsageError("You must specify one branch to delete.")
+        return {"name": names[0], "delete": True, "force": delete == "-D"}
+    if len(names) > 2:
+        raise UsageError("branch takes a name and an optional start commit.")
+    return {"name": names[0], "start": names[1] if len(names) > 1 else "HEAD"} if names else {}
+
+def _parse_merge(args):
+    jobs = _pop_jobs(args)
+    if args == ["--abort"]:
+        return {"abort": True, "jobs": jobs}
+    if len(args) != 1:
+        raise UsageError("You must specify one branch or commit to merge.")
+    return {"target": args[0], "jobs": jobs}
+
+def _parse_merge_base(args):
+    commits = [arg for arg in args if arg != "--all"]
+    if len(commits) != 2:
+        raise UsageError("merge-base takes two commits.")
+    return {"commits": commits, "all_bases": "--all" in args}
+
+def _parse_gc(args):
+    prune = None
+    for arg in args:
+        if arg.startswith("--prune="):
+            prune = arg[len("--prune="):]
+        elif arg == "--no-prune":
+            prune = "never"
+        else:
+            raise UsageError(f"Unknown gc option '{arg}'.")
+    return {} if prune is None else {"prune": prune}
+
+def _parse_repack(args):
+    if args:
+        raise UsageError("repack takes no arguments.")
+    return {"prune": "never"}
+
+def _parse_sparse_checkout(args):
+    if not args:
+        return {"action": "list"}
+    return {"action": args[0], "dirs": args[1:]}
+
+def _parse_commit_graph(args):
+    return {"action": args[0] if args else "write"}
+
+def _parse_fsmonitor(args):
+    return {"action": args[0] if args else "status"}
+
+def _parse_bundle(args):
+    if len(args) < 2 or args[0] not in ("create", "unbundle", "verify"):
+        raise UsageError("Usage: pygit bundle (create <file> <rev>... | unbundle <file> | verify <file>)")
+    if args[0] == "create" and len(args) < 3:
+        raise UsageError("You must specify what to bundle, e.g. master or --all.")
+    return {"action": args[0], "file": args[1], "revs": args[2:]}
+
+def _parse_clone(args):
+    jobs = _pop_jobs(args)
+    if len(args) not in (1, 2):
+        raise UsageError("clone takes a repository or bundle and an optional directory.")
+    return {"source": args[0], "dest": args[1] if len(args) > 1 else None, "jobs": jobs}
+
+def _parse_archive(args):
+    options = {}
+    if "-o" in args:
+        idx = args.index("-o")
+        if idx + 1 >= len(args):
+            raise UsageError("-o requires a file name.")
+        options["output"] = args[idx + 1]
+        del args[idx:idx + 2]
+    for arg in list(args):
+        if arg.startswith("--format="):
+            options["fmt"] = arg[len("--format="):]
+            args.remove(arg)
+        elif arg.startswith("--prefix="):
+            options["prefix"] = arg[len("--prefix="):]
+            args.remove(arg)
+    if len(args) != 1:
+        raise UsageError("You must specify one commit to archive.")
+    return {"commit": args[0], **options}
+
+def _no_args(args):
+    return {}
+
+# Each command maps to the module whose run() implements it, a function
+# turning its arguments into keyword arguments for run(), and a summary.
+# Only the module of the command being run is imported, so startup time
+# does not grow with the number of commands.
+COMMANDS = {
+    "init": ("pygit.commands.init", _no_args, "Create an empty repository"),
+    "add": ("pygit.commands.add", _parse_add, "Stage files and directories"),
+    "commit": ("pygit.commands.commit", _parse_commit, "Record the staged changes"),
+    "status": ("pygit.commands.status", _parse_status, "Show staged, modified and untracked files"),
+    "diff": ("pygit.commands.diff", _parse_diff, "Show changes as unified diffs"),
+    "log": ("pygit.commands.log", _parse_log, "Show the commit history"),
+    "checkout": ("pygit.commands.checkout", _parse_checkout, "Check out a branch or commit"),
+    "switch": ("pygit.commands.checkout", _parse_switch, "Switch to a branch"),
+    "branch": ("pygit.commands.branch", _parse_branch, "List, create or delete branches"),
+    "merge": ("pygit.commands.merge", _parse_merge, "Merge a branch or commit into HEAD"),
+    "merge-base": ("pygit.commands.merge_base", _parse_merge_base, "Find the best common ancestor of two commits"),
+    "gc": ("pygit.commands.gc", _parse_gc, "Pack reachable objects and prune unreachable ones"),
+    "repack": ("pygit.commands.gc", _parse_repack, "Pack all objects into a packfile"),
+    "sparse-checkout": ("pygit.commands.sparse_checkout", _parse_sparse_checkout,
+                        "Check out only some directories"),
+    "commit-graph": ("pygit.commands.commit_graph", _parse_commit_graph,
+                     "Rebuild the commit-graph and its changed-path filters"),
+    "archive": ("pygit.commands.archive", _parse_archive, "Write a commit's files to a tar or zip archive"),
+    "bundle": ("pygit.commands.bundle", _parse_bundle, "Move commits and objects through a single file"),
+    "clone": ("pygit.commands.clone", _parse_clone, "Copy a local repository or a bundle"),
+    "fsmonitor": ("pygit.commands.fsmonitor", _parse_fsmonitor, "Manage the filesystem monitor daemon"),
+}
+
+def print_usage(file=sys.stdout) -> None:
+    print(USAGE, file=file)
+    print("\nCommands:", file=file)
+    for name, (_, _, summary) in COMMANDS.items():
+        print(f"  {name:<15} {summary}", file=file)
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: pygit [init|add|commit]")
+    """
+    Run the command given on the command line. With --profile, the command
+    runs under cProfile and the slowest functions are printed to stderr, or
+    with --profile=<file>, the raw stats are saved for pstats or snakeviz.
+    """
+    args = sys.argv[1:]
+    try:
+        options = _parse_global_options(args)
+    except UsageError as e:
+        print(f"Error: {e}")
         sys.exit(1)
+    if "profile" in options:
+        _profiled(args, options)
+    else:
+        with trace.span(f"pygit {' '.join(args[:1])}"):
+            _run(args, options)
 
-    command = sys.argv[1]
+def _profiled(args: list, options: dict) -> None:
+    import cProfile
+    import pstats
 
-    if command == "init":
-        init.run()
-    elif command == "add":
-        if len(sys.argv) < 3:
-            print("Error: You must specify a file to add.")
-        else:
-            add.run(sys.argv[2])
-    elif command == "commit":
-        if "-m" in sys.argv:
-            idx = sys.argv.index("-m") + 1
-            if idx < len(sys.argv):
-                commit.run(sys.argv[idx])
+    output = options["profile"]
+    profiler = cProfile.Profile()
+    profiler.runcall(_run, args, options)
+    if output:
+        profiler.dump_stats(output)
+        print(f"Profile written to {output}", file=sys.stderr)
+    else:
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
+
+def _parse_global_options(args: list) -> dict:
+    """
+    Consume the options that come before the command name: -C <dir> runs as
+    if started in <dir> (and may be repeated, each relative to the last),
+    --git-dir <dir> uses <dir> as the repository instead of ./.pygit, and
+    --profile[=<file>] profiles the command.
+    """
+    import os
+
+    options = {}
+    while args and args[0].startswith("-"):
+        arg = args.pop(0)
+        if arg in ("-h", "--help"):
+            options["help"] = True
+        elif arg == "-C" or arg == "--git-dir":
+            if not args:
+                raise UsageError(f"{arg} requires a directory.")
+            value = args.pop(0)
+            if arg == "-C":
+                try:
+                    os.chdir(value)
+                except OSError as e:
+                    raise UsageError(f"Cannot change to '{value}': {e.strerror}") from None
             else:
-                print("Error: No commit message provided.")
+                options["repo_dir"] = value
+        elif arg.startswith("--git-dir="):
+            options["repo_dir"] = arg.partition("=")[2]
+        elif arg == "--profile" or arg.startswith("--profile="):
+            options["profile"] = arg.partition("=")[2]
         else:
-            print("Error: -m flag is required to specify a commit message.")
-    elif command == "status":
-        status.run()
-    else:
+            raise UsageError(f"Unknown option: {arg}")
+    return options
+
+def _run(args: list, options: dict):
+    if not args or options.get("help") or args[0] == "help":
+        print_usage()
+        if not args and not options.get("help"):
+            sys.exit(1)
+        return
+
+    command, args = args[0], args[1:]
+    if command not in COMMANDS:
         print(f"Unknown command: {command}")
+        sys.exit(1)
+    module_name, parse, _ = COMMANDS[command]
+    try:
+        kwargs = parse(args)
+    except UsageError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if "repo_dir" in options:
+        kwargs["repo_dir"] = options["repo_dir"]
+    import_module(module_name).run(**kwargs)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,186 @@
+from collections import OrderedDict
+from pathlib import Path
+from pygit.commands import add, checkout, commit, diff, init, log, status
+from pygit.core.filecache import FileCache
+from pygit.core.ignore import IgnoreRules
+from pygit.core.index import load_index_entries
+from pygit.core.objects import load_commit, load_commit_tree
+
+# Trees of this many recently used commits are kept, along with the parts of
+# them that were read
+TREE_CACHE_SIZE = 8
+
+class Repository:
+    """
+    A pygit repository, for programs that run many operations in one process.
+
+    Repository keeps what it reads between calls: HEAD, the branches, the
+    index, the compiled ignore rules and the trees of recent commits (commits
+    and tree objects themselves are in the shared object cache). Before a
+    cached value is used, the files it came from are stat-ed and it is
+    reloaded if their inode, size or mtime changed, so changes made by other
+    processes (such as the pygit command line) are seen.
+
+    The operations return results instead of printing them: status() returns
+    a StatusResult, add() an AddResult, commit() the new commit's hash, and
+    log() and diff() iterators. Paths are relative to the working tree, not
+    to the current directory.
+    """
+
+    def __init__(self, path=".", git_dir=None):
+        self.root = Path(path).resolve()
+        self.path = Path(git_dir).resolve() if git_dir is not None else self.root / ".pygit"
+        if git_dir is not None:
+            self.root = self.path.parent
+        if not (self.path / "HEAD").is_file():
+            raise FileNotFoundError(f"Not a pygit repository: {self.path}")
+        self._files = FileCache()
+        self._rules = None
+        self._trees = OrderedDict()
+
+    @classmethod
+    def init(cls, path=".") -> "Repository":
+        """
+        Create an empty repository in path and return it.
+        """
+        init.create_repository(Path(path).resolve() / ".pygit")
+        return cls(path)
+
+    def __repr__(self) -> str:
+        return f"Repository({str(self.root)!r})"
+
+    def invalidate(self) -> None:
+        """
+        Drop all cached state. Only needed after changing the repository's
+        files in a way their stat data can't show.
+        """
+        self._files.clear()
+        self._rules = None
+
+    def _read(self, path: Path):
+        return path.read_text().strip() if path.is_file() else None
+
+    def head(self):
+        """
+        Return the commit hash HEAD points to, or None before the first commit.
+        """
+        head = self._files.get("HEAD", [self.path / "HEAD"], lambda: self._read(self.path / "HEAD"))
+        if not head or not head.startswith("ref: "):
+            return head or None
+        ref_path = self.path / head[5:]
+        return self._files.get(head, [ref_path], lambda: self._read(ref_path)) or None
+
+    def current_branch(self):
+        """
+        Return the name of the checked-out branch, or None if HEAD is detached.
+        """
+        head = self._files.get("HEAD", [self.path / "HEAD"], lambda: self._read(self.path / "HEAD"))
+        if head and head.startswith("ref: refs/heads/"):
+            return head[len("ref: refs/heads/"):]
+        return None
+
+    def refs(self) -> dict:
+        """
+        Return a dictionary of branch name to commit hash.
+        """
+        heads = self.path / "refs" / "heads"
+        paths = [heads, *sorted(heads.rglob("*"))] if heads.is_dir() else []
+
+        def load():
+            refs = {}
+            for path in paths:
+                value = self._read(path) if path.is_file() else None
+                if value:
+                    refs[path.relative_to(heads).as_posix()] = value
+            return refs
+
+        return dict(self._files.get("refs", paths, load))
+
+    def index(self):
+        """
+        Return the index entries. The result is shared between calls and
+        must not be modified; use add() to stage changes.
+        """
+        return self._files.get("index", [self.path / "index"], lambda: load_index_entries(self.path))
+
+    def ignore_rules(self) -> IgnoreRules:
+        """
+        Return the ignore rules, re-reading any .pygitignore that changed.
+        """
+        if self._rules is None:
+            self._rules = IgnoreRules(self.path)
+        else:
+            self._rules.refresh()
+        return self._rules
+
+    def read_commit(self, commit_hash: str):
+        """
+        Return a commit's data, or None if there is no such commit. Commits
+        are kept in the shared object cache (see pygit.core.cache).
+        """
+        return load_commit(self.path, commit_hash)
+
+    def commit_tree(self, commit_hash):
+        """
+        Return a read-only mapping of file path to blob hash for a commit.
+        Tree objects are read as paths are looked up and kept for later calls.
+        """
+        if commit_hash is None:
+            return {}
+        if commit_hash in self._trees:
+            self._trees.move_to_end(commit_hash)
+            return self._trees[commit_hash]
+        tree = load_commit_tree(self.path, commit_hash)
+        _remember(self._trees, commit_hash, tree, TREE_CACHE_SIZE)
+        return tree
+
+    def status(self) -> status.StatusResult:
+        """
+        Compare HEAD, the index and the working tree.
+        """
+        return status.get_status(self.path, self.index(), self.ignore_rules(),
+                                 self.commit_tree(self.head()))
+
+    def add(self, paths, jobs=None) -> add.AddResult:
+        """
+        Stage files and directories, given relative to the working tree.
+        """
+        if isinstance(paths, (str, Path)):
+            paths = [paths]
+        return add.add_paths(self.path, [self.root / path for path in paths],
+                             jobs=jobs, rules=self.ignore_rules())
+
+    def commit(self, message: str):
+        """
+        Commit the staged changes and return the new commit's hash, or None
+        if there is nothing to commit.
+        """
+        return commit.create_commit(self.path, message)
+
+    def checkout(self, target: str, jobs=None, force=False) -> checkout.CheckoutResult:
+        """
+        Check out a branch or commit, rewriting only the files that differ.
+        Raises checkout.LocalChangesError if that would lose local changes.
+        """
+        return checkout.checkout(self.path, target, jobs=jobs, force=force)
+
+    def log(self, max_count=None, paths=()):
+        """
+        Iterate over the history from HEAD, newest first, as dictionaries
+        with the hash, tree, parents, timestamp and message of each commit.
+        """
+        head = self.head()
+        return iter(()) if head is None else log.iter_log(self.path, head, max_count, paths)
+
+    def diff(self, commits=(), cached=False, renames=True, copies=False):
+        """
+        Iterate over (path, old contents, new contents) for changed files,
+        between the index and the working tree, HEAD and the index (cached),
+        or two commits. Renamed and copied files carry a rename attribute.
+        """
+        return diff.get_changes(self.path, commits, cached, renames, copies)
+
+def _remember(cache: OrderedDict, key, value, limit: int) -> None:
+    cache[key] = value
+    if len(cache) > limit:
+        cache.popitem(last=False)
@@ -1,8 +1,10 @@
 import pytest
 from pathlib import Path
 from pygit.commands import add
-from pygit.core.index import load_index
+from unittest.mock import patch
+from pygit.core.index import load_index, _write_index
 from pygit.core.hashing import hash_file
+from pygit.core.objects import read_object
 
 def test_add_stages_file(tmp_path, capsys):
     # Setup: create a temporary repo and a file to add
@@ -16,16 +18,15 @@ def test_add_stages_file(tmp_path, capsys):
     # Act: run the add command
     add.run(file_to_add, repo_dir=repo_dir)
 
-    # Assert: file is copied to staging
-    staging_file = repo_dir / "staging" / "hello.txt"
-    assert staging_file.exists()
-    assert staging_file.read_text() == "Hello, pygit!"
-
     # Assert: index contains correct hash
     index = load_index(repo_dir)
     expected_hash = hash_file(file_to_add)
     assert index["hello.txt"] == expected_hash
 
+    # Assert: content is stored in the object store, not a staging copy
+    assert read_object(repo_dir, expected_hash) == ("blob", b"Hello, pygit!")
+    assert not (repo_dir / "staging").exists()
+
     # Output should mention the staged file
     captured = capsys.readouterr()
     assert "Staged hello.txt" in captured.out
@@ -58,4 +59,46 @@ def test_add_ignored_file_skips(tmp_path, capsys):
     assert "hello.txt" not in index
 
     captured = capsys.readouterr()
-    assert "is ignored" in captured.out
\ No newline at end of file
+    assert "is ignored" in captured.out
+
+def test_add_keeps_files_with_the_same_name_apart(tmp_path):
+    repo_dir = tmp_path / ".pygit"
+    repo_dir.mkdir()
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    (tmp_path / "a" / "notes.txt").write_text("first")
+    (tmp_path / "b" / "notes.txt").write_text("second")
+
+    add.run(tmp_path / "a" / "notes.txt", repo_dir=repo_dir)
+    add.run(tmp_path / "b" / "notes.txt", repo_dir=repo_dir)
+
+    index = load_index(repo_dir)
+    assert read_object(repo_dir, index["a/notes.txt"])[1] == b"first"
+    assert read_object(repo_dir, index["b/notes.txt"])[1] == b"second"
+
+def test_add_directory_stages_files_in_parallel_with_one_index_write(tmp_path, capsys):
+    repo_dir = tmp_path / ".pygit"
+    repo_dir.mkdir()
+    (tmp_path / ".pygitignore").write_text("*.log\n")
+    for i in range(20):
+        path = tmp_path / "src" / f"pkg{i % 3}" / f"mod{i}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"print({i})")
+    (tmp_path / "src" / "debug.log").write_text("ignored")
+
+    with patch("pygit.core.index._write_index", wraps=_write_index) as mock_write:
+        add.run([tmp_path / "src"], repo_dir=repo_dir, jobs=4)
+
+    assert mock_write.call_count == 1
+    index = load_index(repo_dir)
+    assert len(index) == 20
+    assert "src/debug.log" not in index
+    assert read_object(repo_dir, index["src/pkg1/mod7.py"])[1] == b"print(7)"
+    assert "Staged 20 files" in capsys.readouterr().out
+
+    # Re-adding the directory stages deletions
+    (tmp_path / "src" / "pkg0" / "mod0.py").unlink()
+    add.run([tmp_path / "src"], repo_dir=repo_dir)
+    index = load_index(repo_dir)
+    assert "src/pkg0/mod0.py" not in index
+    assert len(index) == 19
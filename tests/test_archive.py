@@ -0,0 +1,52 @@
+import io
+import os
+import tarfile
+import zipfile
+from pygit.commands import init, add, commit, archive, gc
+from pygit.core.archive import write_archive
+from pygit.core.repo import get_head_commit_hash
+
+def test_archive_streams_committed_files_only(tmp_path, capsys):
+    repo_dir = tmp_path / ".pygit"
+    init.run(repo_dir=repo_dir)
+    (repo_dir / "chunked").write_text("*.bin\n")
+    (tmp_path / "src/lib").mkdir(parents=True)
+    (tmp_path / "src/lib/util.py").write_text("util\n")
+    (tmp_path / "src/main.py").write_text("main\n")
+    model = os.urandom(5 * 1024 * 1024)
+    (tmp_path / "model.bin").write_bytes(model)
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("release", repo_dir=repo_dir)
+    head = get_head_commit_hash(repo_dir)
+    # Neither local changes nor untracked files end up in the archive
+    (tmp_path / "src/main.py").write_text("edited\n")
+    (tmp_path / "notes.txt").write_text("untracked\n")
+    gc.run(repo_dir=repo_dir)  # Packed objects are archived too
+
+    out = tmp_path / "release.tar.gz"
+    archive.run("master", output=out, prefix="release-1.0/", repo_dir=repo_dir)
+    assert "Wrote 3 file(s)" in capsys.readouterr().out
+    with tarfile.open(out) as tar:
+        assert tar.getnames() == [
+            "release-1.0/model.bin", "release-1.0/src",
+            "release-1.0/src/lib", "release-1.0/src/lib/util.py", "release-1.0/src/main.py",
+        ]
+        assert tar.extractfile("release-1.0/src/main.py").read() == b"main\n"
+        assert tar.extractfile("release-1.0/model.bin").read() == model
+        assert tar.getmember("release-1.0/src").isdir()
+
+    zipped = io.BytesIO()
+    write_archive(repo_dir, head, zipped, "zip")
+    with zipfile.ZipFile(zipped) as archived:
+        assert archived.read("model.bin") == model
+        assert archived.read("src/lib/util.py") == b"util\n"
+        assert "notes.txt" not in archived.namelist()
+
+    # The same commit always gives the same bytes
+    first, second = io.BytesIO(), io.BytesIO()
+    write_archive(repo_dir, head, first, "tar")
+    write_archive(repo_dir, head, second, "tar")
+    assert first.getvalue() == second.getvalue()
+
+    archive.run("master", fmt="rar", output=tmp_path / "x.rar", repo_dir=repo_dir)
+    assert "Unknown archive format 'rar'" in capsys.readouterr().out
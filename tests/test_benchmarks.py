@@ -0,0 +1,21 @@
+from benchmarks.bench_commands import compare
+from benchmarks.synthetic import generate_tree, modify_files
+
+def test_generate_tree_is_reproducible(tmp_path):
+    first = generate_tree(tmp_path / "a", 50, seed=3)
+    second = generate_tree(tmp_path / "b", 50, seed=3)
+    assert first == second
+    assert all((tmp_path / "a" / p).read_bytes() == (tmp_path / "b" / p).read_bytes() for p in first)
+    assert (tmp_path / "a" / ".pygitignore").read_text().splitlines() == ["build/", "*.log", "__pycache__/"]
+    assert len(set(first)) == 50
+
+    changed = modify_files(tmp_path / "a", first, 5)
+    assert len(changed) == 5
+    assert all((tmp_path / "a" / p).read_bytes() != (tmp_path / "b" / p).read_bytes() for p in changed)
+
+def test_compare_reports_regressions_over_threshold():
+    baseline = {"results": {"1000": {"status": 0.100, "add": 1.0, "log": 0.001}}}
+    results = {"results": {"1000": {"status": 0.140, "add": 1.1, "log": 0.003, "diff": 0.5}}}
+    regressions = compare(results, baseline, threshold=0.25)
+    # log tripled but stays under the noise floor; diff has no baseline
+    assert len(regressions) == 1 and regressions[0].startswith("status at 1000 files")
@@ -0,0 +1,15 @@
+from pygit.core.bloom import FULL_FILTER, MAX_CHANGED_PATHS, build_filter, maybe_changed, path_keys
+
+def test_filters_have_no_false_negatives_and_few_false_positives():
+    paths = [f"src/module{i}/file{i}.py" for i in range(100)]
+    bloom = build_filter({key for path in paths for key in path_keys(path)})
+
+    assert all(maybe_changed(bloom, path) for path in paths)
+    assert maybe_changed(bloom, "src") and maybe_changed(bloom, "./src/module3/")
+    false_positives = sum(maybe_changed(bloom, f"docs/page{i}.md") for i in range(1000))
+    assert false_positives < 30
+
+    # An empty filter rules out everything, a full one nothing
+    assert not maybe_changed(build_filter(set()), "src")
+    assert build_filter({str(i) for i in range(MAX_CHANGED_PATHS + 1)}) == FULL_FILTER
+    assert maybe_changed(FULL_FILTER, "anything/at/all")
@@ -0,0 +1,33 @@
+from pygit.commands import init, add, commit, branch, checkout
+from pygit.core.repo import get_head_commit_hash
+
+def test_branches_are_created_listed_and_deleted(tmp_path, capsys):
+    repo_dir = tmp_path / ".pygit"
+    init.run(repo_dir=repo_dir)
+    (tmp_path / "a.txt").write_text("a\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("first", repo_dir=repo_dir)
+    first = get_head_commit_hash(repo_dir)
+
+    branch.run("feature/x", repo_dir=repo_dir)
+    branch.run("bad name", repo_dir=repo_dir)
+    branch.run("feature/x", repo_dir=repo_dir)
+    capsys.readouterr()
+    branch.run(repo_dir=repo_dir)
+    assert capsys.readouterr().out == "  feature/x\n* master\n"
+
+    checkout.checkout(repo_dir, "feature/x")
+    (tmp_path / "a.txt").write_text("b\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("second", repo_dir=repo_dir)
+    checkout.checkout(repo_dir, "master")
+    capsys.readouterr()
+
+    # Unmerged branches need -D, and the current branch can't be deleted
+    branch.run("feature/x", delete=True, repo_dir=repo_dir)
+    branch.run("master", delete=True, force=True, repo_dir=repo_dir)
+    out = capsys.readouterr().out
+    assert "not fully merged" in out and "Cannot delete the checked-out branch" in out
+    branch.run("feature/x", delete=True, force=True, repo_dir=repo_dir)
+    assert branch.list_branches(repo_dir) == ["master"]
+    assert get_head_commit_hash(repo_dir) == first
@@ -0,0 +1,89 @@
+import pytest
+from pygit.commands import init, add, commit, branch, bundle
+from pygit.core import stats
+from pygit.core.bundle import read_bundle, read_bundle_header, write_bundle
+from pygit.core.commit_graph import load_commit_graph
+from pygit.core.objects import object_exists
+from pygit.core.repo import get_head_commit_hash
+
+@pytest.fixture
+def source(tmp_path):
+    """
+    A repository with a base commit of fifty files, and a topic branch that
+    changed one of them since.
+    """
+    work = tmp_path / "source"
+    work.mkdir()
+    repo_dir = work / ".pygit"
+    init.run(repo_dir=repo_dir)
+    for n in range(50):
+        (work / f"dir{n % 5}").mkdir(exist_ok=True)
+        (work / f"dir{n % 5}/file{n}.txt").write_text(f"{n}\n")
+    add.run([work], repo_dir=repo_dir)
+    commit.run("base", repo_dir=repo_dir)
+    base = get_head_commit_hash(repo_dir)
+    branch.create_branch(repo_dir, "topic")
+    (work / "dir3/file3.txt").write_text("changed\n")
+    add.run([work], repo_dir=repo_dir)
+    commit.run("change", repo_dir=repo_dir)
+    return repo_dir, base, get_head_commit_hash(repo_dir)
+
+def test_incremental_bundle_holds_only_new_objects_and_fast_forwards(source, tmp_path, capsys):
+    repo_dir, base, tip = source
+    full = tmp_path / "full.bundle"
+    bundle.run("create", full, ["topic"], repo_dir=repo_dir)
+
+    other = tmp_path / "other" / ".pygit"
+    init.run(repo_dir=other)
+    (other / "HEAD").write_text("ref: refs/heads/elsewhere\n")
+    bundle.run("unbundle", full, repo_dir=other)
+    assert (other / "refs/heads/topic").read_text() == base
+    assert load_commit_graph(other).lookup(base) is not None
+
+    incremental = tmp_path / "inc.bundle"
+    commits, objects = write_bundle(repo_dir, incremental, {"refs/heads/master": tip}, [base])
+    # The changed file, its directory and the root tree
+    assert (commits, objects) == (1, 3)
+    with open(incremental, "rb") as f:
+        header = read_bundle_header(f)
+    assert [commit_hash for commit_hash, _ in header.prerequisites] == [base]
+
+    capsys.readouterr()
+    bundle.run("create", tmp_path / "empty.bundle", [f"{tip}..master"], repo_dir=repo_dir)
+    assert "Refusing to create an empty bundle" in capsys.readouterr().out
+
+    stats.reset()
+    bundle.run("unbundle", incremental, repo_dir=other)
+    assert "Created branch 'master'" in capsys.readouterr().out
+    assert (other / "refs/heads/master").read_text() == tip
+    assert stats.get("objects_written") == 3
+    assert load_commit_graph(other).lookup(tip)["generation"] == 2
+
+    # Unbundling again adds nothing, and the checked-out branch is never moved
+    (other / "HEAD").write_text("ref: refs/heads/topic\n")
+    bundle.run("unbundle", full, repo_dir=other)
+    assert "Unbundled 0 new commit(s) and 0 new object(s)." in capsys.readouterr().out
+
+def test_unbundle_checks_prerequisites_and_content(source, tmp_path, capsys):
+    repo_dir, base, tip = source
+    incremental = tmp_path / "inc.bundle"
+    write_bundle(repo_dir, incremental, {"refs/heads/master": tip}, [base])
+    other = tmp_path / "other" / ".pygit"
+    init.run(repo_dir=other)
+    bundle.run("verify", incremental, repo_dir=other)
+    assert f"lacks the prerequisite commit(s) {base}" in capsys.readouterr().out
+
+    full = tmp_path / "full.bundle"
+    write_bundle(repo_dir, full, {"refs/heads/master": tip})
+    data = full.read_bytes()
+    full.write_bytes(data.replace(b'"change"', b'"chaNge"'))
+    with pytest.raises(ValueError, match="does not match"):
+        read_bundle(other, full)
+    full.write_bytes(data[:-100])
+    with pytest.raises(ValueError, match="truncated"):
+        read_bundle(other, full, store=False)
+    assert not (other / "refs/heads/master").exists()
+
+    full.write_bytes(data)
+    read_bundle(other, full)
+    assert object_exists(other, load_commit_graph(other).lookup(tip)["tree"])
@@ -0,0 +1,37 @@
+from pygit.core import cache, stats
+from pygit.core.cache import ObjectCache
+from pygit.core.objects import write_object
+from pygit.core.tree import read_tree, serialize_tree
+
+def test_evicts_least_recently_used_within_budget():
+    objects = ObjectCache(max_bytes=160)
+    objects.put("a", "A", 5)
+    objects.put("b", "B", 5)
+    assert objects.get("a") == "A"
+    for i in range(31):
+        objects.put(i, i, 5)
+    assert objects.size <= 160
+    assert objects.get("b") is None
+    assert objects.get("a") == "A"
+    assert objects.get(30) == 30
+
+def test_large_objects_bypass_the_cache():
+    objects = ObjectCache(max_bytes=160)
+    objects.put("small", "x", 10)
+    objects.put("large", "y", 11)
+    assert objects.get("small") == "x"
+    assert objects.get("large") is None
+    assert len(objects) == 1
+
+def test_read_tree_is_served_from_cache(tmp_path):
+    repo_path = tmp_path / ".pygit"
+    blob = write_object(repo_path, b"hello")
+    tree = write_object(repo_path, serialize_tree({"a.txt": ("blob", blob)}), "tree")
+    cache.objects.clear()
+    stats.reset()
+
+    assert read_tree(repo_path, tree) == {"a.txt": ("blob", blob)}
+    assert read_tree(repo_path, tree) is read_tree(repo_path, tree)
+    assert stats.get("objects_read") == 1
+    assert stats.get("cache_hits") == 2
+    assert stats.get("cache_misses") == 2  # parsed tree, then the raw object
@@ -0,0 +1,87 @@
+import pytest
+from pygit.commands import init, add, commit, checkout, diff, log, status
+from pygit.core.index import load_index_entries
+from pygit.core.objects import load_commit
+from pygit.core.repo import get_head_commit_hash
+
+@pytest.fixture
+def two_commits(tmp_path):
+    repo_dir = tmp_path / ".pygit"
+    init.run(repo_dir=repo_dir)
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src/app.py").write_text("v1\n")
+    (tmp_path / "src/old.py").write_text("old\n")
+    (tmp_path / "same.txt").write_text("same\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("first", repo_dir=repo_dir)
+    first = get_head_commit_hash(repo_dir)
+
+    (tmp_path / "src/app.py").write_text("v2\n")
+    (tmp_path / "src/old.py").unlink()
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs/new.md").write_text("new\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("second", repo_dir=repo_dir)
+    second = get_head_commit_hash(repo_dir)
+    return tmp_path, repo_dir, first, second
+
+def test_checkout_touches_only_changed_paths(two_commits):
+    tmp_path, repo_dir, first, second = two_commits
+    same_inode = (tmp_path / "same.txt").stat().st_ino
+
+    result = checkout.checkout(repo_dir, first)
+    assert sorted(result.updated) == ["src/app.py", "src/old.py"]
+    assert result.removed == ["docs/new.md"]
+    assert (tmp_path / "src/app.py").read_text() == "v1\n"
+    assert not (tmp_path / "docs").exists()
+    assert (tmp_path / "same.txt").stat().st_ino == same_inode
+    assert (repo_dir / "HEAD").read_text() == first
+    assert set(load_index_entries(repo_dir)) == {"src/app.py", "src/old.py", "same.txt"}
+
+    (repo_dir / "refs/heads/master").write_text(second)
+    result = checkout.checkout(repo_dir, "master")
+    assert result.branch == "master" and result.commit == second
+    assert (tmp_path / "docs/new.md").read_text() == "new\n"
+    assert not (tmp_path / "src/old.py").exists()
+    assert status.get_status(repo_dir).clean
+
+def test_checkout_refuses_to_overwrite_local_changes(two_commits, capsys):
+    tmp_path, repo_dir, first, second = two_commits
+    (tmp_path / "src/app.py").write_text("local edit\n")
+
+    with pytest.raises(checkout.LocalChangesError) as error:
+        checkout.checkout(repo_dir, first)
+    assert error.value.paths == ["src/app.py"]
+    assert (tmp_path / "src/app.py").read_text() == "local edit\n"
+    assert get_head_commit_hash(repo_dir) == second
+
+    checkout.run(first, repo_dir=repo_dir, force=True)
+    assert "HEAD is now at" in capsys.readouterr().out
+    assert (tmp_path / "src/app.py").read_text() == "v1\n"
+
+def test_switch_requires_a_branch(two_commits, capsys):
+    _, repo_dir, first, _ = two_commits
+    checkout.run(first, repo_dir=repo_dir, branch_only=True)
+    assert "is not a branch" in capsys.readouterr().out
+
+def test_commands_work_on_a_detached_head(two_commits, capsys):
+    tmp_path, repo_dir, first, second = two_commits
+    checkout.checkout(repo_dir, first)
+    assert get_head_commit_hash(repo_dir) == first
+    assert status.get_status(repo_dir).clean
+    capsys.readouterr()
+    diff.run(cached=True, repo_dir=repo_dir)
+    assert capsys.readouterr().out == ""
+
+    (tmp_path / "same.txt").write_text("changed\n")
+    add.run([tmp_path / "same.txt"], repo_dir=repo_dir)
+    assert status.get_status(repo_dir).staged == ["same.txt"]
+    commit.run("detached", repo_dir=repo_dir)
+    third = get_head_commit_hash(repo_dir)
+    assert (repo_dir / "HEAD").read_text() == third
+    assert load_commit(repo_dir, third)["parent"] == first
+    assert (repo_dir / "refs/heads/master").read_text() == second
+
+    capsys.readouterr()
+    log.run(oneline=True, repo_dir=repo_dir)
+    assert capsys.readouterr().out.splitlines() == [f"{third[:7]} detached", f"{first[:7]} first"]
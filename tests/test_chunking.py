@@ -0,0 +1,54 @@
+import io
+import random
+from pygit.commands import init, add, commit, gc, status
+from pygit.core import stats
+from pygit.core.chunking import MAX_CHUNK, MIN_CHUNK, iter_chunks
+from pygit.core.hashing import hash_file
+from pygit.core.index import load_index_entries
+from pygit.core.objects import iter_object, object_type, read_object
+
+def _random_bytes(size, seed=0):
+    return random.Random(seed).randbytes(size)
+
+def test_chunks_survive_insertions():
+    data = _random_bytes(24 * 1024 * 1024)
+    edited = data[:10_000_000] + b"inserted" + data[10_000_000:]
+
+    chunks = [bytes(c) for c in iter_chunks(io.BytesIO(data))]
+    edited_chunks = [bytes(c) for c in iter_chunks(io.BytesIO(edited))]
+
+    assert b"".join(chunks) == data and b"".join(edited_chunks) == edited
+    assert all(MIN_CHUNK <= len(c) <= MAX_CHUNK for c in chunks[:-1])
+    # Only the chunk holding the insertion differs
+    assert len(set(edited_chunks) - set(chunks)) == 1
+
+def test_chunked_files_store_only_changed_chunks(tmp_path, capsys):
+    repo_dir = tmp_path / ".pygit"
+    init.run(repo_dir=repo_dir)
+    (repo_dir / "chunked").write_text("*.bin\n")
+    model = tmp_path / "model.bin"
+    data = bytearray(_random_bytes(12 * 1024 * 1024))
+    model.write_bytes(data)
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("first", repo_dir=repo_dir)
+
+    blob_hash = load_index_entries(repo_dir)["model.bin"]["hash"]
+    assert blob_hash == hash_file(model)
+    assert object_type(repo_dir, blob_hash) == "manifest"
+    assert read_object(repo_dir, blob_hash) == ("blob", bytes(data))
+
+    data[5_000_000] ^= 1
+    model.write_bytes(data)
+    stats.reset()
+    add.run([model], repo_dir=repo_dir)
+    commit.run("second", repo_dir=repo_dir)
+    # One new chunk, the manifest, a tree and nothing else
+    assert stats.get("objects_written") == 3
+
+    # gc keeps the chunks of both versions, which it finds through their manifests
+    gc.run(repo_dir=repo_dir, prune="now")
+    new_hash = load_index_entries(repo_dir)["model.bin"]["hash"]
+    assert b"".join(list(iter_object(repo_dir, new_hash))[1:]) == bytes(data)
+    assert hash_file(model) == new_hash
+    assert len(read_object(repo_dir, blob_hash)[1]) == len(data)
+    assert status.get_status(repo_dir).clean
@@ -0,0 +1,46 @@
+import os
+from pygit.commands import init, add, commit, clone, gc, bundle, status
+from pygit.core.repo import get_head_commit_hash
+
+def _make_repo(work):
+    repo_dir = work / ".pygit"
+    init.run(repo_dir=repo_dir)
+    (work / "src").mkdir()
+    (work / "src/app.py").write_text("print('hi')\n")
+    (work / "README").write_text("readme\n")
+    add.run([work], repo_dir=repo_dir)
+    commit.run("first", repo_dir=repo_dir)
+    (work / "README").write_text("readme, again\n")
+    add.run([work], repo_dir=repo_dir)
+    commit.run("second", repo_dir=repo_dir)
+    return repo_dir
+
+def test_clone_hardlinks_objects_and_checks_out_head(tmp_path, capsys):
+    repo_dir = _make_repo(tmp_path / "source")
+    head = get_head_commit_hash(repo_dir)
+    commit_json = (repo_dir / "commits" / f"{head}.json").read_text()
+
+    result = clone.clone(tmp_path / "source", tmp_path / "copy")
+    assert result.commit == head and result.linked > 0 and result.copied == 0
+    copy_repo = tmp_path / "copy" / ".pygit"
+    assert (tmp_path / "copy/src/app.py").read_text() == "print('hi')\n"
+    assert (tmp_path / "copy/README").read_text() == "readme, again\n"
+    assert get_head_commit_hash(copy_repo) == head
+    assert (copy_repo / "commits" / f"{head}.json").read_text() == commit_json
+    blob = next(p for p in (copy_repo / "objects").rglob("*") if p.is_file())
+    assert os.stat(blob).st_nlink == 2
+    capsys.readouterr()
+    status.run(repo_dir=copy_repo)
+    assert "No changes" in capsys.readouterr().out
+
+    # Packs are linked too, and a clone can be made from a bundle
+    gc.run(repo_dir=repo_dir)
+    result = clone.clone(repo_dir, tmp_path / "packed")
+    assert (tmp_path / "packed/README").read_text() == "readme, again\n"
+    bundle.run("create", tmp_path / "source.bundle", ["--all"], repo_dir=repo_dir)
+    result = clone.clone(tmp_path / "source.bundle", tmp_path / "unbundled")
+    assert result.commit == head
+    assert (tmp_path / "unbundled/src/app.py").read_text() == "print('hi')\n"
+
+    clone.run(tmp_path / "source", tmp_path / "copy")
+    assert "already exists" in capsys.readouterr().out
@@ -1,11 +1,16 @@
+import hashlib
 import json
 import tempfile
 from pathlib import Path
 from pygit.commands import init, add, commit
 from pygit.core.index import load_index
 from pygit.core.repo import get_head_commit_hash
+from pygit.core.hashing import hash_file
+from pygit.core.objects import load_commit_tree
+from pygit.core.tree import read_tree, serialize_tree, diff_trees
+from unittest.mock import patch
 
-def test_commit_creates_commit_file_and_clears_index():
+def test_commit_creates_commit_file_and_root_tree():
     with tempfile.TemporaryDirectory() as temp_dir:
         temp_path = Path(temp_dir)
 
@@ -29,8 +34,53 @@ def test_commit_creates_commit_file_and_clears_index():
         data = json.loads(commit_file.read_text())
         assert data["message"] == "Initial commit"
         assert isinstance(data["timestamp"], float)
-        assert isinstance(data["files"], dict)
-        assert "hello.txt" in data["files"]
+        assert read_tree(temp_path / ".pygit", data["tree"]) == {
+            "hello.txt": ("blob", hash_file(file_path))
+        }
+        assert data["parent"] is None
 
-        # 6. Check index was cleared
-        assert load_index(temp_path / ".pygit") == {}
+        # 6. The index keeps the full snapshot for the next commit
+        assert load_index(temp_path / ".pygit") == {"hello.txt": hash_file(file_path)}
+
+
+def test_second_commit_only_writes_trees_on_the_changed_path(tmp_path):
+    repo_dir = tmp_path / ".pygit"
+    init.run(repo_dir=repo_dir)
+    for name in ["a/one.txt", "a/deep/two.txt", "b/three.txt"]:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(name)
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("first", repo_dir=repo_dir)
+    first = get_head_commit_hash(repo_dir)
+
+    (tmp_path / "a" / "deep" / "two.txt").write_text("changed")
+    add.run([tmp_path / "a" / "deep" / "two.txt"], repo_dir=repo_dir)
+    with patch("pygit.core.tree.serialize_tree", wraps=serialize_tree) as serialize:
+        commit.run("second", repo_dir=repo_dir)
+    second = get_head_commit_hash(repo_dir)
+
+    # Only "a/deep", "a" and the root were rebuilt; "b" came from the cache-tree
+    assert serialize.call_count == 3
+    tree = load_commit_tree(repo_dir, second)
+    assert tree["a/deep/two.txt"] == hash_file(tmp_path / "a" / "deep" / "two.txt")
+    assert tree["b/three.txt"] == hash_file(tmp_path / "b" / "three.txt")
+    assert list(tree) == ["a/deep/two.txt", "a/one.txt", "b/three.txt"]
+
+    old_tree = load_commit_tree(repo_dir, first).hash
+    assert list(diff_trees(repo_dir, old_tree, tree.hash)) == [
+        ("a/deep/two.txt", hashlib.sha1(b"a/deep/two.txt").hexdigest(), tree["a/deep/two.txt"])
+    ]
+
+def test_commit_with_unchanged_index_is_a_no_op(tmp_path, capsys):
+    repo_dir = tmp_path / ".pygit"
+    init.run(repo_dir=repo_dir)
+    (tmp_path / "hello.txt").write_text("hi")
+    add.run(tmp_path / "hello.txt", repo_dir=repo_dir)
+    commit.run("first", repo_dir=repo_dir)
+    first = get_head_commit_hash(repo_dir)
+
+    commit.run("again", repo_dir=repo_dir)
+
+    assert get_head_commit_hash(repo_dir) == first
+    assert capsys.readouterr().out.endswith("Nothing to commit.\n")
@@ -0,0 +1,84 @@
+from unittest.mock import patch
+from pygit.core.commit_graph import (
+    append_commit, load_commit_graph, write_commit_graph, iter_history, is_ancestor, merge_bases,
+)
+from pygit.core import stats
+from pygit.core.objects import generate_commit_hash, save_commit
+
+TREE = "e" * 40
+
+def make_history(repo_path, count, graph=True):
+    (repo_path / "refs" / "heads").mkdir(parents=True, exist_ok=True)
+    (repo_path / "HEAD").write_text("ref: refs/heads/master\n")
+    parent = None
+    hashes = []
+    for i in range(count):
+        commit = {"message": f"commit {i}", "timestamp": 1000.0 + i, "parent": parent, "tree": TREE}
+        parent = generate_commit_hash(commit)
+        save_commit(repo_path, parent, commit)
+        if graph:
+            append_commit(repo_path, parent, commit)
+        hashes.append(parent)
+    (repo_path / "refs" / "heads" / "master").write_text(parent)
+    return hashes
+
+def test_append_commit_keeps_a_short_chain_of_layers(tmp_path):
+    hashes = make_history(tmp_path, 40)
+
+    graph = load_commit_graph(tmp_path)
+    assert len(graph) == 40
+    assert len(graph.layers) <= 6
+    row = graph.lookup(hashes[10])
+    assert row["parents"] == [hashes[9]]
+    assert row["generation"] == 11
+    assert row["message"] == "commit 10"
+    assert row["tree"] == TREE
+    assert graph.lookup("0" * 40) is None
+    # Merged-away layers are deleted
+    assert len(list((tmp_path / "commit-graph").glob("*.graph"))) == len(graph.layers)
+
+def test_history_walks_never_parse_commit_files(tmp_path):
+    hashes = make_history(tmp_path, 25)
+
+    with patch("pygit.core.commit_graph.load_commit", side_effect=AssertionError("parsed JSON")):
+        messages = [row["message"] for row in iter_history(tmp_path, [hashes[-1]])]
+        assert is_ancestor(tmp_path, hashes[3], hashes[-1])
+        assert not is_ancestor(tmp_path, hashes[-1], hashes[3])
+
+    assert messages == [f"commit {i}" for i in reversed(range(25))]
+
+def test_write_commit_graph_backfills_existing_history(tmp_path):
+    hashes = make_history(tmp_path, 5, graph=False)
+    assert len(load_commit_graph(tmp_path)) == 0
+
+    assert write_commit_graph(tmp_path) == 5
+
+    graph = load_commit_graph(tmp_path)
+    assert len(graph.layers) == 1
+    assert [graph.lookup(h)["generation"] for h in hashes] == [1, 2, 3, 4, 5]
+
+def _commit(repo_path, message, parents, timestamp):
+    commit = {"message": message, "timestamp": timestamp, "parents": parents, "tree": TREE}
+    commit_hash = generate_commit_hash(commit)
+    save_commit(repo_path, commit_hash, commit)
+    append_commit(repo_path, commit_hash, commit)
+    return commit_hash
+
+def test_merge_bases_stop_near_the_fork(tmp_path):
+    hashes = make_history(tmp_path, 200)
+    fork = hashes[190]
+    left = right = fork
+    for i in range(5):
+        left = _commit(tmp_path, f"left {i}", [left], 2000.0 + i)
+        right = _commit(tmp_path, f"right {i}", [right], 3000.0 + i)
+
+    stats.reset()
+    assert merge_bases(tmp_path, left, right) == [fork]
+    assert stats.get("commits_walked") < 20
+    assert merge_bases(tmp_path, hashes[50], right) == [hashes[50]]
+
+    # Criss-cross merges leave two equally good bases
+    a = _commit(tmp_path, "merge a", [left, right], 4000.0)
+    b = _commit(tmp_path, "merge b", [right, left], 4001.0)
+    assert sorted(merge_bases(tmp_path, a, b)) == sorted([left, right])
+    assert merge_bases(tmp_path, _commit(tmp_path, "x", [a], 5000.0), right) == [right]
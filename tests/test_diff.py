@@ -0,0 +1,143 @@
+import difflib
+import random
+from pygit.commands import init, add, commit, diff
+from pygit.core.diff import matching_blocks, opcodes, unified_diff
+from pygit.core.repo import get_head_commit_hash
+
+def apply_opcodes(a, b):
+    result = []
+    for tag, i1, i2, j1, j2 in opcodes(a, b):
+        result.extend(a[i1:i2] if tag == "equal" else b[j1:j2])
+    return result
+
+def test_opcodes_produce_minimal_edit_script():
+    rng = random.Random(7)
+    for _ in range(200):
+        a = [rng.choice("abcd") for _ in range(rng.randrange(30))]
+        b = [rng.choice("abcd") for _ in range(rng.randrange(30))]
+        assert apply_opcodes(a, b) == b
+        # An optimal diff keeps a longest common subsequence
+        matched = sum(n for _, _, n in matching_blocks(a, b))
+        lcs = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+        for i in range(len(a) - 1, -1, -1):
+            for j in range(len(b) - 1, -1, -1):
+                lcs[i][j] = lcs[i + 1][j + 1] + 1 if a[i] == b[j] else max(lcs[i + 1][j], lcs[i][j + 1])
+        assert matched == lcs[0][0]
+
+def test_small_context_hunks_all_hold_changes():
+    rng = random.Random(11)
+    for _ in range(500):
+        old = "".join(rng.choice("abc\n") for _ in range(rng.randrange(40))).encode()
+        new = "".join(rng.choice("abc\n") for _ in range(rng.randrange(40))).encode()
+        for context in (0, 1):
+            hunk = []
+            for line in list(unified_diff(old, new, "a/f", "b/f", context))[2:] + ["@@"]:
+                if line.startswith("@@"):
+                    assert hunk == [] or any(l[0] in "+-" for l in hunk[1:])
+                    hunk = [line]
+                else:
+                    hunk.append(line)
+
+def test_unified_diff_matches_difflib():
+    old = "".join(f"line {i}\n" for i in range(100)).encode()
+    new = old.replace(b"line 10\n", b"changed\n").replace(b"line 80\n", b"")
+    ours = list(unified_diff(old, new, "a/f", "b/f"))
+    theirs = [line.rstrip("\n") for line in difflib.unified_diff(
+        old.decode().splitlines(True), new.decode().splitlines(True), "a/f", "b/f")]
+    assert ours == theirs
+
+def test_unified_diff_binary_and_missing_newline():
+    assert list(unified_diff(b"a\0b", b"c", "a/f", "b/f")) == ["Binary files a/f and b/f differ"]
+    lines = list(unified_diff(b"x\n", b"x\ny", "a/f", "b/f"))
+    assert lines[-2:] == ["+y", "\\ No newline at end of file"]
+
+def test_unified_diff_reads_only_the_start_of_binary_streams():
+    def blocks():
+        yield b"text\n" * 100
+        yield b"\0" * 8000
+        raise AssertionError("read past the binary check")
+
+    assert list(unified_diff(blocks(), [b"c\n"], "a/f", "b/f")) == ["Binary files a/f and b/f differ"]
+    assert list(unified_diff([b"a\nb", b"\nc\n"], iter([b"a\nc\n"]), "a/f", "b/f"))[2:] == [
+        "@@ -1,3 +1,2 @@", " a", "-b", " c"]
+
+def test_diff_worktree_cached_and_commits(tmp_path, capsys):
+    repo_dir = tmp_path / ".pygit"
+    init.run(repo_dir=repo_dir)
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src/app.py").write_text("one\ntwo\nthree\n")
+    (tmp_path / "notes.txt").write_text("notes\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("first", repo_dir=repo_dir)
+    first = get_head_commit_hash(repo_dir)
+    capsys.readouterr()
+
+    diff.run(repo_dir=repo_dir)
+    assert capsys.readouterr().out == ""
+
+    (tmp_path / "src/app.py").write_text("one\n2\nthree\n")
+    (tmp_path / "notes.txt").unlink()
+    diff.run(repo_dir=repo_dir)
+    out = capsys.readouterr().out
+    assert "diff --pygit a/src/app.py b/src/app.py" in out
+    assert "-two\n+2\n" in out
+    assert "deleted file\n--- a/notes.txt\n+++ /dev/null\n@@ -1 +0,0 @@\n-notes\n" in out
+
+    diff.run(cached=True, repo_dir=repo_dir)
+    assert capsys.readouterr().out == ""
+
+    # A directory replaced by a file shows its files as deleted
+    (tmp_path / "src/app.py").rename(tmp_path / "app.py")
+    (tmp_path / "src").rmdir()
+    (tmp_path / "src").write_text("now a file\n")
+    diff.run(repo_dir=repo_dir)
+    assert "deleted file\n--- a/src/app.py" in capsys.readouterr().out
+    (tmp_path / "src").unlink()
+    (tmp_path / "src").mkdir()
+    (tmp_path / "app.py").rename(tmp_path / "src/app.py")
+
+    add.run([tmp_path], repo_dir=repo_dir)
+    capsys.readouterr()
+    objects = sorted((repo_dir / "objects").rglob("*"))
+    diff.run(cached=True, repo_dir=repo_dir)
+    out = capsys.readouterr().out
+    assert "-two\n+2\n" in out and "a/notes.txt" in out
+    assert sorted((repo_dir / "objects").rglob("*")) == objects  # No trees written
+
+    commit.run("second", repo_dir=repo_dir)
+    capsys.readouterr()
+    diff.run(commits=[first[:8], "HEAD"], repo_dir=repo_dir)
+    out = capsys.readouterr().out
+    assert "-two\n+2\n" in out and "deleted file" in out
+
+    diff.run(commits=["nope", "HEAD"], repo_dir=repo_dir)
+    assert "'nope' is not a commit." in capsys.readouterr().out
+
+def test_diff_shows_renames_and_copies(tmp_path, capsys):
+    repo_dir = tmp_path / ".pygit"
+    init.run(repo_dir=repo_dir)
+    body = "".join(f"line {i}\n" for i in range(20))
+    (tmp_path / "old.txt").write_text(body)
+    (tmp_path / "base.txt").write_text(body.upper())
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("first", repo_dir=repo_dir)
+
+    (tmp_path / "old.txt").rename(tmp_path / "new.txt")
+    (tmp_path / "new.txt").write_text(body.replace("line 3\n", "line three\n"))
+    (tmp_path / "copy.txt").write_text(body.upper())
+    (tmp_path / "base.txt").write_text(body.upper() + "END\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    capsys.readouterr()
+
+    diff.run(cached=True, repo_dir=repo_dir)
+    out = capsys.readouterr().out
+    assert ("diff --pygit a/old.txt b/new.txt\nsimilarity index 92%\nrename from old.txt\n"
+            "rename to new.txt\n--- a/old.txt\n+++ b/new.txt\n") in out
+    assert "-line 3\n+line three\n" in out
+    assert "new file\n--- /dev/null\n+++ b/copy.txt" in out
+
+    diff.run(cached=True, copies=True, repo_dir=repo_dir)
+    assert "copy from base.txt\ncopy to copy.txt\n" in capsys.readouterr().out
+
+    diff.run(cached=True, renames=False, repo_dir=repo_dir)
+    assert "deleted file\n--- a/old.txt" in capsys.readouterr().out
@@ -0,0 +1,116 @@
+import sys
+import threading
+import pytest
+from pygit.commands import init, add, commit, status
+from pygit.core import fsmonitor, stats
+from pygit.core.fsmonitor_daemon import FSMonitor
+from pygit.core.index import load_index_entries
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")
+
+@pytest.fixture
+def monitored_repo(tmp_path):
+    repo_dir = tmp_path / ".pygit"
+    init.run(repo_dir=repo_dir)
+    (tmp_path / "src" / "lib").mkdir(parents=True)
+    for name in ("a.txt", "src/b.txt", "src/lib/c.txt"):
+        (tmp_path / name).write_text(name)
+    (tmp_path / "untracked.txt").write_text("new")
+    (tmp_path / ".pygitignore").write_text("build/\n")
+    add.run([tmp_path / "a.txt", tmp_path / "src"], repo_dir=repo_dir)
+
+    monitor = FSMonitor(repo_dir)
+    thread = threading.Thread(target=monitor.serve_forever, daemon=True)
+    thread.start()
+    assert monitor.ready.wait(5)
+    yield tmp_path, repo_dir
+    monitor.stop()
+    thread.join(5)
+
+def scan(repo_dir, use_monitor):
+    entries = load_index_entries(repo_dir)
+    if not use_monitor:
+        entries.extensions.pop(fsmonitor.FSMONITOR_EXTENSION, None)
+    stats.reset()
+    return status.get_working_directory_files(repo_dir, entries)
+
+def test_monitor_matches_full_scan(monitored_repo):
+    tmp_path, repo_dir = monitored_repo
+
+    # The first status walks everything and records a token
+    first = scan(repo_dir, use_monitor=True)
+    assert sorted(first) == ["a.txt", "src/b.txt", "src/lib/c.txt", "untracked.txt"]
+    assert fsmonitor.load_state(load_index_entries(repo_dir))[0] is not None
+
+    (tmp_path / "a.txt").write_text("changed")
+    (tmp_path / "src/lib/c.txt").unlink()
+    (tmp_path / "src/new").mkdir()
+    (tmp_path / "src/new/d.txt").write_text("d")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build/out.o").write_text("ignored")
+
+    incremental = scan(repo_dir, use_monitor=True)
+    assert stats.get("files_hashed") == 2  # a.txt and src/new/d.txt
+    assert incremental == scan(repo_dir, use_monitor=False)
+
+    # Renaming a directory reports the files at their new location
+    (tmp_path / "src").rename(tmp_path / "moved")
+    incremental = scan(repo_dir, use_monitor=True)
+    assert incremental == scan(repo_dir, use_monitor=False)
+    assert "moved/new/d.txt" in incremental and "src/b.txt" not in incremental
+
+def test_add_directory_uses_monitor(monitored_repo):
+    tmp_path, repo_dir = monitored_repo
+    scan(repo_dir, use_monitor=True)
+    (tmp_path / "src/b.txt").write_text("changed")
+    (tmp_path / "src/lib/e.txt").write_text("e")
+
+    add.run([tmp_path / "src"], repo_dir=repo_dir)
+    index = load_index_entries(repo_dir)
+    assert {"src/b.txt", "src/lib/c.txt", "src/lib/e.txt"} <= set(index)
+    assert index["src/b.txt"]["hash"] == scan(repo_dir, use_monitor=False)["src/b.txt"]
+
+def test_deleted_file_stays_deleted(monitored_repo):
+    tmp_path, repo_dir = monitored_repo
+    scan(repo_dir, use_monitor=True)
+    (tmp_path / "src/b.txt").unlink()
+
+    # The monitor reports the deletion once; later runs must remember it
+    for _ in range(3):
+        assert "src/b.txt" not in scan(repo_dir, use_monitor=True)
+    assert fsmonitor.load_state(load_index_entries(repo_dir))[1]["src/b.txt"] is None
+
+    add.run([tmp_path], repo_dir=repo_dir)
+    assert "src/b.txt" not in load_index_entries(repo_dir)
+    assert scan(repo_dir, use_monitor=True) == scan(repo_dir, use_monitor=False)
+
+def test_porcelain_keeps_reporting_deletions(monitored_repo, capsys):
+    tmp_path, repo_dir = monitored_repo
+    commit.run("initial", repo_dir=repo_dir)
+    status.run(porcelain=True, repo_dir=repo_dir)
+    (tmp_path / "src/b.txt").unlink()
+    capsys.readouterr()
+
+    for _ in range(3):
+        status.run(porcelain=True, repo_dir=repo_dir)
+        assert capsys.readouterr().out.splitlines() == [" D src/b.txt", "?? untracked.txt"]
+
+def test_worktree_directory_named_like_the_cookie_directory(monitored_repo):
+    tmp_path, repo_dir = monitored_repo
+    (tmp_path / fsmonitor.COOKIE_DIR).mkdir()
+    scan(repo_dir, use_monitor=True)
+    (tmp_path / fsmonitor.COOKIE_DIR / "notes.txt").write_text("not a cookie")
+    incremental = scan(repo_dir, use_monitor=True)
+    assert f"{fsmonitor.COOKIE_DIR}/notes.txt" in incremental
+    assert incremental == scan(repo_dir, use_monitor=False)
+
+def test_stale_token_falls_back_to_full_walk(monitored_repo):
+    tmp_path, repo_dir = monitored_repo
+    entries = load_index_entries(repo_dir)
+    fsmonitor.store_state(entries, "stale:0", {})
+    token, changed = fsmonitor.changed_since(repo_dir, entries)
+    assert token is not None and changed is None
+
+def test_no_daemon_means_full_walk(tmp_path):
+    init.run(repo_dir=tmp_path / ".pygit")
+    assert fsmonitor.changed_since(tmp_path / ".pygit", load_index_entries(tmp_path / ".pygit")) == (None, None)
@@ -0,0 +1,84 @@
+import os
+import time
+import pytest
+from pygit.commands import init, add, commit, gc
+from pygit.core.hashing import hash_file
+from pygit.core.merge import save_merge_state
+from pygit.core.objects import write_object, object_exists, read_object, load_commit
+from pygit.core.pack import load_packs
+from pygit.core.repo import get_head_commit_hash
+
+@pytest.fixture
+def abandoned_commit(tmp_path):
+    """
+    A repository whose branch was reset past its last commit, with every
+    file dated a month ago.
+    """
+    repo_dir = tmp_path / ".pygit"
+    init.run(repo_dir=repo_dir)
+    (tmp_path / "kept.txt").write_text("kept\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("first", repo_dir=repo_dir)
+    first = get_head_commit_hash(repo_dir)
+
+    (tmp_path / "dropped.txt").write_text("dropped\n")
+    add.run([tmp_path / "dropped.txt"], repo_dir=repo_dir)
+    commit.run("second", repo_dir=repo_dir)
+    second = get_head_commit_hash(repo_dir)
+    dropped_blob = hash_file(tmp_path / "dropped.txt")
+
+    (repo_dir / "refs/heads/master").write_text(first)
+    (repo_dir / "index").unlink()
+    (tmp_path / "dropped.txt").unlink()
+    _age(repo_dir, 30 * 86400)
+    return repo_dir, first, second, dropped_blob
+
+def _age(repo_dir, seconds):
+    old = time.time() - seconds
+    for path in repo_dir.rglob("*"):
+        os.utime(path, (old, old))
+
+def test_parse_age():
+    assert gc.parse_age("now") == 0
+    assert gc.parse_age("never") is None
+    assert gc.parse_age("2.weeks.ago") == 14 * 86400
+    assert gc.parse_age("1.day.ago") == 86400
+    assert gc.parse_age("30m") == 1800
+    with pytest.raises(ValueError):
+        gc.parse_age("soon")
+
+def test_gc_prunes_old_unreachable_data(abandoned_commit, capsys):
+    repo_dir, first, second, dropped_blob = abandoned_commit
+    recent_blob = write_object(repo_dir, b"written by an add in progress")
+
+    gc.run(repo_dir=repo_dir, prune="1.week.ago")
+
+    assert load_commit(repo_dir, second) is None
+    assert not object_exists(repo_dir, dropped_blob)
+    assert load_commit(repo_dir, first)["message"] == "first"
+    assert object_exists(repo_dir, recent_blob)
+    out = capsys.readouterr().out
+    assert "Pruned 2 unreachable object(s) and 1 commit(s)." in out
+    assert "KiB reclaimed" in out
+
+def test_gc_drops_unreachable_objects_from_old_packs(abandoned_commit, capsys):
+    repo_dir, first, second, dropped_blob = abandoned_commit
+    gc.run(repo_dir=repo_dir, prune="never")
+    assert object_exists(repo_dir, dropped_blob)
+
+    # Objects from a recent pack are kept, as loose objects
+    gc.run(repo_dir=repo_dir, prune="1.week.ago")
+    assert read_object(repo_dir, dropped_blob) == ("blob", b"dropped\n")
+
+    _age(repo_dir, 30 * 86400)
+    gc.run(repo_dir=repo_dir, prune="now")
+    assert not object_exists(repo_dir, dropped_blob)
+    assert len(load_packs(repo_dir)) == 1
+    assert load_commit(repo_dir, second) is None
+
+def test_gc_keeps_the_commit_being_merged(abandoned_commit):
+    repo_dir, first, second, dropped_blob = abandoned_commit
+    save_merge_state(repo_dir, second, ["dropped.txt"])  # As a conflicted merge of a bare hash leaves it
+    gc.run(repo_dir=repo_dir, prune="now")
+    assert load_commit(repo_dir, second)["message"] == "second"
+    assert object_exists(repo_dir, dropped_blob)
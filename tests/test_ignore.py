@@ -0,0 +1,55 @@
+from pathlib import Path
+from unittest.mock import patch
+from pygit.core.ignore import IgnoreRules, IgnoreFile
+
+def make_tree(root: Path, files):
+    for name in files:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(name)
+
+def test_ignore_file_negation_and_directory_only_patterns():
+    rules = IgnoreFile(["*.log", "!keep.log", "build/", "/top.txt"])
+
+    assert rules.match("debug.log", is_dir=False) is True
+    assert rules.match("logs/debug.log", is_dir=False) is True
+    assert rules.match("keep.log", is_dir=False) is False
+    assert rules.match("build", is_dir=True) is True
+    assert rules.match("build", is_dir=False) is None
+    assert rules.match("top.txt", is_dir=False) is True
+    assert rules.match("sub/top.txt", is_dir=False) is None
+
+def test_walk_prunes_ignored_directories_and_honours_nested_ignore_files(tmp_path):
+    (tmp_path / ".pygit").mkdir()
+    make_tree(tmp_path, [
+        "a.txt",
+        "src/main.py",
+        "src/tmp.bak",
+        "src/vendor/lib.py",
+        "node_modules/pkg/index.js",
+        ".pygit/index",
+    ])
+    (tmp_path / ".pygitignore").write_text("node_modules/\n*.bak\n")
+    (tmp_path / "src" / ".pygitignore").write_text("vendor\n")
+
+    rules = IgnoreRules(tmp_path / ".pygit")
+    with patch("pygit.core.ignore.os.scandir", wraps=__import__("os").scandir) as scandir:
+        walked = [name for name, _ in rules.walk()]
+
+    assert walked == ["a.txt", "src/main.py"]
+    scanned = [Path(call.args[0]).name for call in scandir.call_args_list]
+    assert "node_modules" not in scanned
+    assert "vendor" not in scanned
+    assert ".pygit" not in scanned
+
+def test_is_ignored_checks_parent_directories(tmp_path):
+    (tmp_path / ".pygit").mkdir()
+    make_tree(tmp_path, ["build/out/app.bin", "notes.txt"])
+    (tmp_path / ".pygitignore").write_text("build\n")
+
+    rules = IgnoreRules(tmp_path / ".pygit")
+
+    assert rules.is_ignored(tmp_path / "build" / "out" / "app.bin")
+    assert rules.is_ignored(tmp_path / ".pygit" / "index")
+    assert rules.is_ignored(tmp_path / ".pygitignore")
+    assert not rules.is_ignored(tmp_path / "notes.txt")
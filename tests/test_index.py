@@ -1,7 +1,16 @@
 import json
+import random
 import tempfile
 from pathlib import Path
-from pygit.core.index import load_index, save_index, clear_index
+import time
+import pytest
+from pygit.core.index import (
+    IndexEntries, load_index, load_index_entries, save_index, make_entry,
+    is_stat_clean, lookup_index_entry, locked_index, index_lock, IndexPatch, _encode_index,
+)
+
+HASH_A = "a" * 40
+HASH_B = "b" * 40
 
 def test_load_index_returns_empty_if_missing():
     with tempfile.TemporaryDirectory() as temp_dir:
@@ -12,34 +21,134 @@ def test_load_index_returns_empty_if_missing():
 def test_save_and_load_index():
     with tempfile.TemporaryDirectory() as temp_dir:
         repo_path = Path(temp_dir)
-        sample_index = {"file1.txt": "abc123", "file2.txt": "def456"}
+        sample_index = {"file1.txt": HASH_A, "file2.txt": HASH_B}
         
         save_index(repo_path, sample_index)
         loaded_index = load_index(repo_path)
         
         assert loaded_index == sample_index
-        # Ensure it's valid JSON on disk
+        # Ensure it's written in the binary format, through the lock file
         index_path = repo_path / "index"
-        with open(index_path) as f:
-            assert json.load(f) == sample_index
+        assert index_path.read_bytes()[:4] == b"PGIX"
+        assert not (repo_path / "index.lock").exists()
 
-def test_clear_index_removes_index_and_staging_files():
+def test_load_index_reads_legacy_json_index():
     with tempfile.TemporaryDirectory() as temp_dir:
         repo_path = Path(temp_dir)
-        
-        # Create dummy index file
-        index_path = repo_path / "index"
-        index_path.write_text(json.dumps({"file.txt": "abc123"}))
+        sample_index = {"file1.txt": HASH_A, "file2.txt": HASH_B}
+        (repo_path / "index").write_text(json.dumps(sample_index, indent=2))
 
-        # Create dummy staging files
-        staging_dir = repo_path / "staging"
-        staging_dir.mkdir()
-        (staging_dir / "file.txt").write_text("temp content")
-        
-        assert index_path.exists()
-        assert any(staging_dir.iterdir())
+        assert load_index(repo_path) == sample_index
+
+        # Saving migrates it to the binary format
+        save_index(repo_path, load_index_entries(repo_path))
+        assert (repo_path / "index").read_bytes()[:4] == b"PGIX"
+        assert load_index(repo_path) == sample_index
+
+def test_index_round_trips_stat_data_and_extensions():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        repo_path = Path(temp_dir)
+        (repo_path / "a.txt").write_text("a")
+        index = IndexEntries({
+            "a.txt": make_entry(HASH_A, (repo_path / "a.txt").stat()),
+            "dir/b.txt": {"hash": HASH_B},
+        }, extensions={"TEST": b"cache data"})
+        index["a.txt"]["mtime_ns"] = 1  # not racy
+
+        save_index(repo_path, index)
+        loaded = load_index_entries(repo_path)
+
+        assert loaded == index
+        assert loaded.extensions == {"TEST": b"cache data"}
+
+def test_index_round_trips_skip_worktree_entries():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        repo_path = Path(temp_dir)
+        index = {"a.txt": {"hash": HASH_A}, "vendor/": {"hash": HASH_B, "skip_worktree": True}}
+
+        save_index(repo_path, index)
+
+        assert load_index_entries(repo_path) == index
+        assert lookup_index_entry(repo_path, "vendor/") == {"hash": HASH_B, "skip_worktree": True}
+
+def test_lookup_index_entry_finds_single_paths():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        repo_path = Path(temp_dir)
+        index = {f"dir{i % 7}/file{i}.txt": f"{i:040x}" for i in range(200)}
+        save_index(repo_path, index)
+
+        assert lookup_index_entry(repo_path, "dir3/file10.txt") == {"hash": f"{10:040x}"}
+        assert lookup_index_entry(repo_path, "missing.txt") is None
+
+def test_locked_index_blocks_concurrent_writers():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        repo_path = Path(temp_dir)
+        save_index(repo_path, {"a.txt": HASH_A})
+
+        with locked_index(repo_path) as index:
+            index["b.txt"] = {"hash": HASH_B}
+            with pytest.raises(TimeoutError):
+                with index_lock(repo_path, timeout=0.05):
+                    pass
+
+        assert load_index(repo_path) == {"a.txt": HASH_A, "b.txt": HASH_B}
+        assert not (repo_path / "index.lock").exists()
+
+def test_load_index_entries_upgrades_plain_hashes():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        repo_path = Path(temp_dir)
+        save_index(repo_path, {"file1.txt": HASH_A})
+
+        assert load_index_entries(repo_path) == {"file1.txt": {"hash": HASH_A}}
+        assert load_index(repo_path) == {"file1.txt": HASH_A}
+
+def test_stat_cache_detects_changes_and_racy_entries():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        repo_path = Path(temp_dir)
+        file_path = repo_path / "file.txt"
+        file_path.write_text("hello")
+        st = file_path.stat()
+        entry = make_entry("abc123", st)
+
+        # Clean: stat data matches and the file is older than the index
+        assert is_stat_clean(entry, st, st.st_mtime_ns + 1)
+        # Racy: file modified in the same tick as the index write
+        assert not is_stat_clean(entry, st, st.st_mtime_ns)
+
+        file_path.write_text("hello, world")
+        assert not is_stat_clean(entry, file_path.stat(), file_path.stat().st_mtime_ns + 1)
+
+def test_save_index_smudges_racily_clean_entries():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        repo_path = Path(temp_dir)
+        file_path = repo_path / "file.txt"
+        file_path.write_text("hello")
+        entry = make_entry(HASH_A, file_path.stat())
+        entry["mtime_ns"] = time.time_ns() + 10**12  # modified "after" the index write
+
+        save_index(repo_path, {"file.txt": entry})
+
+        assert load_index_entries(repo_path) == {"file.txt": {"hash": HASH_A}}
 
-        clear_index(repo_path)
+def test_index_patch_matches_a_full_rewrite():
+    rng = random.Random(3)
+    names = sorted({f"d{rng.randrange(20)}/f{rng.randrange(1000)}" for _ in range(500)})
+    index = IndexEntries({name: {"hash": f"{i:040x}"} for i, name in enumerate(names)},
+                         extensions={"TREE": b"cache"})
+    patch = IndexPatch(_encode_index(index))
+    for name in rng.sample(names, 40):
+        assert patch.get(name) == index[name]
+        del patch[name], index[name]
+    for i in range(40):
+        name = rng.choice([f"new{i}", f"d{rng.randrange(20)}/g{i}", rng.choice(names)])
+        index[name] = patch[name] = {"hash": HASH_B}
+    patch.extensions["TREE"] = index.extensions["TREE"] = b"updated"
+    assert patch.encode() == _encode_index(index)
 
-        assert not index_path.exists()
-        assert not staging_dir.exists()
+def test_locked_index_partial_updates_entries(tmp_path):
+    save_index(tmp_path, {"a.txt": HASH_A, "b.txt": HASH_A})
+    with locked_index(tmp_path, partial=True) as index:
+        assert isinstance(index, IndexPatch)
+        index["b.txt"] = {"hash": HASH_B}
+        index.pop("a.txt")
+    assert load_index(tmp_path) == {"b.txt": HASH_B}
@@ -0,0 +1,73 @@
+from pathlib import Path
+from pygit.commands import init, add, commit, commit_graph, log
+from pygit.core import stats
+from pygit.core.commit_graph import _write_chain, _write_layer, load_commit_graph
+
+def make_commits(tmp_path, changes):
+    repo_dir = tmp_path / ".pygit"
+    init.run(repo_dir=repo_dir)
+    for message, files in changes:
+        for name, content in files.items():
+            path = tmp_path / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content)
+        add.run([tmp_path], repo_dir=repo_dir)
+        commit.run(message, repo_dir=repo_dir)
+    return repo_dir
+
+def test_log_oneline_limit_and_path_filter(tmp_path, capsys):
+    repo_dir = make_commits(tmp_path, [
+        ("add docs", {"docs/guide.md": "v1", "src/app.py": "v1"}),
+        ("change app", {"src/app.py": "v2"}),
+        ("change guide\n\nlonger description", {"docs/guide.md": "v2"}),
+    ])
+    capsys.readouterr()
+
+    log.run(oneline=True, repo_dir=repo_dir)
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split(" ", 1)[1] for line in lines] == ["change guide", "change app", "add docs"]
+
+    log.run(max_count=1, repo_dir=repo_dir)
+    out = capsys.readouterr().out
+    assert out.startswith("commit ")
+    assert "    longer description" in out
+    assert "change app" not in out
+
+    log.run(oneline=True, paths=["src"], repo_dir=repo_dir)
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split(" ", 1)[1] for line in lines] == ["change app", "add docs"]
+
+def test_log_without_commits(tmp_path, capsys):
+    init.run(repo_dir=tmp_path / ".pygit")
+    log.run(repo_dir=tmp_path / ".pygit")
+    assert "No commits yet." in capsys.readouterr().out
+
+def test_path_filter_skips_commits_with_changed_path_filters(tmp_path, capsys):
+    repo_dir = make_commits(tmp_path, [
+        (f"change {n}", {f"dir{n % 10}/file{n}.txt": "v1", "docs/guide.md": f"v{n // 10}"})
+        for n in range(40)
+    ])
+    capsys.readouterr()
+
+    stats.reset()
+    log.run(oneline=True, paths=["docs/guide.md"], repo_dir=repo_dir)
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split(" ", 1)[1] for line in lines] == ["change 30", "change 20", "change 10", "change 0"]
+    # Only false positives, if any, had their trees compared
+    assert stats.get("commits_skipped") >= 34
+
+    # Filters dropped from the graph (as in older repositories) are backfilled
+    graph = load_commit_graph(repo_dir)
+    rows = [dict(row, bloom=None) for layer in graph.layers for row in layer]
+    _write_chain(repo_dir, [_write_layer(repo_dir / "commit-graph", rows)], [l.path.name for l in graph.layers])
+    stats.reset()
+    log.run(oneline=True, paths=["docs/guide.md"], repo_dir=repo_dir)
+    assert stats.get("commits_skipped") == 0
+    capsys.readouterr()
+
+    commit_graph.run(repo_dir=repo_dir)
+    assert "Wrote 40 commit(s) to the commit-graph, 40 with changed-path filters." in capsys.readouterr().out
+    stats.reset()
+    log.run(oneline=True, paths=["docs"], repo_dir=repo_dir)
+    assert len(capsys.readouterr().out.splitlines()) == 4
+    assert stats.get("commits_skipped") >= 34
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Modules that `pygit status` must not import; each either costs noticeable
+# startup time or belongs to another command.
+UNWANTED_MODULES = {
+    "json", "tempfile", "shutil", "socket", "ctypes", "argparse", "subprocess",
+    "concurrent.futures", "typing", "logging", "pygit.core.fsmonitor_daemon",
+}
+
+def pygit(*args, cwd, code="from pygit.main import main; main()"):
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    env.pop("PYGIT_TRACE", None)
+    return subprocess.run([sys.executable, "-c", code, *args], cwd=cwd, env=env,
+                          check=True, capture_output=True, text=True).stdout
+
+def test_status_imports_only_what_it_needs(tmp_path):
+    (tmp_path / "a.txt").write_text("hello")
+    pygit("init", cwd=tmp_path)
+    pygit("add", "a.txt", cwd=tmp_path)
+    pygit("commit", "-m", "first", cwd=tmp_path)
+
+    code = ("import sys; from pygit.main import main; main(); "
+            "print('\\n'.join(sorted(sys.modules)))")
+    loaded = set(pygit("status", cwd=tmp_path, code=code).splitlines())
+    assert "pygit.commands.status" in loaded
+    assert not UNWANTED_MODULES & loaded
+    assert {m for m in loaded if m.startswith("pygit.commands.")} == {"pygit.commands.status"}
+
+def test_global_options_select_directory_and_repository(tmp_path):
+    work = tmp_path / "work"
+    work.mkdir()
+    (work / "a.txt").write_text("hello")
+    pygit("-C", "work", "init", cwd=tmp_path)
+    pygit("-C", "work", "add", "a.txt", cwd=tmp_path)
+    assert "staged:   a.txt" in pygit("-C", "work", "status", cwd=tmp_path)
+
+    out = pygit("--git-dir", "work/.pygit", "status", cwd=tmp_path)
+    assert "staged:   a.txt" in out
+    assert "untracked" not in out
+
+def test_usage_lists_commands(tmp_path):
+    out = pygit("--help", cwd=tmp_path)
+    assert out.startswith("Usage: pygit")
+    assert "  status" in out and "  fsmonitor" in out
+
+def test_profile_is_only_a_global_option(tmp_path):
+    (tmp_path / "a.txt").write_text("hello")
+    pygit("init", cwd=tmp_path)
+    pygit("add", "a.txt", cwd=tmp_path)
+    # After the command name it is an ordinary argument, here the message
+    pygit("commit", "-m", "--profile", cwd=tmp_path)
+    assert pygit("log", "--oneline", cwd=tmp_path).split(" ", 1)[1] == "--profile\n"
+
+    pygit("--profile=status.prof", "status", cwd=tmp_path)
+    assert (tmp_path / "status.prof").exists()
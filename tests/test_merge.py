@@ -0,0 +1,145 @@
+import pytest
+from pygit.commands import init, add, commit, branch, checkout, merge, status
+from pygit.core import stats
+from pygit.core.commit_graph import load_commit_graph
+from pygit.core.merge import merge_lines, load_merge_state
+from pygit.core.objects import load_commit, load_commit_tree
+from pygit.core.repo import get_head_commit_hash
+
+def _lines(text):
+    return text.encode().splitlines(keepends=True)
+
+def test_merge_lines_combines_separate_changes_and_marks_conflicts():
+    base = _lines("a\nb\nc\nd\ne\n")
+    merged, conflicted = merge_lines(base, _lines("A\nb\nc\nd\ne\n"), _lines("a\nb\nc\nd\nE\n"))
+    assert merged == _lines("A\nb\nc\nd\nE\n") and not conflicted
+
+    merged, conflicted = merge_lines(base, _lines("a\nX\nc\nd\ne\n"), _lines("a\nY\nc\nd\ne"), ("HEAD", "topic"))
+    assert conflicted
+    # theirs also dropped the final newline, which merges cleanly
+    assert merged == _lines("a\n<<<<<<< HEAD\nX\n=======\nY\n>>>>>>> topic\nc\nd\ne")
+
+@pytest.fixture
+def diverged(tmp_path):
+    """
+    master and topic each changed a different line of shared.txt and a
+    file of their own since they forked.
+    """
+    repo_dir = tmp_path / ".pygit"
+    init.run(repo_dir=repo_dir)
+    for n in range(5):
+        (tmp_path / f"dir{n}").mkdir()
+        (tmp_path / f"dir{n}/file.txt").write_text(f"{n}\n")
+    (tmp_path / "shared.txt").write_text("one\ntwo\nthree\nfour\nfive\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("base", repo_dir=repo_dir)
+    branch.create_branch(repo_dir, "topic")
+
+    (tmp_path / "shared.txt").write_text("ONE\ntwo\nthree\nfour\nfive\n")
+    (tmp_path / "dir0/file.txt").write_text("master\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("master change", repo_dir=repo_dir)
+
+    checkout.checkout(repo_dir, "topic")
+    (tmp_path / "shared.txt").write_text("one\ntwo\nthree\nfour\nFIVE\n")
+    (tmp_path / "dir1/file.txt").write_text("topic\n")
+    (tmp_path / "dir2/file.txt").unlink()
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("topic change", repo_dir=repo_dir)
+    checkout.checkout(repo_dir, "master")
+    return tmp_path, repo_dir
+
+def test_merge_commits_both_parents_and_merges_only_files_changed_on_both_sides(diverged):
+    tmp_path, repo_dir = diverged
+    master = get_head_commit_hash(repo_dir)
+    topic = (repo_dir / "refs/heads/topic").read_text()
+
+    stats.reset()
+    outcome = merge.merge(repo_dir, "topic")
+    assert outcome.status == "merged"
+    assert stats.get("files_merged") == 1
+    assert sorted(outcome.updated) == ["dir1/file.txt", "shared.txt"] and outcome.removed == ["dir2/file.txt"]
+    assert (tmp_path / "shared.txt").read_text() == "ONE\ntwo\nthree\nfour\nFIVE\n"
+    assert (tmp_path / "dir0/file.txt").read_text() == "master\n"
+    assert load_commit_graph(repo_dir).lookup(outcome.commit)["parents"] == [master, topic]
+    assert get_head_commit_hash(repo_dir) == outcome.commit
+    assert status.get_status(repo_dir).clean
+
+    assert merge.merge(repo_dir, "topic").status == "up-to-date"
+    checkout.checkout(repo_dir, "topic")
+    outcome = merge.merge(repo_dir, "master")
+    assert outcome.status == "fast-forward" and get_head_commit_hash(repo_dir) == outcome.commit
+
+def test_conflicts_wait_for_resolution_before_committing(diverged, capsys):
+    tmp_path, repo_dir = diverged
+    checkout.checkout(repo_dir, "topic")
+    (tmp_path / "shared.txt").write_text("one\ntwo\nthree\nfour\nfive, from topic\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("another topic change", repo_dir=repo_dir)
+    checkout.checkout(repo_dir, "master")
+    (tmp_path / "shared.txt").write_text("ONE\ntwo\nthree\nfour\nfive, from master\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("another master change", repo_dir=repo_dir)
+    capsys.readouterr()
+
+    merge.run("topic", repo_dir=repo_dir)
+    assert "CONFLICT (content): Merge conflict in shared.txt" in capsys.readouterr().out
+    assert "<<<<<<< HEAD\nfive, from master\n=======\nfive, from topic\n>>>>>>> topic\n" in \
+        (tmp_path / "shared.txt").read_text()
+    assert load_merge_state(repo_dir)[1] == ["shared.txt"]
+    assert status.get_status(repo_dir).modified == ["shared.txt"]
+
+    commit.run("merge", repo_dir=repo_dir)
+    assert "Fix the conflicts in shared.txt" in capsys.readouterr().out
+
+    # Adding a file resolves it, even if it still looks conflicted
+    (tmp_path / "shared.txt").write_text("ONE\ntwo\nthree\nfour\nFIVE\n<<<<<<< a real line\n")
+    add.run([tmp_path / "shared.txt"], repo_dir=repo_dir)
+    assert "warning: shared.txt still contains conflict markers." in capsys.readouterr().out
+    commit.run("merge", repo_dir=repo_dir)
+    head = load_commit(repo_dir, get_head_commit_hash(repo_dir))
+    assert head["parents"][1] == (repo_dir / "refs/heads/topic").read_text()
+    assert load_merge_state(repo_dir) is None
+
+def test_modify_delete_conflict_blocks_commit_until_resolved(diverged, capsys):
+    tmp_path, repo_dir = diverged
+    (tmp_path / "dir2/file.txt").write_text("changed on master\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("master changes what topic deleted", repo_dir=repo_dir)
+    capsys.readouterr()
+
+    merge.run("topic", repo_dir=repo_dir)
+    assert "CONFLICT (modify/delete): Merge conflict in dir2/file.txt" in capsys.readouterr().out
+    assert load_merge_state(repo_dir)[1] == ["dir2/file.txt"]
+    commit.run("merge", repo_dir=repo_dir)
+    assert "Fix the conflicts in dir2/file.txt" in capsys.readouterr().out
+
+    # Deleting the file and adding its directory resolves it as deleted
+    (tmp_path / "dir2/file.txt").unlink()
+    add.run([tmp_path], repo_dir=repo_dir)
+    assert load_merge_state(repo_dir)[1] == []
+    commit.run("merge", repo_dir=repo_dir)
+    head = load_commit(repo_dir, get_head_commit_hash(repo_dir))
+    assert len(head["parents"]) == 2
+    assert "dir2/file.txt" not in load_commit_tree(repo_dir, get_head_commit_hash(repo_dir))
+
+def test_merge_abort_restores_head(diverged, capsys):
+    tmp_path, repo_dir = diverged
+    (tmp_path / "dir2/file.txt").write_text("changed on master\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("master changes what topic deleted", repo_dir=repo_dir)
+    head = get_head_commit_hash(repo_dir)
+    merge.run("topic", repo_dir=repo_dir)
+    assert (tmp_path / "dir1/file.txt").read_text() == "topic\n"
+    capsys.readouterr()
+
+    merge.run(abort=True, repo_dir=repo_dir)
+    assert "Merge aborted" in capsys.readouterr().out
+    assert load_merge_state(repo_dir) is None
+    assert get_head_commit_hash(repo_dir) == head
+    assert (tmp_path / "dir1/file.txt").read_text() == "1\n"
+    assert (tmp_path / "shared.txt").read_text() == "ONE\ntwo\nthree\nfour\nfive\n"
+    assert status.get_status(repo_dir).clean
+
+    merge.run(abort=True, repo_dir=repo_dir)
+    assert "There is no merge to abort." in capsys.readouterr().out
@@ -1,7 +1,11 @@
 import tempfile
 from pathlib import Path
 import json
-from pygit.core.objects import generate_commit_hash, save_commit
+import hashlib
+from pygit.core.objects import (
+    BLOCK_SIZE, generate_commit_hash, save_commit, write_blob, write_object,
+    read_object, iter_object, object_exists, object_path,
+)
 
 def test_generate_commit_hash_deterministic_and_differs_with_data():
     commit1 = {"message": "first", "timestamp": 12345, "parent": None, "files": {"file.txt": "abc123"}}
@@ -27,3 +31,29 @@ def test_save_commit_creates_file_with_correct_content():
         
         content = json.loads(commit_file.read_text())
         assert content == commit_data
+
+def test_write_blob_streams_compresses_and_deduplicates(tmp_path):
+    repo_path = tmp_path / ".pygit"
+    content = b"x" * (BLOCK_SIZE * 3 + 17)
+    (tmp_path / "big.bin").write_bytes(content)
+    (tmp_path / "copy.bin").write_bytes(content)
+
+    blob_hash = write_blob(repo_path, tmp_path / "big.bin")
+    assert blob_hash == hashlib.sha1(content).hexdigest()
+    assert write_blob(repo_path, tmp_path / "copy.bin") == blob_hash
+
+    path = object_path(repo_path, blob_hash)
+    assert path.parent.name == blob_hash[:2]
+    assert path.stat().st_size < len(content)
+    # Only the one object remains; no temporary files are left behind
+    assert [p.name for p in (repo_path / "objects").rglob("*") if p.is_file()] == [path.name]
+
+    chunks = list(iter_object(repo_path, blob_hash))
+    assert chunks[0] == "blob"
+    assert b"".join(chunks[1:]) == content
+    assert all(len(chunk) <= BLOCK_SIZE for chunk in chunks[1:])
+
+def test_write_object_and_read_object_round_trip(tmp_path):
+    obj_hash = write_object(tmp_path, b"some tree data", "tree")
+    assert object_exists(tmp_path, obj_hash)
+    assert read_object(tmp_path, obj_hash) == ("tree", b"some tree data")
@@ -0,0 +1,54 @@
+import random
+from pygit.commands import gc
+from pygit.core.objects import write_object, read_object, object_exists, object_path, iter_object, object_header
+from pygit.core.pack import create_delta, apply_delta, write_pack, load_packs, Pack, DELTA
+
+def test_delta_round_trip():
+    rng = random.Random(0)
+    base = bytes(rng.randrange(256) for _ in range(5000))
+    target = base[:1000] + b"inserted text" + base[1200:4000] + base[:300]
+
+    delta = create_delta(base, target)
+
+    assert len(delta) < len(target) // 4
+    assert apply_delta(base, delta) == target
+
+def test_write_pack_deltifies_similar_objects_and_finds_them(tmp_path):
+    rng = random.Random(1)
+    base = "".join(f"line {rng.random()}\n" for _ in range(300)).encode()
+    contents = {f"{i:040x}": base + f"version {i}\n".encode() for i in range(20)}
+    objects = [(h, "blob", len(data), "file.txt") for h, data in contents.items()]
+
+    pack_path = write_pack(tmp_path, objects, contents.__getitem__)
+    pack = Pack(pack_path)
+
+    assert pack_path.stat().st_size < len(base) * 3
+    for obj_hash, data in contents.items():
+        assert pack.read(obj_hash) == ("blob", data)
+    assert pack.read("f" * 40) is None
+    assert any(pack.mm[pack.index.find(h)] == DELTA for h in contents)
+    # Sizes come from the entry headers, deltas included
+    assert all(pack.object_header(h) == ("blob", len(data)) for h, data in contents.items())
+
+def test_gc_packs_loose_objects(tmp_path, capsys):
+    repo_path = tmp_path / ".pygit"
+    hashes = [write_object(repo_path, f"content {i}\n".encode() * 50) for i in range(5)]
+
+    # The objects are not reachable from any commit, so pruning is off
+    gc.run(repo_dir=repo_path, prune="never")
+
+    assert len(load_packs(repo_path)) == 1
+    for i, obj_hash in enumerate(hashes):
+        assert not object_path(repo_path, obj_hash).exists()
+        assert object_exists(repo_path, obj_hash)
+        assert read_object(repo_path, obj_hash) == ("blob", f"content {i}\n".encode() * 50)
+        assert b"".join(list(iter_object(repo_path, obj_hash))[1:]) == f"content {i}\n".encode() * 50
+    assert "Packed 5 objects" in capsys.readouterr().out
+
+    # Repacking again merges the new loose object into a single pack
+    extra = write_object(repo_path, b"one more")
+    assert object_header(repo_path, extra) == ("blob", 8)
+    gc.run(repo_dir=repo_path, prune="never")
+    assert object_header(repo_path, extra) == ("blob", 8)
+    assert len(load_packs(repo_path)) == 1
+    assert read_object(repo_path, extra) == ("blob", b"one more")
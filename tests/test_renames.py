@@ -0,0 +1,43 @@
+from pygit.core import stats
+from pygit.core.renames import detect_renames, signature, similarity
+
+def _reader(contents):
+    return lambda path, blob_hash: contents[blob_hash]
+
+def test_exact_renames_prefer_the_same_file_name():
+    deleted = {"a/util.py": "h1", "b/util.py": "h1", "gone.txt": "h2"}
+    added = {"c/util.py": "h1", "moved.txt": "h2"}
+    renames = detect_renames(deleted, added, None, None)
+    assert [(r.old, r.new, r.similarity) for r in renames] == [
+        ("a/util.py", "c/util.py", 100), ("gone.txt", "moved.txt", 100)]
+
+def test_inexact_renames_and_copies():
+    base = b"".join(b"line %d\n" % i for i in range(100))
+    contents = {
+        "old": base,
+        "new": base.replace(b"line 5\n", b"changed\n"),
+        "other": b"something else entirely\n" * 50,
+        "changed": base + b"one more line\n",
+    }
+    read = _reader(contents)
+
+    renames = detect_renames({"a.txt": "old", "x.txt": "other"}, {"b.txt": "new"}, read, read)
+    assert [(r.old, r.new, r.copied) for r in renames] == [("a.txt", "b.txt", False)]
+    assert 90 <= renames[0].similarity < 100
+
+    # With copy sources, an added file can come from a file that still exists
+    renames = detect_renames({}, {"b.txt": "new"}, read, read, copy_sources={"c.txt": "changed"})
+    assert [(r.old, r.new, r.copied) for r in renames] == [("c.txt", "b.txt", True)]
+
+def test_size_filter_and_limit():
+    small, large = b"x\n" * 10, b"x\n" * 100
+    assert similarity(signature(small), len(small), signature(large), len(large)) == 10
+    read = _reader({"small": small, "large": large})
+    # Too different in size to ever reach 50%, so never compared
+    assert detect_renames({"a": "small"}, {"b": "large"}, read, read) == []
+
+    stats.reset()
+    read = _reader({"old": b"a\nb\nc\n", "new": b"a\nb\nc\nd\n"})
+    assert detect_renames({"a": "old"}, {"b": "new"}, read, read, limit=0) == []
+    assert stats.get("renames_skipped") == 1
+    assert len(detect_renames({"a": "old"}, {"b": "new"}, read, read, limit=1)) == 1
@@ -49,6 +49,6 @@ def test_get_head_commit_hash_returns_correct_hash_or_none():
         ref_file.unlink()
         assert get_head_commit_hash(repo_path) is None
 
-        # Also test detached head returns None
+        # A detached HEAD is the commit itself
         head_file.write_text("detachedhash")
-        assert get_head_commit_hash(repo_path) is None
+        assert get_head_commit_hash(repo_path) == "detachedhash"
@@ -0,0 +1,83 @@
+import os
+import time
+import pytest
+from pygit.commands import add, commit
+from pygit.repository import Repository
+
+def age(path, seconds=10):
+    """
+    Backdate a file's mtime so it is old enough to be cached.
+    """
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+def test_operations_return_results(tmp_path):
+    repo = Repository.init(tmp_path)
+    (tmp_path / "a.txt").write_text("one")
+    (tmp_path / "b.txt").write_text("two")
+
+    result = repo.status()
+    assert result.untracked == ["a.txt", "b.txt"] and not result.staged
+
+    added = repo.add(["a.txt", "missing.txt"])
+    assert added.staged == ["a.txt"] and added.stored == 1
+    assert added.skipped == [(tmp_path / "missing.txt", "missing")]
+    assert repo.status().staged == ["a.txt"]
+
+    commit_hash = repo.commit("first")
+    assert repo.head() == commit_hash
+    assert repo.refs() == {"master": commit_hash}
+    assert repo.current_branch() == "master"
+    assert repo.commit("again") is None
+    assert [info["hash"] for info in repo.log()] == [commit_hash]
+    assert repo.status().untracked == ["b.txt"]
+
+    (tmp_path / "a.txt").write_text("changed")
+    assert repo.status().modified == ["a.txt"]
+    assert list(repo.diff()) == [("a.txt", b"one", b"changed")]
+
+def test_cached_state_is_reloaded_when_files_change(tmp_path):
+    repo = Repository.init(tmp_path)
+    repo_dir = tmp_path / ".pygit"
+    (tmp_path / "a.txt").write_text("one")
+    age(repo_dir / "index")
+    age(repo_dir / "HEAD")
+
+    index = repo.index()
+    assert repo.index() is index
+    assert repo.head() is None
+
+    # Another process stages and commits
+    add.run([tmp_path / "a.txt"], repo_dir=repo_dir)
+    commit.run("first", repo_dir=repo_dir)
+    assert list(repo.index()) == ["a.txt"]
+    assert repo.head() is not None
+    assert repo.commit_tree(repo.head())["a.txt"] == repo.index()["a.txt"]["hash"]
+
+def test_status_leaves_the_shared_index_unmodified(tmp_path):
+    repo = Repository.init(tmp_path)
+    (tmp_path / "a.txt").write_text("one")
+    repo.add(["a.txt"])
+    age(tmp_path / ".pygit/index")
+    index = repo.index()
+    assert repo.index() is index
+    before = dict(index["a.txt"])
+
+    age(tmp_path / "a.txt", 60)  # Stale stat data, same content
+    assert repo.status().modified == []
+    assert index["a.txt"] == before
+    assert repo.index()["a.txt"]["mtime_ns"] != before["mtime_ns"]  # Refreshed on disk
+
+def test_ignore_rules_pick_up_edits(tmp_path):
+    repo = Repository.init(tmp_path)
+    (tmp_path / "build.log").write_text("log")
+    ignore_file = tmp_path / ".pygitignore"
+    age(ignore_file)
+    assert repo.status().untracked == ["build.log"]
+
+    ignore_file.write_text("*.log\n")
+    assert repo.status().untracked == []
+
+def test_not_a_repository(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        Repository(tmp_path)
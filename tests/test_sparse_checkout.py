@@ -0,0 +1,84 @@
+import pytest
+from pygit.commands import init, add, commit, checkout, diff, sparse_checkout, status
+from pygit.core.index import load_index_entries
+from pygit.core.objects import load_commit
+from pygit.core.repo import get_head_commit_hash
+
+@pytest.fixture
+def repo(tmp_path):
+    repo_dir = tmp_path / ".pygit"
+    init.run(repo_dir=repo_dir)
+    for path in ["README", "app/main.py", "app/lib/util.py", "docs/guide.md", "docs/api/index.md",
+                 "vendor/x/a.c", "vendor/y/b.c"]:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(f"{path}\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("first", repo_dir=repo_dir)
+    return tmp_path, repo_dir
+
+def test_sparse_checkout_collapses_directories_outside_the_cone(repo):
+    tmp_path, repo_dir = repo
+    result = sparse_checkout.reapply(repo_dir, sparse_checkout.set_sparse(repo_dir, ["app"]))
+    assert len(result.removed) == 4 and not result.kept
+    assert not (tmp_path / "docs").exists() and not (tmp_path / "vendor").exists()
+    assert (tmp_path / "app/lib/util.py").exists()
+    index = load_index_entries(repo_dir)
+    assert set(index) == {"README", "app/main.py", "app/lib/util.py", "docs/", "vendor/"}
+    assert index["docs/"]["skip_worktree"] and "skip_worktree" not in index["README"]
+    assert status.get_status(repo_dir).clean
+    assert list(diff.get_changes(repo_dir)) == []
+
+    # Commits keep the trees of the collapsed directories
+    (tmp_path / "app/main.py").write_text("changed\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("second", repo_dir=repo_dir)
+    head = get_head_commit_hash(repo_dir)
+    changes = checkout.tree_changes(repo_dir, load_commit(repo_dir, head)["parent"], head)
+    assert [path for path, _, _ in changes] == ["app/main.py"]
+
+    # Widening the cone expands only the directories entering it
+    sparse_checkout.reapply(repo_dir, sparse_checkout.set_sparse(repo_dir, ["app", "vendor/x"]))
+    index = load_index_entries(repo_dir)
+    assert {"docs/", "vendor/x/a.c", "vendor/y/"} <= set(index)
+    assert index["vendor/y/"]["skip_worktree"] and not (tmp_path / "vendor/y").exists()
+    assert (tmp_path / "vendor/x/a.c").read_text() == "vendor/x/a.c\n"
+    assert status.get_status(repo_dir).clean
+
+    sparse_checkout.run("disable", repo_dir=repo_dir)
+    assert (tmp_path / "vendor/y/b.c").read_text() == "vendor/y/b.c\n"
+    assert not any(entry.get("skip_worktree") for entry in load_index_entries(repo_dir).values())
+    assert status.get_status(repo_dir).clean
+
+def test_add_and_checkout_stay_inside_the_cone(repo, capsys):
+    tmp_path, repo_dir = repo
+    first = get_head_commit_hash(repo_dir)
+    (tmp_path / "docs/guide.md").write_text("edited\n")
+    sparse_checkout.run("set", ["app"], repo_dir=repo_dir)
+    assert "'docs/guide.md' has local changes" in capsys.readouterr().err
+    assert (tmp_path / "docs/guide.md").exists() and "docs/" not in load_index_entries(repo_dir)
+    assert status.get_status(repo_dir).modified == ["docs/guide.md"]
+    (tmp_path / "docs/guide.md").write_text("docs/guide.md\n")
+
+    (tmp_path / "vendor/z").mkdir(parents=True)
+    (tmp_path / "vendor/z/c.c").write_text("new\n")
+    add.run([tmp_path / "vendor/z/c.c"], repo_dir=repo_dir)
+    assert "outside the sparse-checkout cone" in capsys.readouterr().out
+    (tmp_path / "vendor/z/c.c").unlink()
+    (tmp_path / "vendor/z").rmdir()
+
+    # Change a collapsed directory in a second commit by leaving the cone
+    sparse_checkout.run("disable", repo_dir=repo_dir)
+    (tmp_path / "vendor/x/a.c").write_text("v2\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("second", repo_dir=repo_dir)
+    sparse_checkout.run("set", ["app"], repo_dir=repo_dir)
+    vendor = load_index_entries(repo_dir)["vendor/"]["hash"]
+
+    (repo_dir / "refs/heads/old").write_text(first)
+    result = checkout.checkout(repo_dir, "old")
+    assert result.updated == [] and result.removed == []
+    assert load_index_entries(repo_dir)["vendor/"]["hash"] != vendor
+    assert not (tmp_path / "vendor").exists()
+    assert status.get_status(repo_dir).clean
+    checkout.checkout(repo_dir, "master")
+    assert load_index_entries(repo_dir)["vendor/"]["hash"] == vendor
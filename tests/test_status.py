@@ -1,3 +1,4 @@
+import os
 import json
 import pytest
 from pathlib import Path
@@ -15,11 +16,11 @@ def mock_repo(tmp_path):
     (ref_path / "main").write_text("abc123")
     return tmp_path, repo_path
 
-@patch("pygit.commands.status.load_index")
+@patch("pygit.commands.status.load_index_entries")
 @patch("pygit.commands.status.load_commit_tree")
 @patch("pygit.commands.status.get_head_commit_hash")
 @patch("pygit.commands.status.get_repo_path")
-@patch("pygit.commands.status.get_working_directory_files")
+@patch("pygit.commands.status.iter_working_files")
 def test_status_output(mock_working, mock_repo_path, mock_head, mock_commit_tree, mock_index, mock_repo, capsys):
 
     tmp_path, repo_path = mock_repo
@@ -28,9 +29,9 @@ def test_status_output(mock_working, mock_repo_path, mock_head, mock_commit_tree
     
     # Set up index, committed tree, and working dir states
     mock_index.return_value = {
-        "file1.txt": "hash1",
-        "file2.txt": "hash2",
-        "file3.txt": "hash3"
+        "file1.txt": {"hash": "hash1"},
+        "file2.txt": {"hash": "hash2"},
+        "file3.txt": {"hash": "hash3"}
     }
     
     mock_commit_tree.return_value = {
@@ -38,11 +39,13 @@ def test_status_output(mock_working, mock_repo_path, mock_head, mock_commit_tree
         "file2.txt": "oldhash"
     }
 
-    mock_working.return_value = {
-        "file2.txt": "hash2",       # modified (diff from index)
-        "file3.txt": "hash3",       # clean
-        "file4.txt": "hash4"        # untracked
-    }
+    # Working files are streamed in path order
+    mock_working.return_value = iter([
+        ("file1.txt", "hash1"),     # clean
+        ("file2.txt", "hash2"),     # modified (diff from index)
+        ("file3.txt", "hash3"),     # clean
+        ("file4.txt", "hash4"),     # untracked
+    ])
 
     # Run status
     status.run()
@@ -59,20 +62,125 @@ def test_status_output(mock_working, mock_repo_path, mock_head, mock_commit_tree
     assert "file1.txt" not in output  # shouldn't appear at all
 
 
-@patch("pygit.commands.status.get_working_directory_files")
-@patch("pygit.commands.status.is_ignored", return_value=False)
 @patch("pygit.commands.status.hash_file", return_value="fakehash")
-def test_get_working_directory_files(mock_hash, mock_ignored, mock_get_files, tmp_path):
+def test_get_working_directory_files(mock_hash, tmp_path):
     # Setup files
     (tmp_path / "a.txt").write_text("hello")
     (tmp_path / "b.txt").write_text("world")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "out.txt").write_text("generated")
+    (tmp_path / ".pygitignore").write_text("build/\n")
 
     repo_path = tmp_path / ".pygit"
     repo_path.mkdir()
+    (repo_path / "index").write_text("{}")
 
-    # Patch Path('.') to return tmp_path
-    with patch("pygit.commands.status.Path", return_value=tmp_path):
-        files = status.get_working_directory_files(repo_path)
+    files = status.get_working_directory_files(repo_path)
 
-    assert all(k.endswith(".txt") for k in files)
+    assert sorted(files) == ["a.txt", "b.txt"]
     assert all(v == "fakehash" for v in files.values())
+
+
+def test_get_working_directory_files_skips_hashing_clean_entries(tmp_path):
+    from pygit.core import stats
+    from pygit.core.index import load_index_entries, save_index, make_entry
+    from pygit.core.hashing import hash_file
+
+    repo_path = tmp_path / ".pygit"
+    repo_path.mkdir()
+    clean = tmp_path / "clean.txt"
+    clean.write_text("unchanged")
+    changed = tmp_path / "changed.txt"
+    changed.write_text("before")
+
+    # Backdate the files so they are not racily clean relative to the index
+    for path in (clean, changed):
+        os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    save_index(repo_path, {
+        path.name: make_entry(hash_file(path), path.stat()) for path in (clean, changed)
+    })
+    changed.write_text("after!")
+
+    stats.reset()
+    files = status.get_working_directory_files(repo_path, load_index_entries(repo_path))
+
+    assert files["clean.txt"] == hash_file(clean)
+    assert files["changed.txt"] == hash_file(changed)
+    assert stats.get("files_skipped") == 1
+
+
+def test_status_reports_deletions_and_renames(tmp_path, capsys):
+    from pygit.commands import init, add, commit
+
+    repo_dir = tmp_path / ".pygit"
+    init.run(repo_dir=repo_dir)
+    body = "".join(f"line {i}\n" for i in range(50))
+    (tmp_path / "exact.txt").write_text("same content\n")
+    (tmp_path / "edited.txt").write_text(body)
+    (tmp_path / "gone.txt").write_text("gone\n")
+    (tmp_path / "moved.txt").write_text("moved\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("first", repo_dir=repo_dir)
+
+    (tmp_path / "exact.txt").rename(tmp_path / "renamed.txt")
+    (tmp_path / "edited.txt").rename(tmp_path / "rewritten.txt")
+    (tmp_path / "rewritten.txt").write_text(body + "extra\n")
+    (tmp_path / "gone.txt").unlink()
+    add.run([tmp_path], repo_dir=repo_dir)
+    (tmp_path / "moved.txt").rename(tmp_path / "elsewhere.txt")
+    capsys.readouterr()
+
+    result = status.get_status(repo_dir)
+    assert result.removed == ["edited.txt", "exact.txt", "gone.txt"]
+    assert result.deleted == ["moved.txt"]
+    assert result.renames["renamed.txt"].similarity == 100
+    assert result.renames["rewritten.txt"].old == "edited.txt"
+
+    status.print_status(result)
+    out = capsys.readouterr().out
+    assert "renamed:  exact.txt -> renamed.txt\n" in out
+    assert "renamed:  edited.txt -> rewritten.txt (98%)\n" in out
+    assert "removed:  gone.txt\n" in out
+    assert "renamed:  moved.txt -> elsewhere.txt\n" in out
+    assert "untracked:" not in out and "staged:" not in out
+
+
+def test_porcelain_output_and_streaming(tmp_path, capsys):
+    from pygit.commands import init, add, commit
+    from pygit.core import stats
+
+    repo_dir = tmp_path / ".pygit"
+    init.run(repo_dir=repo_dir)
+    for n in range(20):
+        (tmp_path / f"file{n:02}.txt").write_text(f"file {n}\n")
+    (tmp_path / "old.txt").write_text("a file that moves\n")
+    add.run([tmp_path], repo_dir=repo_dir)
+    commit.run("first", repo_dir=repo_dir)
+
+    (tmp_path / "file00.txt").write_text("edited\n")
+    (tmp_path / "file01.txt").write_text("staged\n")
+    add.run([tmp_path / "file01.txt"], repo_dir=repo_dir)
+    (tmp_path / "file02.txt").unlink()
+    (tmp_path / "old.txt").rename(tmp_path / "new name.txt")
+    (tmp_path / "notes.md").write_text("untracked\n")
+    capsys.readouterr()
+
+    # Results come out while the working tree is still being walked
+    stats.reset()
+    first = next(status.iter_status(repo_dir))
+    assert first == ("file00.txt", " M", first.head, first.index, first.worktree)
+    assert stats.get("files_walked") < 10
+
+    status.run(porcelain=True, repo_dir=repo_dir)
+    assert capsys.readouterr().out.splitlines() == [
+        " M file00.txt",
+        "M  file01.txt",
+        " D file02.txt",
+        " R old.txt -> new name.txt",
+        "?? notes.md",
+    ]
+
+    status.run(null_terminated=True, repo_dir=repo_dir)
+    assert capsys.readouterr().out.split("\0") == [
+        " M file00.txt", "M  file01.txt", " D file02.txt", " R new name.txt", "old.txt", "?? notes.md", "",
+    ]
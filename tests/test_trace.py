@@ -0,0 +1,44 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from pygit.core import trace
+
+def test_disabled_tracing_leaves_functions_unwrapped():
+    def work():
+        return 42
+    assert not trace.ENABLED
+    assert trace.traced(work) is work
+    with trace.span("anything"):
+        pass
+    assert trace._events == []
+
+def test_format_text_aggregates_by_call_path():
+    events = [
+        (("pygit status",), 0, 5_000_000, 1),
+        (("pygit status", "hashing.hash_file"), 10, 1_000_000, 1),
+        (("pygit status", "hashing.hash_file"), 20, 2_000_000, 1),
+    ]
+    lines = trace.format_text(events, {"files_hashed": 2}).splitlines()
+    assert lines[1].split() == ["5.000", "1", "pygit", "status"]
+    assert lines[2].split() == ["3.000", "2", "hashing.hash_file"]
+    assert lines[2].endswith("    hashing.hash_file")
+    assert lines[-1] == "  files_hashed: 2"
+
+def test_trace_env_writes_chrome_trace(tmp_path):
+    work_dir = tmp_path / "repo"
+    work_dir.mkdir()
+    (work_dir / "a.txt").write_text("hello")
+    out = tmp_path / "trace.json"
+    env = dict(os.environ, PYGIT_TRACE=str(out),
+               PYTHONPATH=str(Path(__file__).resolve().parents[1]))
+    for args in (["init"], ["add", "a.txt"], ["status"]):
+        subprocess.run([sys.executable, "-m", "pygit.main", *args], cwd=work_dir, env=env,
+                       check=True, capture_output=True)
+
+    events = json.loads(out.read_text())["traceEvents"]
+    names = {event["name"] for event in events}
+    assert {"pygit status", "index.load_index_entries", "status: scan working tree"} <= names
+    counters = [event for event in events if event["ph"] == "C"]
+    assert counters[0]["args"]["files_walked"] == 1
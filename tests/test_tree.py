@@ -0,0 +1,46 @@
+from unittest.mock import patch
+from pygit.core.index import IndexEntries
+from pygit.core.objects import read_object
+from pygit.core.tree import write_tree, read_tree, LazyTree, diff_trees, load_cache_tree, invalidate_cache_tree
+
+A, B, C = "a" * 40, "b" * 40, "c" * 40
+
+def test_write_tree_writes_one_tree_per_directory(tmp_path):
+    index = IndexEntries({"README": {"hash": A}, "src/main.py": {"hash": B}, "src/lib/util.py": {"hash": C}})
+
+    root = write_tree(tmp_path, index)
+
+    entries = read_tree(tmp_path, root)
+    assert entries["README"] == ("blob", A)
+    assert entries["src"][0] == "tree"
+    assert read_tree(tmp_path, entries["src"][1])["lib"][0] == "tree"
+    assert set(load_cache_tree(index)) == {"", "src", "src/lib"}
+
+    # After invalidating one path, only its directories are rebuilt
+    invalidate_cache_tree(index, ["src/lib/util.py"])
+    assert set(load_cache_tree(index)) == set()
+    index["README"] = {"hash": C}
+    assert write_tree(tmp_path, index) != root
+
+def test_lazy_tree_reads_only_the_trees_it_needs(tmp_path):
+    index = IndexEntries({"x/1.txt": {"hash": A}, "y/2.txt": {"hash": B}, "z.txt": {"hash": C}})
+    root = write_tree(tmp_path, index)
+
+    tree = LazyTree(tmp_path, root)
+    with patch("pygit.core.tree.read_object", wraps=read_object) as reads:
+        assert tree["x/1.txt"] == A
+        assert "y/missing" not in tree
+    assert reads.call_count == 3  # root, x and y; never any blob
+    assert dict(tree.items()) == {"x/1.txt": A, "y/2.txt": B, "z.txt": C}
+
+def test_diff_trees_skips_identical_subtrees(tmp_path):
+    old = write_tree(tmp_path, IndexEntries({"same/1.txt": {"hash": A}, "changed/2.txt": {"hash": B}}))
+    new = write_tree(tmp_path, IndexEntries({"same/1.txt": {"hash": A}, "changed/2.txt": {"hash": C},
+                                             "added.txt": {"hash": A}}))
+    same_tree = read_tree(tmp_path, old)["same"][1]
+
+    with patch("pygit.core.tree.read_object", wraps=read_object) as reads:
+        changes = list(diff_trees(tmp_path, old, new))
+
+    assert changes == [("added.txt", None, A), ("changed/2.txt", B, C)]
+    assert all(call.args[1] != same_tree for call in reads.call_args_list)